@@ -0,0 +1,12 @@
+"""
+Punto de entrada ASGI (p. ej. gunicorn -k uvicorn.workers.UvicornWorker asgi:asgi_app)
+
+La app sigue siendo WSGI: WsgiToAsgi corre cada petición en un hilo, así
+que este punto de entrada solo sirve para desplegar detrás de un servidor
+ASGI, no hace concurrentes las vistas.
+"""
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+
+app = create_app()
+asgi_app = WsgiToAsgi(app)
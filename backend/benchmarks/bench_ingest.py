@@ -0,0 +1,166 @@
+"""
+Benchmark de la ingesta FHIR en streaming
+
+Genera una exportación sintética ($export NDJSON o una Bundle searchset)
+del tamaño pedido, la carga con fhir_ingest en un proceso aparte y
+reporta recursos/segundo y el pico de memoria (RSS) de ese proceso.
+
+    python benchmarks/bench_ingest.py --size-mb 2048
+    python benchmarks/bench_ingest.py --size-mb 500 --format bundle
+    python benchmarks/bench_ingest.py --export-dir /data/export   # exportación existente
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.fhir_ingest import ingest  # noqa: E402
+from src.services.fhir_local_backend import LocalFHIRBackend  # noqa: E402
+from src.services.fhir_resources import DEFAULT_PLACE_ID_SYSTEM, INVENTORY_LIST_CODE, WAIT_TIME_EXTENSION  # noqa: E402
+
+MEDICATIONS = ['Paracetamol 500mg', 'Ibuprofeno 400mg', 'Amoxicilina 500mg', 'Loratadina 10mg',
+               'Omeprazol 20mg', 'Metformina 850mg', 'Losartán 50mg', 'Salbutamol 100mcg']
+
+
+def synthetic_place(index, rng):
+    """Recursos FHIR de un lugar: Location, HealthcareService, List de inventario y sus Medication"""
+    location_id = f'loc-{index}'
+    yield 'Location', {
+        'resourceType': 'Location', 'id': location_id, 'status': 'active',
+        'name': f'Farmacia sintética {index}',
+        'identifier': [{'system': DEFAULT_PLACE_ID_SYSTEM, 'value': f'ChIJsynthetic{index:010d}'}],
+        'address': {'line': [f'Calle {index % 500} # {index % 97}-{index % 13}'], 'city': 'Bogotá', 'country': 'CO'}
+    }
+    yield 'HealthcareService', {
+        'resourceType': 'HealthcareService', 'id': f'hs-{index}', 'active': rng.random() > 0.1,
+        'location': [{'reference': f'Location/{location_id}'}],
+        'availableTime': [{'daysOfWeek': ['mon', 'tue', 'wed', 'thu', 'fri'],
+                           'availableStartTime': '08:00:00', 'availableEndTime': '18:00:00'}],
+        'availabilityExceptions': 'Emergencias 24/7',
+        'extension': [{'url': WAIT_TIME_EXTENSION, 'extension': [
+            {'url': kind, 'valueInteger': rng.randint(10, 180)} for kind in ('emergency', 'consultation', 'specialist')
+        ]}]
+    }
+    medication_ids = []
+    for position, name in enumerate(MEDICATIONS):
+        medication_id = f'med-{index}-{position}'
+        medication_ids.append(medication_id)
+        yield 'Medication', {
+            'resourceType': 'Medication', 'id': medication_id, 'status': 'active',
+            'code': {'text': name, 'coding': [{'system': 'http://www.whocc.no/atc', 'code': f'N02BE0{position}'}]},
+            'amount': {'numerator': {'value': rng.randint(0, 200), 'unit': 'unidades'}, 'denominator': {'value': 1}}
+        }
+    yield 'List', {
+        'resourceType': 'List', 'id': f'inv-{index}', 'status': 'current', 'mode': 'snapshot',
+        'code': {'coding': [{'code': INVENTORY_LIST_CODE}]},
+        'subject': {'reference': f'Location/{location_id}'},
+        'date': '2026-10-17T08:00:00Z',
+        'entry': [{'item': {'reference': f'Medication/{medication_id}'}} for medication_id in medication_ids]
+    }
+
+
+def write_ndjson_export(directory, size_bytes):
+    """Un archivo NDJSON por tipo de recurso, como un $export de FHIR Bulk Data"""
+    rng = random.Random(42)
+    files = {}
+    written = 0
+    index = 0
+    try:
+        while written < size_bytes:
+            for resource_type, resource in synthetic_place(index, rng):
+                stream = files.get(resource_type)
+                if stream is None:
+                    stream = files[resource_type] = open(os.path.join(directory, f'{resource_type}.ndjson'), 'w', encoding='utf-8')
+                line = json.dumps(resource, ensure_ascii=False) + '\n'
+                stream.write(line)
+                written += len(line)
+            index += 1
+    finally:
+        for stream in files.values():
+            stream.close()
+    return index
+
+
+def write_bundle_export(directory, size_bytes):
+    """Una sola Bundle searchset con todos los recursos"""
+    rng = random.Random(42)
+    written = 0
+    index = 0
+    with open(os.path.join(directory, 'searchset.json'), 'w', encoding='utf-8') as stream:
+        stream.write('{"resourceType": "Bundle", "type": "searchset", "entry": [\n')
+        first = True
+        while written < size_bytes:
+            for _, resource in synthetic_place(index, rng):
+                entry = json.dumps({'fullUrl': f"urn:{resource['id']}", 'resource': resource}, ensure_ascii=False)
+                stream.write(('' if first else ',\n') + entry)
+                written += len(entry) + 2
+                first = False
+            index += 1
+        stream.write('\n]}\n')
+    return index
+
+
+def run_ingest(export_dir, db_path, fmt, batch_size, queue):
+    """Proceso hijo: la ingesta sola, para medir su pico de memoria"""
+    report = ingest([export_dir], LocalFHIRBackend(db_path), fmt=fmt, batch_size=batch_size)
+    report['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    queue.put(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la ingesta FHIR en streaming')
+    parser.add_argument('--size-mb', type=int, default=2048, help='Tamaño de la exportación sintética')
+    parser.add_argument('--format', default='ndjson', choices=('ndjson', 'bundle'))
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--export-dir', help='Usar una exportación existente en vez de generarla')
+    parser.add_argument('--workdir', help='Directorio de trabajo (por defecto uno temporal que se borra)')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_ingest_')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        export_dir = args.export_dir
+        if export_dir is None:
+            export_dir = os.path.join(workdir, 'export')
+            os.makedirs(export_dir, exist_ok=True)
+            print(f"Generando exportación {args.format} de {args.size_mb} MB en {export_dir}...")
+            start = time.perf_counter()
+            writer = write_ndjson_export if args.format == 'ndjson' else write_bundle_export
+            places = writer(export_dir, args.size_mb * 1024 * 1024)
+            print(f"  {places} lugares en {time.perf_counter() - start:.1f}s")
+
+        size = sum(os.path.getsize(os.path.join(export_dir, name)) for name in os.listdir(export_dir))
+        db_path = os.path.join(workdir, 'fhir.sqlite3')
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=run_ingest, args=(export_dir, db_path, 'auto', args.batch_size, queue)
+        )
+        process.start()
+        report = queue.get()
+        process.join()
+
+        print(f"\nExportación: {size / 1024 / 1024:.1f} MB ({args.format})")
+        print(f"Recursos:    {report['resources']} ({report['by_type']})")
+        print(f"Tiempo:      {report['seconds']} s")
+        print(f"Velocidad:   {report['resources_per_second']} recursos/s, "
+              f"{size / 1024 / 1024 / report['seconds']:.1f} MB/s")
+        print(f"Pico RSS:    {report['peak_rss_mb']} MB")
+        print(f"Base local:  {os.path.getsize(db_path) / 1024 / 1024:.1f} MB")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
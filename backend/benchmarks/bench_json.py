@@ -0,0 +1,100 @@
+"""
+Benchmark de la serialización de respuestas de /api/places/search
+
+Compara, para respuestas de 20, 60 y 1000 lugares, lo que hace cada
+petición: armar los dicts de los lugares y codificarlos con la librería
+estándar (como jsonify), lo mismo con orjson, y el camino de
+response_utils con fragmentos ya codificados (caché caliente: solo se
+agrega distance_m a cada fragmento y se empalman los bytes).
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --sizes 20 60 1000 5000 --repeat 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_places import google_results  # noqa: E402
+from src.models.place_batch import PlaceBatch  # noqa: E402
+from src.utils import json_codec  # noqa: E402
+from src.utils.json_codec import FragmentCache, extend_object  # noqa: E402
+
+
+def envelope(places):
+    """Cuerpo de pagination_response con los lugares de la página"""
+    return {
+        'success': True,
+        'message': 'Success',
+        'data': {
+            'location': {'address': 'Bogotá', 'coordinates': {'lat': 4.6, 'lng': -74.08}},
+            'places': places,
+            'total': len(places),
+            'search_params': {'type': 'pharmacy', 'radius': 5000, 'sort': 'relevance'},
+            'source': 'local'
+        },
+        'pagination': {'page': 1, 'per_page': len(places), 'total_items': len(places)}
+    }
+
+
+def stdlib_response(batch, places):
+    dicts = []
+    for row in range(len(places)):
+        place = batch.to_dict(row)
+        place['distance_m'] = row
+        dicts.append(place)
+    return json.dumps(envelope(dicts)).encode('utf-8')
+
+
+def orjson_response(batch, places):
+    dicts = []
+    for row in range(len(places)):
+        place = batch.to_dict(row)
+        place['distance_m'] = row
+        dicts.append(place)
+    return json_codec.dumps(envelope(dicts))
+
+
+def fragment_response(batch, places, cache):
+    fragments = [
+        extend_object(encoded, {'distance_m': row})
+        for row, encoded in enumerate(cache.get_many(places, batch.to_dict))
+    ]
+    return json_codec.dumps(envelope(fragments))
+
+
+def timed(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialización de respuestas de lugares')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 60, 1000])
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"Codificador rápido: {json_codec.backend()}\n")
+    print(f"{'Lugares':>8}{'stdlib ms':>12}{'orjson ms':>12}{'fragmentos ms':>16}{'bytes':>10}")
+    for size in args.sizes:
+        batch = PlaceBatch.from_google_results(google_results(size))
+        places = batch.to_places()
+        cache = FragmentCache(max_entries=size)
+        body = fragment_response(batch, places, cache)
+        # Mismo contenido por los tres caminos
+        assert json.loads(body) == json.loads(stdlib_response(batch, places))
+
+        stdlib_ms = timed(lambda: stdlib_response(batch, places), args.repeat)
+        fast_ms = timed(lambda: orjson_response(batch, places), args.repeat)
+        fragment_ms = timed(lambda: fragment_response(batch, places, cache), args.repeat)
+        print(f"{size:>8}{stdlib_ms:>12.3f}{fast_ms:>12.3f}{fragment_ms:>16.3f}{len(body):>10}")
+
+
+if __name__ == '__main__':
+    main()
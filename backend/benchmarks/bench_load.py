@@ -0,0 +1,351 @@
+"""
+Benchmark de carga del backend contra el servidor de prueba de Google Maps
+
+Levanta benchmarks/google_stub_server.py con la latencia y los errores
+pedidos y el backend con gunicorn (una vez por clase de worker). Luego
+lanza escenarios de carga de bucle cerrado (cada cliente espera su
+respuesta antes de mandar la siguiente) y reporta RPS, p50/p95/p99 y
+llamadas a Google por petición. No gasta cuota de Google.
+
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --worker-class sync gthread --workers 2 --threads 8 \\
+        --concurrency 32 --duration 15 --latency-p50 80 --latency-p95 300 --error OVER_QUERY_LIMIT=0.01
+    python benchmarks/bench_load.py --scenario search details --locations 5 --json resultados.json
+
+Escenarios: search (/api/search), places_search (/api/places/search),
+details (/api/place/<id>), places_details (/api/places/<id>), fhir
+(/api/fhir/pharmacy/stock) y fhir_availability (/api/fhir/availability).
+Los que la app no expone (404) se omiten. Clases de worker: sync, gthread,
+gevent y uvicorn (ASGI, con --asgi-app); las que no están instaladas se
+omiten.
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Escenario -> plantilla de la ruta; {location}, {place_id} y {place_ids} se
+# toman al azar de los valores generados (--locations, --places)
+SCENARIOS = {
+    'search': '/api/search?location={location}&type=pharmacy&radius=2000',
+    'places_search': '/api/places/search?location={location}&type=pharmacy&radius=2000&sort=score',
+    'details': '/api/place/{place_id}',
+    'places_details': '/api/places/{place_id}',
+    'fhir': '/api/fhir/pharmacy/stock?ids={place_ids}',
+    'fhir_availability': '/api/fhir/availability?ids={place_ids}',
+}
+
+# Clase de worker -> (argumentos de gunicorn, módulo que debe estar instalado, app ASGI)
+WORKER_CLASSES = {
+    'sync': (['-k', 'sync'], None, False),
+    'gthread': (['-k', 'src.utils.serving.GracefulThreadWorker'], None, False),
+    'gevent': (['-k', 'gevent', '--worker-connections', '1000'], 'gevent', False),
+    'uvicorn': (['-k', 'uvicorn.workers.UvicornWorker'], 'uvicorn', True),
+}
+
+# Entorno del backend durante el benchmark (se puede cambiar con --env)
+BENCH_ENV = {
+    'GOOGLE_MAPS_API_KEY': 'AIzaBenchmarkKey',
+    # El servidor de prueba no tiene cuota: sin token bucket se mide el backend
+    'GOOGLE_MAPS_RATE_LIMIT': '0',
+    'FLASK_ENV': 'production',
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get_json(port: int, path: str, timeout: float = 5.0):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def wait_ready(port: int, path: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'El proceso terminó al arrancar (código {process.returncode})')
+        try:
+            status, _ = get_json(port, path, timeout=1.0)
+            if status < 500:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Sin respuesta en el puerto {port} tras {timeout:.0f}s')
+
+
+def stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def start_stub(args, workdir):
+    port = free_port()
+    command = [
+        sys.executable, '-m', 'benchmarks.google_stub_server', '--port', str(port),
+        '--latency-p50', str(args.latency_p50), '--latency-p95', str(args.latency_p95)
+    ]
+    if args.recordings:
+        command += ['--recordings', args.recordings]
+    for value in args.latency or ():
+        command += ['--latency', value]
+    for value in args.error or ():
+        command += ['--error', value]
+    log = open(os.path.join(workdir, 'google_stub.log'), 'w')
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+    wait_ready(port, '/__stats', process)
+    return process, port
+
+
+def start_backend(args, worker_class, stub_port, workdir):
+    options, _, asgi = WORKER_CLASSES[worker_class]
+    port = free_port()
+    instance = os.path.join(workdir, worker_class)
+    os.makedirs(instance, exist_ok=True)
+    env = dict(os.environ, **BENCH_ENV)
+    env.update({
+        'GOOGLE_MAPS_BASE_URL': f'http://127.0.0.1:{stub_port}',
+        'GOOGLE_MAPS_RATE_LIMIT_FILE': os.path.join(instance, 'google_rate_limit.bin'),
+        'METRICS_DIR': os.path.join(instance, 'metrics'),
+        'PLACE_INDEX_PATH': os.path.join(instance, 'place_index.json'),
+        'PHOTO_CACHE_DIR': os.path.join(instance, 'photos'),
+        'CACHE_SQLITE_PATH': os.path.join(instance, 'cache.sqlite3'),
+        'GUNICORN_PIDFILE': os.path.join(instance, 'gunicorn.pid'),
+    })
+    for value in args.env or ():
+        key, _, setting = value.partition('=')
+        env[key] = setting
+
+    command = [
+        sys.executable, '-m', 'gunicorn', *options,
+        '--workers', str(args.workers), '--bind', f'127.0.0.1:{port}',
+        '--timeout', '120', '--log-level', 'warning'
+    ]
+    # gunicorn.conf.py calcula hilos para su clase por defecto; con threads > 1
+    # gunicorn cambiaría sync por gthread
+    command += ['--threads', str(args.threads if worker_class == 'gthread' else 1)]
+    command.append(args.asgi_app if asgi else args.app)
+    log = open(os.path.join(workdir, f'gunicorn_{worker_class}.log'), 'w')
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    wait_ready(port, '/', process)
+    return process, port
+
+
+def build_values(args):
+    """Ubicaciones e IDs de lugares entre los que eligen los escenarios"""
+    rng = random.Random(args.seed)
+    locations = [
+        quote(f'{4.65 + rng.uniform(-0.1, 0.1):.4f},{-74.08 + rng.uniform(-0.1, 0.1):.4f}')
+        for _ in range(args.locations)
+    ]
+    place_ids = [f'ChIJbench{index:08d}' for index in range(args.places)]
+    return {'location': locations, 'place_id': place_ids}
+
+
+def make_path(template: str, values, rng: random.Random) -> str:
+    return template.format(
+        location=rng.choice(values['location']),
+        place_id=rng.choice(values['place_id']),
+        place_ids=','.join(rng.sample(values['place_id'], min(20, len(values['place_id']))))
+    )
+
+
+def percentile(sorted_values, percent: float):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(port, template, values, concurrency, duration, seed):
+    """
+    Bucle cerrado con `concurrency` clientes durante `duration` segundos
+
+    Returns:
+        (latencias en ms de las respuestas 2xx/3xx, conteo por estado, segundos)
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(client_seed):
+        rng = random.Random(client_seed)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local_latencies = []
+        local_statuses = {}
+        while time.perf_counter() < deadline:
+            path = make_path(template, values, rng)
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                # Conexión cerrada por el servidor (worker sync): reconectar
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                status = 'conexión'
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if isinstance(status, int) and status < 400:
+                local_latencies.append(elapsed_ms)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(seed * 1000 + index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), statuses, time.perf_counter() - started
+
+
+def upstream_calls(stub_port):
+    _, body = get_json(stub_port, '/__stats')
+    return json.loads(body)['calls']
+
+
+def run_scenario(args, name, backend_port, stub_port, values):
+    template = SCENARIOS[name]
+    status, _ = get_json(backend_port, make_path(template, values, random.Random(args.seed)), timeout=60)
+    if status == 404 and '{place_id}' not in template:
+        return None
+    if args.warmup:
+        run_load(backend_port, template, values, args.concurrency, args.warmup, args.seed + 1)
+
+    before = upstream_calls(stub_port)
+    latencies, statuses, seconds = run_load(backend_port, template, values, args.concurrency, args.duration, args.seed)
+    after = upstream_calls(stub_port)
+
+    requests_total = sum(statuses.values())
+    calls = {endpoint: after.get(endpoint, 0) - before.get(endpoint, 0) for endpoint in after}
+    return {
+        'requests': requests_total,
+        'rps': requests_total / seconds if seconds else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'errors': sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 400),
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'upstream_calls': {endpoint: count for endpoint, count in calls.items() if count},
+        'upstream_per_request': sum(calls.values()) / requests_total if requests_total else 0.0
+    }
+
+
+def available(worker_class):
+    module = WORKER_CLASSES[worker_class][1]
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def print_report(results):
+    print(f"\n{'worker':<10}{'escenario':<20}{'peticiones':>11}{'RPS':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'errores':>9}{'Google/pet':>12}")
+    for worker_class, scenarios in results.items():
+        for name, result in scenarios.items():
+            if result is None:
+                print(f"{worker_class:<10}{name:<20}{'(ruta no disponible en esta app)':>40}")
+                continue
+            p50, p95, p99 = (
+                f"{result[key]:.1f}" if result[key] is not None else '-'
+                for key in ('p50_ms', 'p95_ms', 'p99_ms')
+            )
+            print(f"{worker_class:<10}{name:<20}{result['requests']:>11}{result['rps']:>9.1f}{p50:>9}{p95:>9}"
+                  f"{p99:>9}{result['errors']:>9}{result['upstream_per_request']:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga contra un Google Maps de prueba')
+    parser.add_argument('--worker-class', nargs='+', default=list(WORKER_CLASSES), choices=list(WORKER_CLASSES))
+    parser.add_argument('--scenario', nargs='+', default=['search', 'places_search', 'details', 'fhir'],
+                        choices=list(SCENARIOS))
+    parser.add_argument('--app', default='app:create_app()', help='App WSGI para gunicorn')
+    parser.add_argument('--asgi-app', default='asgi:asgi_app', help='App ASGI para el worker uvicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='Hilos por worker (gthread)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Clientes simultáneos')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos de medición por escenario')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Segundos de calentamiento (no se miden)')
+    parser.add_argument('--locations', type=int, default=20, help='Ubicaciones distintas (menos = más aciertos de caché)')
+    parser.add_argument('--places', type=int, default=200, help='place_id distintos para details y FHIR')
+    parser.add_argument('--latency-p50', type=float, default=60.0, help='Mediana de la latencia de Google en ms')
+    parser.add_argument('--latency-p95', type=float, default=200.0, help='p95 de la latencia de Google en ms')
+    parser.add_argument('--latency', action='append', metavar='ENDPOINT=P50:P95')
+    parser.add_argument('--error', action='append', metavar='[ENDPOINT:]CODIGO=PROB')
+    parser.add_argument('--recordings', help='Respuestas grabadas de Google (ver google_stub_server)')
+    parser.add_argument('--env', action='append', metavar='CLAVE=VALOR', help='Variable de entorno del backend')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    parser.add_argument('--keep', action='store_true', help='Conservar el directorio temporal con los logs')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_load_')
+    values = build_values(args)
+    results = {}
+    try:
+        for worker_class in args.worker_class:
+            if not available(worker_class):
+                print(f"{worker_class}: {WORKER_CLASSES[worker_class][1]} no está instalado, se omite")
+                continue
+            # Un servidor de prueba nuevo por clase: las cachés de cada corrida empiezan vacías
+            stub, stub_port = start_stub(args, workdir)
+            backend = None
+            try:
+                backend, backend_port = start_backend(args, worker_class, stub_port, workdir)
+                print(f"{worker_class}: {args.workers} workers en el puerto {backend_port}", flush=True)
+                results[worker_class] = {
+                    name: run_scenario(args, name, backend_port, stub_port, values)
+                    for name in args.scenario
+                }
+            except RuntimeError as e:
+                print(f"{worker_class}: {e} (ver {workdir})")
+                args.keep = True
+            finally:
+                if backend is not None:
+                    stop(backend)
+                stop(stub)
+    finally:
+        if args.keep:
+            print(f"Logs en {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'args': vars(args), 'results': results}, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark de la representación de lugares: memoria por lugar y coste de serialización
+
+Compara los dicts crudos de Google, un dataclass con __dict__ (el modelo
+anterior), el HealthPlace con __slots__ y el PlaceBatch columnar, mide el
+índice local (que guarda sus lugares en un PlaceBatch) y el ranking
+vectorizado de /api/places/search sobre lotes de candidatos.
+
+    python benchmarks/bench_places.py
+    python benchmarks/bench_places.py --places 500000 --page 60
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.health_place import HealthPlace  # noqa: E402
+from src.models.place_batch import PlaceBatch  # noqa: E402
+from src.services.place_index import PlaceIndex  # noqa: E402
+from src.services.place_ranking import PlaceRanker  # noqa: E402
+
+TYPE_SETS = [
+    ['pharmacy', 'health', 'store', 'point_of_interest', 'establishment'],
+    ['hospital', 'health', 'point_of_interest', 'establishment'],
+    ['doctor', 'health', 'point_of_interest', 'establishment'],
+    ['dentist', 'health', 'point_of_interest', 'establishment'],
+    ['drugstore', 'pharmacy', 'health', 'store', 'point_of_interest', 'establishment'],
+]
+
+
+@dataclass
+class DictHealthPlace:
+    """El modelo anterior: dataclass sin __slots__ y una lista de tipos por lugar"""
+    place_id: str
+    name: str
+    address: str
+    lat: float
+    lng: float
+    rating: float = 0.0
+    user_ratings_total: int = 0
+    price_level: int = 0
+    types: List[str] = None
+    open_now: Optional[bool] = None
+    photo_reference: str = ""
+
+
+def google_results(count, seed=42):
+    """Resultados sintéticos con la forma de places_nearby"""
+    rng = random.Random(seed)
+    for index in range(count):
+        result = {
+            'place_id': f'ChIJ{index:023d}',
+            'name': f'Farmacia {rng.choice(["Cruz Verde", "Colsubsidio", "Pasteur", "Farmatodo"])} {index}',
+            'vicinity': f'Calle {rng.randint(1, 200)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}, Bogotá',
+            'geometry': {'location': {'lat': 4.6 + rng.uniform(-0.2, 0.2), 'lng': -74.08 + rng.uniform(-0.2, 0.2)}},
+            'rating': round(rng.uniform(1, 5), 1),
+            'user_ratings_total': rng.randint(0, 3000),
+            'types': list(rng.choice(TYPE_SETS)),
+            'opening_hours': {'open_now': rng.random() > 0.3}
+        }
+        if rng.random() > 0.5:
+            result['photos'] = [{'photo_reference': f'AfLeUg{index:040d}'}]
+        yield result
+
+
+def place_kwargs(result):
+    location = result['geometry']['location']
+    return dict(
+        place_id=result['place_id'], name=result['name'], address=result['vicinity'],
+        lat=location['lat'], lng=location['lng'], rating=result['rating'],
+        user_ratings_total=result['user_ratings_total'], types=result['types'],
+        open_now=result['opening_hours']['open_now'],
+        photo_reference=result['photos'][0]['photo_reference'] if 'photos' in result else ''
+    )
+
+
+def measure(build, blob):
+    """
+    Bytes que siguen vivos tras build(resultados) y segundos que tardó
+
+    Los resultados se decodifican de JSON dentro de la medición de
+    memoria, como llegan de Google, para que cada representación cuente
+    sus propias cadenas; los dicts intermedios que no se conservan no
+    suman. El tiempo se mide aparte, sin tracemalloc (que lo multiplica),
+    y solo cuenta la construcción a partir de los resultados ya decodificados.
+    """
+    gc.collect()
+    tracemalloc.start()
+    value = build(json.loads(blob))
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+
+    results = json.loads(blob)
+    gc.collect()
+    start = time.perf_counter()
+    value = build(results)
+    seconds = time.perf_counter() - start
+    return value, size, seconds
+
+
+def serialize_place(place):
+    """El _serialize_place del controlador"""
+    return {
+        'place_id': place.place_id, 'name': place.name, 'address': place.address,
+        'coordinates': {'lat': place.lat, 'lng': place.lng},
+        'rating': place.rating, 'user_ratings_total': place.user_ratings_total,
+        'price_level': place.price_level, 'types': list(place.types),
+        'open_now': place.open_now, 'photo_reference': place.photo_reference
+    }
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoria y serialización de lugares')
+    parser.add_argument('--places', type=int, default=200000, help='Lugares en memoria (índice local)')
+    parser.add_argument('--page', type=int, default=60, help='Lugares por respuesta serializada')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    blob = json.dumps(list(google_results(args.places)))
+    print(f"{args.places} lugares\n")
+    print(f"{'Representación':<28}{'bytes/lugar':>12}{'construcción':>16}")
+    # Construcción: decodificar el JSON de Google y armar la representación
+
+    rows = {}
+    builders = [
+        ('dicts de Google', lambda results: results),
+        ('dataclass con __dict__', lambda results: [DictHealthPlace(**place_kwargs(result)) for result in results]),
+        ('HealthPlace (__slots__)', lambda results: [HealthPlace(**place_kwargs(result)) for result in results]),
+        ('PlaceBatch', PlaceBatch.from_google_results),
+    ]
+    for label, build in builders:
+        value, size, seconds = measure(build, blob)
+        rows[label] = value
+        print(f"{label:<28}{size / args.places:>12.0f}{seconds * 1000:>13.0f} ms")
+
+    objects = rows['HealthPlace (__slots__)']
+    batch = rows['PlaceBatch']
+    page = min(args.page, args.places)
+    print(f"\nRespuesta de {page} lugares (dicts + json.dumps), ms")
+    print(f"  desde objetos:   {timed(lambda: json.dumps([serialize_place(p) for p in objects[:page]]), args.repeat):.3f}")
+    print(f"  desde columnas:  {timed(lambda: json.dumps(batch.to_dicts(range(page))), args.repeat):.3f}")
+
+    print(f"\nFiltrar (pharmacy, abierto, rating >= 4) y ordenar por rating los {args.places} lugares, ms")
+    repeat = max(1, args.repeat // 20)
+    print("  desde objetos:   {:.2f}".format(timed(lambda: sorted(
+        (p for p in objects if 'pharmacy' in p.types and p.open_now and p.rating >= 4),
+        key=lambda p: p.rating, reverse=True
+    ), repeat)))
+    print("  desde columnas:  {:.2f}".format(timed(lambda: batch.sort_rows(
+        batch.filter_rows(place_type='pharmacy', open_now=True, min_rating=4), 'rating', reverse=True
+    ), repeat)))
+
+    print(f"\nÍndice local con {args.places} lugares (PlaceBatch + rejilla de filas)")
+    gc.collect()
+    start = time.perf_counter()
+    index = PlaceIndex()
+    index.add_many(objects, 'pharmacy')
+    print(f"  construcción:    {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"  columnas:        {index.stats()['memory_bytes'] / args.places:.0f} bytes/lugar")
+    for radius in (500, 2000, 5000):
+        found = len(index.query(4.6, -74.08, radius, 'pharmacy'))
+        elapsed = timed(lambda: index.query(4.6, -74.08, radius, 'pharmacy'), repeat)
+        print(f"  query {radius:>5} m:    {elapsed:.2f} ms ({found} lugares, incluye crear los HealthPlace)")
+
+    ranker = PlaceRanker()
+    filters = dict(open_now=True, min_rating=3.5, max_distance=15000, sort='score')
+    print("\nRanking de punta a punta (open_now, min_rating, max_distance, sort=score), ms")
+    elapsed = timed(lambda: ranker.rank(
+        PlaceBatch.from_places(objects[:60]), 4.6, -74.08, 20000, **filters
+    ), args.repeat)
+    print(f"  Google, 60 lugares (incluye armar el lote):        {elapsed:.3f}")
+    # local_first: celdas, distancias y ranking sobre las filas del lote del índice
+    index.record_coverage(4.6, -74.08, 50000, 'pharmacy')
+    for radius in (500, 2000, 5000):
+        def search():
+            return index.search_local_ranked(
+                4.6, -74.08, radius, 'pharmacy',
+                lambda batch, rows, distances: ranker.rank(batch, 4.6, -74.08, radius, rows, distances, **filters)
+            )
+        candidates = len(index.query(4.6, -74.08, radius, 'pharmacy'))
+        elapsed = timed(search, args.repeat)
+        print(f"  local_first, radio {radius:>5} m ({candidates:>5} candidatos):  {elapsed:.3f}")
+
+
+if __name__ == '__main__':
+    main()
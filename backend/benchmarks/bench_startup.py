@@ -0,0 +1,166 @@
+"""
+Benchmark de arranque en frío: importación, create_app y primera petición
+
+Cada repetición corre en un proceso nuevo, como un contenedor que escala
+desde cero: mide el tiempo del proceso completo, la importación de la
+app, create_app, la primera y la segunda petición a cada ruta (contra el
+servidor de prueba de Google), el RSS máximo y qué dependencias pesadas
+quedaron cargadas al terminar de arrancar.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --path /api/health --path /api/places/search?location=bogota
+    python benchmarks/bench_startup.py --importtime 15    # módulos más lentos de importar
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_load import BACKEND_DIR, BENCH_ENV, free_port, stop, wait_ready
+
+DEFAULT_PATHS = [
+    '/health',
+    '/api/health',
+    '/api/places/types',
+    '/api/search?location=bogota&type=pharmacy&radius=2000',
+    '/api/places/search?location=bogota&type=pharmacy&radius=2000&sort=score',
+]
+
+# Dependencias que solo algunas rutas necesitan
+HEAVY_MODULES = ('googlemaps', 'requests', 'numpy', 'PIL.Image', 'asyncio')
+
+# Proceso hijo: arranca la app y responde cada ruta dos veces con el cliente de pruebas
+CHILD = '''
+import json, resource, sys, time
+from types import ModuleType
+started = time.perf_counter()
+module_name, factory_name = sys.argv[1].split(':')
+app_module = __import__(module_name, fromlist=[factory_name])
+imported = time.perf_counter()
+app = getattr(app_module, factory_name)()
+created = time.perf_counter()
+loaded = [
+    name for name in sys.argv[2].split(',')
+    if type(sys.modules.get(name)) is ModuleType
+]
+client = app.test_client()
+requests = {}
+for path in sys.argv[3:]:
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append((time.perf_counter() - start) * 1000)
+    requests[path] = {'status': response.status_code, 'first_ms': timings[0], 'second_ms': timings[1]}
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'heavy_loaded_at_start': loaded,
+    'requests': requests,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}))
+'''
+
+
+def run_once(args, env):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, args.app, ','.join(HEAVY_MODULES), *args.path],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def importtime(args, env, limit):
+    """Módulos con más tiempo acumulado de importación (python -X importtime)"""
+    module_name = args.app.split(':')[0]
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((int(cumulative) / 1000, name))
+    print(f"\n{'ms acumulados':>14}  módulo")
+    for cumulative_ms, name in sorted(rows, reverse=True)[:limit]:
+        print(f"{cumulative_ms:>14.1f}  {name}")
+
+
+def summarize(values):
+    return f"{statistics.median(values):>9.1f}{min(values):>9.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque en frío de la app')
+    parser.add_argument('--app', default='app:create_app', help='módulo:factory de la app')
+    parser.add_argument('--runs', type=int, default=5, help='Procesos nuevos a medir')
+    parser.add_argument('--path', action='append', help='Ruta a pedir (repetible); por defecto varias de /api y /api/places')
+    parser.add_argument('--latency-p50', type=float, default=20.0, help='Mediana de la latencia de Google en ms')
+    parser.add_argument('--latency-p95', type=float, default=40.0, help='p95 de la latencia de Google en ms')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='Mostrar los N módulos más lentos de importar')
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    args = parser.parse_args()
+    args.path = args.path or DEFAULT_PATHS
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [
+            sys.executable, '-m', 'benchmarks.google_stub_server', '--port', str(stub_port),
+            '--latency-p50', str(args.latency_p50), '--latency-p95', str(args.latency_p95)
+        ],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(stub_port, '/__stats', stub)
+        env = dict(os.environ, **BENCH_ENV)
+        env.update({
+            'GOOGLE_MAPS_BASE_URL': f'http://127.0.0.1:{stub_port}',
+            'GOOGLE_MAPS_RATE_LIMIT_FILE': os.path.join(workdir, 'google_rate_limit.bin'),
+            'METRICS_DIR': os.path.join(workdir, 'metrics'),
+            'PHOTO_CACHE_DIR': os.path.join(workdir, 'photos'),
+            'PLACE_INDEX_PATH': os.path.join(workdir, 'place_index.json'),
+        })
+        # Una corrida descartada: llena la caché de bytecode y la del sistema de archivos
+        run_once(args, env)
+        results = [run_once(args, env) for _ in range(args.runs)]
+    finally:
+        stop(stub)
+
+    print(f"{args.runs} procesos nuevos, app {args.app}")
+    print(f"{'':<60}{'mediana':>9}{'mín':>9}")
+    for key, label in (
+        ('process_ms', 'proceso completo (ms)'),
+        ('import_ms', 'importar la app (ms)'),
+        ('create_app_ms', 'create_app (ms)'),
+        ('max_rss_mb', 'RSS máximo (MB)'),
+    ):
+        print(f"{label:<60}{summarize([result[key] for result in results])}")
+    for path in args.path:
+        statuses = {result['requests'][path]['status'] for result in results}
+        for key, label in (('first_ms', 'primera'), ('second_ms', 'segunda')):
+            name = f"{label} {path}"[:52] + f" [{','.join(map(str, sorted(statuses)))}]"
+            print(f"{name:<60}{summarize([result['requests'][path][key] for result in results])}")
+    print(f"Dependencias pesadas cargadas al arrancar: {', '.join(results[0]['heavy_loaded_at_start']) or 'ninguna'}")
+
+    if args.importtime:
+        importtime(args, env, args.importtime)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'args': vars(args), 'results': results}, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
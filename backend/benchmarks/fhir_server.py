@@ -0,0 +1,250 @@
+"""
+Servidor FHIR R4 mínimo en memoria para desarrollo y pruebas locales
+
+Sustituye a un HAPI FHIR cuando no hay uno a mano:
+
+    python -m benchmarks.fhir_server --port 8080 --fixtures fixtures.json
+
+`fixtures.json` es una Bundle (o una lista de recursos) con los Location,
+HealthcareService, List y Medication a cargar. Solo implementa lo que usa
+HTTPFHIRBackend: lectura y escritura por id, batch/transaction, búsqueda
+de Location por identifier con `_revinclude=HealthcareService:location`,
+`_revinclude=List:subject` e `_include(:iterate)=List:item`. No persiste nada.
+"""
+import argparse
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+FHIR_JSON = 'application/fhir+json'
+
+# _revinclude soportados: Tipo:parámetro -> campo del recurso que referencia al Location
+REVINCLUDES = {
+    'HealthcareService:location': 'location',
+    'List:subject': 'subject',
+}
+
+
+def _references(value):
+    """Referencias ('Tipo/id') de un campo que puede ser lista o único"""
+    items = value if isinstance(value, list) else [value]
+    return [item.get('reference') for item in items if isinstance(item, dict) and item.get('reference')]
+
+
+class FHIRStore:
+    """Recursos por tipo e id, compartidos por todas las conexiones"""
+
+    def __init__(self):
+        self._resources = {}
+        self._lock = threading.Lock()
+
+    def put(self, resource):
+        resource = dict(resource)
+        resource.setdefault('id', uuid.uuid4().hex[:16])
+        with self._lock:
+            self._resources.setdefault(resource['resourceType'], {})[resource['id']] = resource
+        return resource
+
+    def read(self, resource_type, resource_id):
+        with self._lock:
+            return self._resources.get(resource_type, {}).get(resource_id)
+
+    def all(self, resource_type):
+        with self._lock:
+            return list(self._resources.get(resource_type, {}).values())
+
+    def load(self, data):
+        """Cargar una Bundle o una lista de recursos"""
+        resources = data if isinstance(data, list) else [entry['resource'] for entry in data.get('entry', [])]
+        for resource in resources:
+            self.put(resource)
+        return len(resources)
+
+    def search(self, resource_type, params):
+        """Búsqueda searchset con los parámetros soportados"""
+        matches = self.all(resource_type)
+        includes = []
+        revincludes = []
+        count = None
+        for name, value in params:
+            if name == 'identifier':
+                tokens = [token.split('|', 1) if '|' in token else [None, token] for token in value.split(',')]
+                matches = [
+                    resource for resource in matches
+                    if any(
+                        (system is None or identifier.get('system') == system) and identifier.get('value') == code
+                        for identifier in resource.get('identifier', [])
+                        for system, code in tokens
+                    )
+                ]
+            elif name == '_id':
+                ids = set(value.split(','))
+                matches = [resource for resource in matches if resource['id'] in ids]
+            elif name == '_revinclude':
+                revincludes.append(value)
+            elif name in ('_include', '_include:iterate'):
+                includes.append(value)
+            elif name == '_count':
+                count = int(value)
+            else:
+                raise ValueError(f'Parámetro de búsqueda no soportado: {name}')
+
+        if count is not None:
+            matches = matches[:count]
+        entries = [{'resource': resource, 'search': {'mode': 'match'}} for resource in matches]
+
+        targets = {f"{resource_type}/{resource['id']}" for resource in matches}
+        extra = []
+        for revinclude in revincludes:
+            if revinclude not in REVINCLUDES:
+                raise ValueError(f'_revinclude no soportado: {revinclude}')
+            source_type = revinclude.split(':')[0]
+            field = REVINCLUDES[revinclude]
+            extra.extend(
+                resource for resource in self.all(source_type)
+                if targets.intersection(_references(resource.get(field)))
+            )
+        for include in includes:
+            if include != 'List:item':
+                raise ValueError(f'_include no soportado: {include}')
+            for resource in [entry['resource'] for entry in entries] + extra:
+                if resource['resourceType'] != 'List':
+                    continue
+                for item in resource.get('entry', []):
+                    for reference in _references(item.get('item')):
+                        included = self.read(*reference.split('/', 1))
+                        if included is not None:
+                            extra.append(included)
+
+        seen = set()
+        for resource in extra:
+            key = (resource['resourceType'], resource['id'])
+            if key not in seen:
+                seen.add(key)
+                entries.append({'resource': resource, 'search': {'mode': 'include'}})
+
+        return {
+            'resourceType': 'Bundle',
+            'type': 'searchset',
+            'total': len(matches),
+            'entry': entries
+        }
+
+    def handle(self, method, url, body=None):
+        """Ejecutar una interacción REST y devolver (status, recurso)"""
+        parsed = urlparse(url)
+        parts = [part for part in parsed.path.split('/') if part]
+        try:
+            if method == 'GET' and len(parts) == 1 and parts[0] == 'metadata':
+                return 200, {'resourceType': 'CapabilityStatement', 'status': 'active', 'fhirVersion': '4.0.1'}
+            if method == 'GET' and len(parts) == 1:
+                return 200, self.search(parts[0], parse_qsl(parsed.query))
+            if method == 'GET' and len(parts) == 2:
+                resource = self.read(*parts)
+                if resource is None:
+                    return 404, _outcome('not-found', f'{parts[0]}/{parts[1]} no existe')
+                return 200, resource
+            if method in ('PUT', 'POST') and parts and body is not None:
+                if len(parts) == 2:
+                    body = dict(body, id=parts[1])
+                return (200 if method == 'PUT' else 201), self.put(body)
+            if method == 'POST' and not parts and body is not None and body.get('resourceType') == 'Bundle':
+                return 200, self.batch(body)
+        except ValueError as e:
+            return 400, _outcome('not-supported', str(e))
+        return 400, _outcome('not-supported', f'Interacción no soportada: {method} {url}')
+
+    def batch(self, bundle):
+        """Procesar una Bundle batch o transaction"""
+        entries = []
+        for entry in bundle.get('entry', []):
+            request = entry.get('request', {})
+            status, resource = self.handle(request.get('method', 'GET'), request.get('url', ''), entry.get('resource'))
+            entries.append({'resource': resource, 'response': {'status': str(status)}})
+        return {
+            'resourceType': 'Bundle',
+            'type': f"{bundle.get('type', 'batch')}-response",
+            'entry': entries
+        }
+
+
+def _outcome(code, message):
+    return {
+        'resourceType': 'OperationOutcome',
+        'issue': [{'severity': 'error', 'code': code, 'diagnostics': message}]
+    }
+
+
+class FHIRHandler(BaseHTTPRequestHandler):
+    """Atiende peticiones REST FHIR bajo el prefijo del servidor"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method):
+        prefix = self.server.prefix
+        if not self.path.startswith(prefix):
+            return self._reply(404, _outcome('not-found', 'Ruta fuera del servidor FHIR'))
+        body = None
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except ValueError:
+                return self._reply(400, _outcome('invalid', 'JSON inválido'))
+        status, resource = self.server.store.handle(method, self.path[len(prefix):] or '/', body)
+        self._reply(status, resource)
+
+    def _reply(self, status, resource):
+        data = json.dumps(resource, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', FHIR_JSON)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+
+class FHIRServer(ThreadingHTTPServer):
+    """Servidor HTTP multihilo con un FHIRStore compartido"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 8080), prefix='/fhir'):
+        super().__init__(address, FHIRHandler)
+        self.prefix = prefix.rstrip('/')
+        self.store = FHIRStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor FHIR R4 en memoria (sustituto local de HAPI)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--prefix', default='/fhir')
+    parser.add_argument('--fixtures', help='Bundle JSON con los recursos iniciales')
+    args = parser.parse_args()
+
+    server = FHIRServer((args.host, args.port), args.prefix)
+    if args.fixtures:
+        with open(args.fixtures, encoding='utf-8') as f:
+            loaded = server.store.load(json.load(f))
+        print(f"Cargados {loaded} recursos de {args.fixtures}")
+    print(f"Servidor FHIR escuchando en http://{args.host}:{args.port}{server.prefix}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+"""
+Sustituto local de la API de Google Maps para benchmarks y pruebas de carga
+
+Responde geocode, nearbysearch, details y photo sin gastar cuota:
+
+    python -m benchmarks.google_stub_server --port 8090
+    python -m benchmarks.google_stub_server --recordings recordings.json \\
+        --latency-p50 80 --latency-p95 300 --error OVER_QUERY_LIMIT=0.01 --error details:http_500=0.02
+
+El backend se apunta aquí con GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8090.
+Las respuestas grabadas (`--recordings`) se devuelven tal cual; lo que no
+está grabado se genera de forma determinista a partir de la consulta, con
+la forma de las respuestas reales. Con `--record` el servidor reenvía cada
+consulta a Google (`--upstream`), guarda la respuesta en el archivo y la
+devuelve: así se graba una sesión real una sola vez.
+
+La latencia de cada respuesta sigue una lognormal definida por su p50 y
+p95 (global o por endpoint) y los errores se inyectan con la probabilidad
+indicada: estados de la API (OVER_QUERY_LIMIT, UNKNOWN_ERROR...), errores
+HTTP (http_500) o `timeout` (la respuesta tarda --timeout-delay segundos).
+GET /__stats devuelve las llamadas y errores servidos por endpoint.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Ruta de la API -> nombre corto del endpoint (el mismo que usan las métricas)
+ENDPOINTS = {
+    '/maps/api/geocode/json': 'geocode',
+    '/maps/api/place/nearbysearch/json': 'nearby',
+    '/maps/api/place/details/json': 'details',
+    '/maps/api/place/photo': 'photo',
+}
+
+# GIF de 1x1: basta para que la caché de fotos lo reconozca como imagen
+PHOTO_BYTES = b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+
+PAGE_SIZE = 20
+MAX_PAGES = 3
+
+NAMES = ['Cruz Verde', 'Colsubsidio', 'Pasteur', 'Farmatodo', 'La Rebaja', 'Locatel', 'Alemana', 'San Jorge']
+TYPES = {
+    'pharmacy': ['pharmacy', 'health', 'store', 'point_of_interest', 'establishment'],
+    'hospital': ['hospital', 'health', 'point_of_interest', 'establishment'],
+    'doctor': ['doctor', 'health', 'point_of_interest', 'establishment'],
+    'dentist': ['dentist', 'health', 'point_of_interest', 'establishment'],
+}
+DEFAULT_TYPES = ['health', 'point_of_interest', 'establishment']
+
+# Coordenadas de las direcciones sin grabar: alrededor de Bogotá
+DEFAULT_CENTER = (4.65, -74.08)
+
+
+class LatencyModel:
+    """Latencia lognormal con la mediana y el p95 indicados, en milisegundos"""
+
+    def __init__(self, p50_ms: float = 0.0, p95_ms: float = 0.0):
+        self.p50_ms = p50_ms
+        self.p95_ms = max(p95_ms, p50_ms)
+        self._mu = math.log(p50_ms) if p50_ms > 0 else None
+        # p95 = p50 * e^(1.645 sigma)
+        self._sigma = math.log(self.p95_ms / p50_ms) / 1.645 if p50_ms > 0 else 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        """Segundos que debe tardar una respuesta"""
+        if self._mu is None:
+            return 0.0
+        return rng.lognormvariate(self._mu, self._sigma) / 1000
+
+
+def _seed(*parts) -> int:
+    return int.from_bytes(hashlib.sha1('|'.join(map(str, parts)).encode('utf-8')).digest()[:8], 'big')
+
+
+def _place_id(seed: int) -> str:
+    return f'ChIJstub{seed % 10 ** 16:016d}'
+
+
+class StubGoogle:
+    """Respuestas grabadas o sintéticas, latencias, errores y contadores"""
+
+    def __init__(
+        self,
+        recordings: Optional[Dict[str, Dict[str, Any]]] = None,
+        latency: Optional[Dict[str, LatencyModel]] = None,
+        errors: Optional[Dict[str, Dict[str, float]]] = None,
+        timeout_delay: float = 15.0,
+        seed: int = 0,
+        record_path: Optional[str] = None,
+        upstream: str = 'https://maps.googleapis.com'
+    ):
+        """
+        Args:
+            recordings: endpoint -> clave de la consulta -> respuesta JSON
+            latency: endpoint (o '*') -> LatencyModel
+            errors: endpoint (o '*') -> código -> probabilidad
+            timeout_delay: Segundos que tarda una respuesta con error 'timeout'
+            seed: Semilla de latencias y errores
+            record_path: Grabar en este archivo las respuestas de `upstream`
+            upstream: API real a la que se reenvía en modo grabación
+        """
+        self.recordings = recordings or {}
+        self.latency = latency or {}
+        self.errors = errors or {}
+        self.timeout_delay = timeout_delay
+        self.record_path = record_path
+        self.upstream = upstream.rstrip('/')
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Lugares generados en nearby, para que details devuelva los mismos datos
+        self._places: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {}
+        self.injected: Dict[str, int] = {}
+
+    @staticmethod
+    def key(endpoint: str, params: Dict[str, str]) -> str:
+        """Clave de una consulta en las grabaciones (sin la API key)"""
+        if endpoint == 'geocode':
+            return (params.get('address') or params.get('latlng') or '').strip().lower()
+        if endpoint == 'nearby':
+            if params.get('pagetoken'):
+                return f"pagetoken:{params['pagetoken']}"
+            return f"{params.get('location', '')}|{params.get('radius', '')}|{params.get('type', '')}"
+        if endpoint == 'details':
+            return params.get('place_id') or params.get('placeid') or ''
+        return params.get('photoreference', '')
+
+    def _draw(self, endpoint: str) -> Tuple[float, Optional[str]]:
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            model = self.latency.get(endpoint) or self.latency.get('*')
+            delay = model.sample(self._rng) if model is not None else 0.0
+            error = None
+            for scope in (endpoint, '*'):
+                for code, probability in self.errors.get(scope, {}).items():
+                    if error is None and self._rng.random() < probability:
+                        error = code
+            if error is not None:
+                self.injected[f'{endpoint}:{error}'] = self.injected.get(f'{endpoint}:{error}', 0) + 1
+        return delay, error
+
+    def respond(self, path: str, query: str) -> Tuple[int, str, bytes]:
+        """Atender una consulta: (estado HTTP, Content-Type, cuerpo)"""
+        endpoint = ENDPOINTS.get(path)
+        if endpoint is None:
+            return 404, 'application/json', b'{"status":"NOT_FOUND"}'
+        params = dict(parse_qsl(query))
+        delay, error = self._draw(endpoint)
+
+        if error == 'timeout':
+            time.sleep(self.timeout_delay)
+            return 504, 'application/json', b'{}'
+        time.sleep(delay)
+        if error is not None and error.startswith('http_'):
+            return int(error[5:]), 'text/plain', b'error inyectado'
+        if error is not None:
+            return 200, 'application/json', json.dumps(
+                {'status': error, 'error_message': 'Error inyectado por el servidor de prueba', 'results': []}
+            ).encode('utf-8')
+
+        if endpoint == 'photo':
+            return 200, 'image/gif', PHOTO_BYTES
+
+        key = self.key(endpoint, params)
+        recorded = self.recordings.get(endpoint, {}).get(key)
+        if recorded is None and self.record_path:
+            recorded = self._record(endpoint, path, params, key)
+        if recorded is None:
+            recorded = self._synthetic(endpoint, params)
+        return 200, 'application/json', json.dumps(recorded, ensure_ascii=False).encode('utf-8')
+
+    def _record(self, endpoint, path, params, key):
+        url = f'{self.upstream}{path}?{urlencode(params)}'
+        with urllib.request.urlopen(url, timeout=30) as response:
+            body = json.loads(response.read())
+        with self._lock:
+            self.recordings.setdefault(endpoint, {})[key] = body
+            recordings = {name: dict(entries) for name, entries in self.recordings.items()}
+        # Sin la API key: las claves se arman solo con los parámetros de la consulta
+        with open(self.record_path, 'w', encoding='utf-8') as file:
+            json.dump(recordings, file, ensure_ascii=False)
+        return body
+
+    def _synthetic(self, endpoint: str, params: Dict[str, str]) -> Dict[str, Any]:
+        if endpoint == 'geocode':
+            return self._geocode(params)
+        if endpoint == 'nearby':
+            return self._nearby(params)
+        return self._details(params)
+
+    def _geocode(self, params):
+        address = (params.get('address') or params.get('latlng') or '').strip()
+        if not address:
+            return {'status': 'INVALID_REQUEST', 'results': []}
+        try:
+            lat, lng = (float(value) for value in address.split(','))
+        except ValueError:
+            rng = random.Random(_seed('geocode', address.lower()))
+            lat = DEFAULT_CENTER[0] + rng.uniform(-0.1, 0.1)
+            lng = DEFAULT_CENTER[1] + rng.uniform(-0.1, 0.1)
+        return {
+            'status': 'OK',
+            'results': [{
+                'formatted_address': f'{address}, Colombia',
+                'geometry': {'location': {'lat': lat, 'lng': lng}, 'location_type': 'APPROXIMATE'},
+                'place_id': _place_id(_seed('geocode', address.lower())),
+                'types': ['locality', 'political']
+            }]
+        }
+
+    def _nearby(self, params):
+        if params.get('pagetoken'):
+            base, _, page = params['pagetoken'].rpartition(':')
+            location, radius, place_type = base.split('|')
+            page = int(page)
+        else:
+            location = params.get('location', '')
+            radius = params.get('radius', '5000')
+            place_type = params.get('type', '')
+            page = 0
+        try:
+            lat, lng = (float(value) for value in location.split(','))
+        except ValueError:
+            return {'status': 'INVALID_REQUEST', 'results': []}
+
+        rng = random.Random(_seed('nearby', location, radius, place_type, page))
+        spread = min(float(radius or 5000), 50000) / 111_320
+        results = []
+        for index in range(PAGE_SIZE):
+            place_id = _place_id(_seed('place', location, radius, place_type, page, index))
+            result = {
+                'place_id': place_id,
+                'name': f'{rng.choice(NAMES)} {page * PAGE_SIZE + index + 1}',
+                'vicinity': f'Calle {rng.randint(1, 200)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}',
+                'geometry': {'location': {
+                    'lat': lat + rng.uniform(-spread, spread) / 1.5,
+                    'lng': lng + rng.uniform(-spread, spread) / 1.5
+                }},
+                'rating': round(rng.uniform(2.5, 5), 1),
+                'user_ratings_total': rng.randint(0, 2500),
+                'types': TYPES.get(place_type, [place_type] + DEFAULT_TYPES if place_type else DEFAULT_TYPES),
+                'opening_hours': {'open_now': rng.random() > 0.3},
+                'business_status': 'OPERATIONAL'
+            }
+            if rng.random() > 0.4:
+                result['photos'] = [{'photo_reference': f'stubphoto{place_id[8:]}', 'height': 400, 'width': 600}]
+            results.append(result)
+        with self._lock:
+            for result in results:
+                self._places[result['place_id']] = result
+
+        response = {'status': 'OK', 'results': results}
+        if page + 1 < MAX_PAGES:
+            response['next_page_token'] = f'{location}|{radius}|{place_type}:{page + 1}'
+        return response
+
+    def _details(self, params):
+        place_id = params.get('place_id') or params.get('placeid') or ''
+        if not place_id:
+            return {'status': 'INVALID_REQUEST'}
+        with self._lock:
+            place = self._places.get(place_id)
+        rng = random.Random(_seed('details', place_id))
+        if place is None:
+            place = {
+                'vicinity': f'Calle {rng.randint(1, 200)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}',
+                'name': f'{rng.choice(NAMES)} {rng.randint(1, 999)}',
+                'geometry': {'location': {
+                    'lat': DEFAULT_CENTER[0] + rng.uniform(-0.1, 0.1),
+                    'lng': DEFAULT_CENTER[1] + rng.uniform(-0.1, 0.1)
+                }},
+                'rating': round(rng.uniform(2.5, 5), 1),
+                'user_ratings_total': rng.randint(0, 2500),
+                'types': TYPES['pharmacy'],
+                'opening_hours': {'open_now': rng.random() > 0.3}
+            }
+        result = {
+            'place_id': place_id,
+            'name': place['name'],
+            'formatted_address': f"{place['vicinity']}, Bogotá, Colombia",
+            'geometry': place['geometry'],
+            'types': place['types'],
+            'rating': place['rating'],
+            'user_ratings_total': place['user_ratings_total'],
+            'formatted_phone_number': f'60{rng.randint(1, 9)} {rng.randint(1000000, 9999999)}',
+            'website': f'https://example.com/{place_id}',
+            'opening_hours': {
+                'open_now': place['opening_hours']['open_now'],
+                'weekday_text': [f'{day}: 8:00–20:00' for day in ('lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo')]
+            },
+            'reviews': [
+                {'author_name': f'Usuario {index}', 'rating': rng.randint(1, 5), 'text': 'Buena atención.', 'time': 1700000000 + index}
+                for index in range(5)
+            ],
+            'photos': [{'photo_reference': f'stubphoto{place_id[8:]}{index}', 'height': 400, 'width': 600} for index in range(3)]
+        }
+        fields = params.get('fields')
+        if fields:
+            # Solo los campos pedidos, como la API real ('geometry/location' -> 'geometry')
+            wanted = {field.split('/')[0] for field in fields.split(',')}
+            if 'photo' in wanted:
+                wanted.add('photos')
+            if 'type' in wanted:
+                wanted.add('types')
+            result = {name: value for name, value in result.items() if name in wanted}
+        return {'status': 'OK', 'result': result}
+
+    def stats(self) -> Dict[str, Any]:
+        """Llamadas y errores inyectados por endpoint"""
+        with self._lock:
+            return {'calls': dict(self.calls), 'injected_errors': dict(self.injected)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Atiende las rutas de la API de Google Maps y /__stats"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/__stats':
+            status, content_type, body = 200, 'application/json', json.dumps(self.server.google.stats()).encode('utf-8')
+        else:
+            status, content_type, body = self.server.google.respond(url.path, url.query)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubGoogleServer(ThreadingHTTPServer):
+    """Servidor HTTP multihilo con un StubGoogle compartido"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address=('127.0.0.1', 8090), google: Optional[StubGoogle] = None):
+        super().__init__(address, StubHandler)
+        self.google = google or StubGoogle()
+
+
+def parse_latency(values, p50_ms: float, p95_ms: float) -> Dict[str, LatencyModel]:
+    """'nearby=120:400' -> {'nearby': LatencyModel(120, 400)}, más el modelo global '*'"""
+    models = {'*': LatencyModel(p50_ms, p95_ms)}
+    for value in values or ():
+        endpoint, _, spec = value.partition('=')
+        p50, _, p95 = spec.partition(':')
+        models[endpoint] = LatencyModel(float(p50), float(p95 or p50))
+    return models
+
+
+def parse_errors(values) -> Dict[str, Dict[str, float]]:
+    """'OVER_QUERY_LIMIT=0.01' o 'details:http_500=0.02' -> {endpoint|'*': {código: probabilidad}}"""
+    errors: Dict[str, Dict[str, float]] = {}
+    for value in values or ():
+        target, _, probability = value.partition('=')
+        endpoint, _, code = target.rpartition(':')
+        errors.setdefault(endpoint or '*', {})[code] = float(probability)
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sustituto local de la API de Google Maps')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--recordings', help='JSON con respuestas grabadas (endpoint -> clave -> respuesta)')
+    parser.add_argument('--record', action='store_true', help='Grabar en --recordings lo que no esté grabado, pidiéndolo a --upstream')
+    parser.add_argument('--upstream', default='https://maps.googleapis.com')
+    parser.add_argument('--latency-p50', type=float, default=0.0, help='Mediana de la latencia en ms')
+    parser.add_argument('--latency-p95', type=float, default=0.0, help='p95 de la latencia en ms')
+    parser.add_argument('--latency', action='append', metavar='ENDPOINT=P50:P95', help='Latencia de un endpoint')
+    parser.add_argument('--error', action='append', metavar='[ENDPOINT:]CODIGO=PROB', help='Error inyectado')
+    parser.add_argument('--timeout-delay', type=float, default=15.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    recordings = {}
+    if args.recordings:
+        try:
+            with open(args.recordings, encoding='utf-8') as file:
+                recordings = json.load(file)
+        except FileNotFoundError:
+            # Al grabar, el archivo se crea con la primera respuesta
+            if not args.record:
+                raise
+
+    google = StubGoogle(
+        recordings=recordings,
+        latency=parse_latency(args.latency, args.latency_p50, args.latency_p95),
+        errors=parse_errors(args.error),
+        timeout_delay=args.timeout_delay,
+        seed=args.seed,
+        record_path=args.recordings if args.record else None,
+        upstream=args.upstream
+    )
+    server = StubGoogleServer((args.host, args.port), google)
+    recorded = sum(len(entries) for entries in recordings.values())
+    print(f"Google Maps de prueba en http://{args.host}:{args.port} ({recorded} respuestas grabadas)", flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Servidor RESP mínimo en memoria para desarrollo y pruebas locales
+
+Sustituye a Redis cuando no está instalado:
+
+    python -m benchmarks.resp_server --port 6379
+
+Solo implementa los comandos que usa RedisCache (PING, AUTH, SELECT, GET,
+SET con EX/PX, DEL, EXISTS, SCAN, DBSIZE, FLUSHDB). No persiste nada.
+"""
+import argparse
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class RespStore:
+    """Diccionario con expiración compartido por todas las conexiones"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, command, args):
+        now = time.monotonic()
+        with self._lock:
+            if command == b'PING':
+                return b'+PONG'
+            if command in (b'AUTH', b'SELECT'):
+                return b'+OK'
+            if command == b'GET':
+                return self._alive(args[0], now)
+            if command == b'SET':
+                expires_at = None
+                options = [arg.upper() for arg in args[2:]]
+                if b'EX' in options:
+                    expires_at = now + float(args[2 + options.index(b'EX') + 1])
+                if b'PX' in options:
+                    expires_at = now + float(args[2 + options.index(b'PX') + 1]) / 1000
+                self._data[args[0]] = (args[1], expires_at)
+                return b'+OK'
+            if command == b'DEL':
+                return sum(1 for key in args if self._data.pop(key, None) is not None)
+            if command == b'EXISTS':
+                return sum(1 for key in args if self._alive(key, now) is not None)
+            if command == b'SCAN':
+                pattern = b'*'
+                options = [arg.upper() for arg in args[1:]]
+                if b'MATCH' in options:
+                    pattern = args[1 + options.index(b'MATCH') + 1]
+                keys = [key for key in list(self._data) if self._alive(key, now) is not None]
+                return [b'0', [key for key in keys if fnmatch.fnmatchcase(key, pattern)]]
+            if command == b'DBSIZE':
+                return len(self._data)
+            if command == b'FLUSHDB':
+                self._data.clear()
+                return b'+OK'
+        return ValueError(f"ERR comando no soportado '{command.decode()}'")
+
+
+def encode_reply(reply) -> bytes:
+    """Codificar una respuesta en RESP2"""
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return b'-' + str(reply).encode('utf-8') + b'\r\n'
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(encode_reply(item) for item in reply)
+    if reply.startswith(b'+'):
+        return reply + b'\r\n'
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Atiende una conexión: lee comandos RESP y responde"""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if not line.startswith(b'*'):
+                continue
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2])
+            reply = self.server.store.execute(args[0].upper(), args[1:])
+            self.wfile.write(encode_reply(reply))
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """Servidor TCP multihilo con un RespStore compartido"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 6379)):
+        super().__init__(address, RespHandler)
+        self.store = RespStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor RESP en memoria (sustituto local de Redis)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+
+    server = RespServer((args.host, args.port))
+    print(f"Servidor RESP escuchando en {args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
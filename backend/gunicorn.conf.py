@@ -0,0 +1,71 @@
+"""
+Configuración de gunicorn para producción (python serve.py o gunicorn desde backend/)
+
+La clase de worker y el número de workers e hilos salen de GUNICORN_* (ver
+src/config/config.py y src/utils/serving.py). La app se carga una vez en el
+maestro (preload_app) y los workers la heredan con copy-on-write.
+"""
+import gc
+import os
+
+from src.config import Config
+from src.utils.metrics import Metrics
+from src.utils.serving import server_settings
+
+_settings = server_settings(Config)
+
+wsgi_app = _settings['wsgi_app']
+bind = Config.GUNICORN_BIND
+worker_class = _settings['worker_class']
+workers = _settings['workers']
+threads = _settings['threads']
+worker_connections = _settings['worker_connections']
+
+# Importaciones, configuración y cachés se construyen una sola vez en el maestro
+preload_app = True
+
+# timeout: un worker sin latido se reinicia. graceful_timeout: tiempo para
+# terminar las peticiones en curso (búsquedas con varias páginas de Google)
+# al recargar o detener el servidor
+timeout = Config.GUNICORN_TIMEOUT
+graceful_timeout = Config.GUNICORN_GRACEFUL_TIMEOUT
+keepalive = Config.GUNICORN_KEEPALIVE
+max_requests = Config.GUNICORN_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+
+pidfile = Config.GUNICORN_PIDFILE
+accesslog = '-'
+errorlog = '-'
+
+
+def _flask_app(wsgi):
+    # El worker uvicorn envuelve la app Flask en WsgiToAsgi
+    return getattr(wsgi, 'wsgi_application', wsgi)
+
+
+def on_starting(server):
+    # Los contadores de workers de una ejecución anterior no deben sumar en
+    # /metrics. En una recarga con USR2 los workers viejos siguen vivos
+    if not server.master_pid:
+        Metrics.from_config(Config).clear()
+
+
+def when_ready(server):
+    # App ya cargada en el maestro (preload_app): crear los servicios que
+    # se heredan tras el fork y congelar el GC para que sus pasadas no
+    # escriban en esas páginas y rompan el copy-on-write
+    registry = _flask_app(server.app.wsgi()).extensions['service_registry']
+    server.log.info(f"Servicios precargados: {', '.join(registry.preload())}")
+    server.log.info(f"Workers: {server.num_workers} x {server.cfg.worker_class_str}, hilos por worker: {server.cfg.threads}")
+    gc.collect()
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Guardar los contadores del worker antes de salir (recarga o parada).
+    # gunicorn también llama a este hook desde el maestro si el worker ya no existe
+    if worker.pid != os.getpid() or getattr(worker, 'wsgi', None) is None:
+        return
+    metrics = _flask_app(worker.wsgi).extensions.get('metrics')
+    if metrics is not None:
+        metrics.flush(force=True)
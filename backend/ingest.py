@@ -0,0 +1,54 @@
+"""
+Ingesta de exportaciones FHIR (Bulk Data $export en NDJSON o Bundles) en
+la base local que usa FHIR_BACKEND=local
+
+    python ingest.py export/                      # todos los .ndjson(.gz) del directorio
+    python ingest.py Location.ndjson List.ndjson --db instance/fhir.sqlite3
+    python ingest.py searchset.json --format bundle
+"""
+import argparse
+import logging
+import sys
+
+from src.config import Config
+from src.services.fhir_ingest import ingest
+from src.services.fhir_local_backend import LocalFHIRBackend
+from src.utils.fhir_stream import FHIRParseError
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cargar recursos FHIR en la base local de disponibilidad y stock')
+    parser.add_argument('paths', nargs='+', help='Archivos .ndjson, .json (Bundle) o .gz, o directorios de $export')
+    parser.add_argument('--db', default=Config.FHIR_LOCAL_PATH, help='Archivo SQLite de destino')
+    parser.add_argument('--format', default='auto', choices=('auto', 'ndjson', 'bundle'))
+    parser.add_argument('--batch-size', type=int, default=Config.FHIR_INGEST_BATCH, help='Recursos por transacción')
+    parser.add_argument('--quiet', action='store_true', help='No mostrar el progreso')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    def progress(report):
+        print(f"\r{report['resources']} recursos ({report['resources_per_second']}/s)", end='', file=sys.stderr)
+
+    backend = LocalFHIRBackend(args.db, place_id_system=Config.FHIR_PLACE_ID_SYSTEM)
+    try:
+        report = ingest(
+            args.paths, backend,
+            fmt=args.format,
+            batch_size=args.batch_size,
+            progress=None if args.quiet else progress
+        )
+    except (FHIRParseError, OSError) as e:
+        print(f"\nError en la ingesta: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"✅ {report['resources']} recursos de {report['files']} archivos en {report['seconds']}s "
+          f"({report['resources_per_second']} recursos/s) -> {args.db}")
+    for resource_type, count in sorted(report['by_type'].items()):
+        print(f"   {resource_type}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Servidor de producción de BuscaSalud (gunicorn con gunicorn.conf.py)
+
+    python serve.py                          # arrancar
+    python serve.py --worker-class gevent --workers 4
+    python serve.py --print-config           # ver los ajustes calculados
+    python serve.py reload                   # recarga sin cortar peticiones en curso
+
+Las opciones que no conoce se pasan a gunicorn. `reload` pide al maestro
+un reinicio con USR2 (un maestro nuevo con el código nuevo hereda el
+socket), espera a que el nuevo cargue la app y detiene el viejo con TERM:
+sus workers terminan las peticiones en curso dentro de
+GUNICORN_GRACEFUL_TIMEOUT. Con preload_app, HUP solo recicla los workers
+con la app ya cargada en el maestro, sin leer el código nuevo.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BACKEND_DIR, 'gunicorn.conf.py')
+
+
+def read_pid(path: str):
+    try:
+        with open(path, 'r', encoding='ascii') as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def reload(pidfile: str, timeout: float) -> int:
+    """Reemplazar el maestro de gunicorn sin cerrar el socket de escucha"""
+    old_pid = read_pid(pidfile)
+    if not alive(old_pid):
+        print(f"No hay un servidor en marcha ({pidfile})", file=sys.stderr)
+        return 1
+
+    os.kill(old_pid, signal.SIGUSR2)
+    # El maestro nuevo escribe <pidfile>.2 después de cargar la app (preload_app)
+    new_pidfile = f'{pidfile}.2'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        new_pid = read_pid(new_pidfile)
+        if new_pid and new_pid != old_pid and alive(new_pid):
+            os.kill(old_pid, signal.SIGTERM)
+            print(f"Maestro {new_pid} en marcha; el maestro {old_pid} termina las peticiones en curso")
+            return 0
+        time.sleep(0.2)
+
+    print(
+        f"El maestro nuevo no arrancó en {timeout:.0f}s; el maestro {old_pid} sigue atendiendo "
+        "(revisar el log de gunicorn)",
+        file=sys.stderr
+    )
+    return 1
+
+
+def main():
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    if sys.argv[1:2] == ['reload']:
+        from src.config import Config
+
+        parser = argparse.ArgumentParser(prog='serve.py reload', description='Recarga sin cortar peticiones')
+        parser.add_argument('--pidfile', default=Config.GUNICORN_PIDFILE)
+        parser.add_argument('--timeout', type=float, default=120, help='Segundos para que arranque el maestro nuevo')
+        args = parser.parse_args(sys.argv[2:])
+        sys.exit(reload(args.pidfile, args.timeout))
+
+    parser = argparse.ArgumentParser(description='Servidor de producción de BuscaSalud')
+    parser.add_argument('--worker-class', choices=['sync', 'gthread', 'gevent', 'uvicorn'])
+    parser.add_argument('--workers', type=int, help='Workers (por defecto: según CPU)')
+    parser.add_argument('--threads', type=int, help='Hilos por worker gthread (por defecto: según CPU y espera)')
+    parser.add_argument('--io-ratio', type=float, help='Fracción de cada petición esperando a Google/FHIR')
+    parser.add_argument('--bind', help='Dirección de escucha (host:puerto)')
+    args, gunicorn_args = parser.parse_known_args()
+
+    # gunicorn.conf.py lee estos valores a través de Config
+    overrides = {
+        'GUNICORN_WORKER_CLASS': args.worker_class,
+        'WEB_CONCURRENCY': args.workers,
+        'GUNICORN_THREADS': args.threads,
+        'GUNICORN_UPSTREAM_IO_RATIO': args.io_ratio,
+        'GUNICORN_BIND': args.bind,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+
+    os.makedirs('instance', exist_ok=True)
+    # gunicorn corre en este proceso: en la recarga con USR2 vuelve a
+    # ejecutar `python serve.py ...` con el mismo entorno. (`python -m
+    # gunicorn` se reejecuta como script y su paquete http tapa al de la
+    # biblioteca estándar.)
+    if '--config' not in gunicorn_args:
+        gunicorn_args = ['--config', CONFIG_FILE, *gunicorn_args]
+    sys.argv = [sys.argv[0], *gunicorn_args]
+    from gunicorn.app.wsgiapp import run
+    run()
+
+
+if __name__ == '__main__':
+    main()
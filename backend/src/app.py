@@ -1,28 +1,61 @@
 """
 Aplicación principal Flask - BuscaSalud API
 """
+import logging
 import os
 from flask import Flask, jsonify
 from flask_cors import CORS
 from .config.config import config
+from .controllers.health_controller import health_bp
 from .controllers.routes import health_places_bp
+from .services.registry import ServiceRegistry
+from .utils.metrics import init_metrics
+from .utils.response_utils import merge_vary
 
 def create_app(config_name=None):
     """
     Factory function para crear la aplicación Flask
+
+    Monta las rutas /api (búsqueda, detalles, FHIR, medicamentos) y
+    /api/places (búsqueda con filtros y orden, detalles en lote, fotos)
+    sobre el mismo registro de servicios. Los clientes y cachés se crean
+    en la primera petición que los usa, no al arrancar.
     """
     if config_name is None:
         config_name = os.getenv('FLASK_ENV', 'default')
-    
+
     app = Flask(__name__)
-    app.config.from_object(config[config_name])
-    
-    # Configurar CORS
-    CORS(app, origins=app.config['CORS_ORIGINS'])
-    
+    app.config.from_object(config.get(config_name, config['default']))
+
+    # Se registra antes que CORS para correr después (after_request va en orden inverso)
+    app.after_request(merge_vary)
+
+    # CORS - permitir requests desde el frontend
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": app.config['CORS_ORIGINS'],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"]
+        }
+    })
+
+    # Configurar logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # Spans por petición (Server-Timing) y GET /metrics; antes del registro
+    # para que los servicios cuenten llamadas y errores
+    init_metrics(app)
+
+    # Servicios compartidos por worker para las dos familias de rutas
+    ServiceRegistry(app)
+
     # Registrar blueprints
+    app.register_blueprint(health_bp)
     app.register_blueprint(health_places_bp)
-    
+
     # Rutas básicas
     @app.route('/')
     def index():
@@ -31,13 +64,17 @@ def create_app(config_name=None):
             'message': 'BuscaSalud API - Encuentra lugares de salud cerca de ti',
             'version': '1.0.0',
             'endpoints': {
+                'search': '/api/search?location=bogota&type=pharmacy&radius=5000',
+                'place_details': '/api/place/{place_id}',
                 'search_places': '/api/places/search',
-                'place_details': '/api/places/<place_id>',
+                'places_details': '/api/places/<place_id>',
                 'photo_url': '/api/places/photo',
-                'health_types': '/api/places/types'
+                'health_types': '/api/places/types',
+                'health_check': '/api/health',
+                'metrics': '/metrics'
             }
         })
-    
+
     @app.route('/health')
     def health_check():
         """Health check endpoint"""
@@ -45,7 +82,7 @@ def create_app(config_name=None):
             'status': 'healthy',
             'message': 'API funcionando correctamente'
         })
-    
+
     # Manejadores de errores
     @app.errorhandler(404)
     def not_found(error):
@@ -54,7 +91,7 @@ def create_app(config_name=None):
             'message': 'Endpoint no encontrado',
             'data': None
         }), 404
-    
+
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({
@@ -62,11 +99,12 @@ def create_app(config_name=None):
             'message': 'Error interno del servidor',
             'data': None
         }), 500
-    
+
     return app
 
 # Para desarrollo directo
 if __name__ == '__main__':
     app = create_app()
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    # Servidor de desarrollo; en producción: python serve.py
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_ENV') == 'development')
@@ -1,53 +0,0 @@
-"""
-Configuración para la aplicación Flask
-"""
-import os
-from dotenv import load_dotenv
-
-# Cargar variables de entorno desde .env
-load_dotenv()
-
-class Config:
-    """Configuración base de la aplicación"""
-    
-    # Configuración Flask
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    DEBUG = os.environ.get('FLASK_ENV') == 'development'
-    
-    # API Keys
-    GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
-    
-    # Configuración de la aplicación
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    JSON_SORT_KEYS = False
-    
-    # Configuración CORS
-    CORS_ORIGINS = ['http://localhost:5173', 'http://localhost:3000']
-    
-    @staticmethod
-    def validate_config():
-        """Validar que las configuraciones requeridas estén presentes"""
-        required_vars = ['GOOGLE_MAPS_API_KEY']
-        missing_vars = []
-        
-        for var in required_vars:
-            if not os.environ.get(var):
-                missing_vars.append(var)
-        
-        if missing_vars:
-            raise ValueError(f"Variables de entorno faltantes: {', '.join(missing_vars)}")
-
-class DevelopmentConfig(Config):
-    """Configuración para desarrollo"""
-    DEBUG = True
-
-class ProductionConfig(Config):
-    """Configuración para producción"""
-    DEBUG = False
-
-# Configuración por defecto
-config = {
-    'development': DevelopmentConfig,
-    'production': ProductionConfig,
-    'default': DevelopmentConfig
-}
\ No newline at end of file
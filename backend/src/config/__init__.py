@@ -0,0 +1,2 @@
+# Configuración
+from .config import Config, DevelopmentConfig, ProductionConfig, config
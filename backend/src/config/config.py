@@ -1,31 +1,182 @@
 """
-Configuración de la aplicación Flask
+Configuración para la aplicación Flask
 """
 import os
 from dotenv import load_dotenv
 
-# Cargar variables de entorno
+# Cargar variables de entorno desde .env
 load_dotenv()
 
 class Config:
-    """Configuración base"""
+    """Configuración base de la aplicación"""
+    
+    # Configuración Flask
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY') or 'your-api-key-here'
+    DEBUG = os.environ.get('FLASK_ENV') == 'development'
+    
+    # API Keys
+    GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
+
+    # Pool HTTP del cliente de Google Maps (uno por worker)
+    GOOGLE_MAPS_POOL_CONNECTIONS = int(os.environ.get('GOOGLE_MAPS_POOL_CONNECTIONS', 10))
+    GOOGLE_MAPS_POOL_MAXSIZE = int(os.environ.get('GOOGLE_MAPS_POOL_MAXSIZE', 20))
+    GOOGLE_MAPS_KEEP_ALIVE = os.environ.get('GOOGLE_MAPS_KEEP_ALIVE', 'true').lower() == 'true'
+    GOOGLE_MAPS_CONNECT_TIMEOUT = float(os.environ.get('GOOGLE_MAPS_CONNECT_TIMEOUT', 3))
+    GOOGLE_MAPS_READ_TIMEOUT = float(os.environ.get('GOOGLE_MAPS_READ_TIMEOUT', 10))
+    GOOGLE_MAPS_RETRY_TIMEOUT = int(os.environ.get('GOOGLE_MAPS_RETRY_TIMEOUT', 60))
+    GOOGLE_MAPS_COALESCE = os.environ.get('GOOGLE_MAPS_COALESCE', 'true').lower() == 'true'
+    # URL base alternativa de la API (servidor de prueba de los benchmarks); vacía: Google
+    GOOGLE_MAPS_BASE_URL = os.environ.get('GOOGLE_MAPS_BASE_URL', '')
+
+    # Límites de llamadas a Google: token bucket compartido por el host
+    # (llamadas/s, 0 desactiva) y concurrencia adaptativa por worker
+    GOOGLE_MAPS_RATE_LIMIT = float(os.environ.get('GOOGLE_MAPS_RATE_LIMIT', 50))
+    GOOGLE_MAPS_RATE_BURST = float(os.environ.get('GOOGLE_MAPS_RATE_BURST', 100))
+    GOOGLE_MAPS_RATE_LIMIT_FILE = os.environ.get('GOOGLE_MAPS_RATE_LIMIT_FILE', 'instance/google_rate_limit.bin')
+    GOOGLE_MAPS_MAX_CONCURRENCY = int(os.environ.get('GOOGLE_MAPS_MAX_CONCURRENCY', 20))
+    GOOGLE_MAPS_MIN_CONCURRENCY = int(os.environ.get('GOOGLE_MAPS_MIN_CONCURRENCY', 2))
+    GOOGLE_MAPS_LATENCY_TARGET_MS = float(os.environ.get('GOOGLE_MAPS_LATENCY_TARGET_MS', 2000))
+    GOOGLE_MAPS_QUEUE_TIMEOUT = float(os.environ.get('GOOGLE_MAPS_QUEUE_TIMEOUT', 2))
+
+    # Circuit breaker, plazo máximo (segundos) y hedging por endpoint de Google
+    GOOGLE_MAPS_CIRCUIT_BREAKER = os.environ.get('GOOGLE_MAPS_CIRCUIT_BREAKER', 'true').lower() == 'true'
+    GOOGLE_MAPS_BREAKER_FAILURES = int(os.environ.get('GOOGLE_MAPS_BREAKER_FAILURES', 5))
+    GOOGLE_MAPS_BREAKER_RECOVERY = float(os.environ.get('GOOGLE_MAPS_BREAKER_RECOVERY', 30))
+    GOOGLE_MAPS_TIMEOUT_GEOCODE = float(os.environ.get('GOOGLE_MAPS_TIMEOUT_GEOCODE', 5))
+    GOOGLE_MAPS_TIMEOUT_NEARBY = float(os.environ.get('GOOGLE_MAPS_TIMEOUT_NEARBY', 8))
+    GOOGLE_MAPS_TIMEOUT_DETAILS = float(os.environ.get('GOOGLE_MAPS_TIMEOUT_DETAILS', 5))
+    GOOGLE_MAPS_TIMEOUT_PHOTO = float(os.environ.get('GOOGLE_MAPS_TIMEOUT_PHOTO', 10))
+    GOOGLE_MAPS_GUARD_WORKERS = int(os.environ.get('GOOGLE_MAPS_GUARD_WORKERS', 32))
+    GOOGLE_MAPS_HEDGE = os.environ.get('GOOGLE_MAPS_HEDGE', 'false').lower() == 'true'
+    GOOGLE_MAPS_HEDGE_PERCENTILE = float(os.environ.get('GOOGLE_MAPS_HEDGE_PERCENTILE', 95))
+    GOOGLE_MAPS_HEDGE_MIN_DELAY_MS = float(os.environ.get('GOOGLE_MAPS_HEDGE_MIN_DELAY_MS', 50))
+    GOOGLE_MAPS_HEDGE_BUDGET = float(os.environ.get('GOOGLE_MAPS_HEDGE_BUDGET', 0.1))
+
+    # Backend de las cachés de geocodificación, búsquedas y detalles:
+    # memory (por worker), sqlite (compartida en el host) o redis
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', 'instance/cache.sqlite3')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_REDIS_TIMEOUT = float(os.environ.get('CACHE_REDIS_TIMEOUT', 0.5))
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'buscasalud')
+
+    # Caché de geocodificación (segundos / número de entradas)
+    GEOCODE_CACHE_TTL = int(os.environ.get('GEOCODE_CACHE_TTL', 86400))
+    GEOCODE_CACHE_NEGATIVE_TTL = int(os.environ.get('GEOCODE_CACHE_NEGATIVE_TTL', 600))
+    GEOCODE_CACHE_MAX_ENTRIES = int(os.environ.get('GEOCODE_CACHE_MAX_ENTRIES', 5000))
+
+    # Caché espacial de búsquedas cercanas (celdas geohash)
+    NEARBY_CACHE_TTL = int(os.environ.get('NEARBY_CACHE_TTL', 600))
+    NEARBY_CACHE_MAX_ENTRIES = int(os.environ.get('NEARBY_CACHE_MAX_ENTRIES', 2000))
+
+    # Índice espacial local de lugares (modo local_first)
+    PLACE_INDEX_PATH = os.environ.get('PLACE_INDEX_PATH', 'instance/place_index.json')
+    PLACE_INDEX_COVERAGE_TTL = int(os.environ.get('PLACE_INDEX_COVERAGE_TTL', 86400))
+    PLACE_INDEX_MIN_RESULTS = int(os.environ.get('PLACE_INDEX_MIN_RESULTS', 5))
+    PLACE_INDEX_SAVE_INTERVAL = int(os.environ.get('PLACE_INDEX_SAVE_INTERVAL', 60))
+
+    # Puntuación compuesta de /api/places/search?sort=score (pesos de cada criterio)
+    PLACES_RANK_WEIGHT_DISTANCE = float(os.environ.get('PLACES_RANK_WEIGHT_DISTANCE', 0.4))
+    PLACES_RANK_WEIGHT_RATING = float(os.environ.get('PLACES_RANK_WEIGHT_RATING', 0.35))
+    PLACES_RANK_WEIGHT_OPEN = float(os.environ.get('PLACES_RANK_WEIGHT_OPEN', 0.15))
+    PLACES_RANK_WEIGHT_POPULARITY = float(os.environ.get('PLACES_RANK_WEIGHT_POPULARITY', 0.1))
+
+    # Fragmentos JSON de lugares ya serializados (se reutilizan entre respuestas)
+    JSON_FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('JSON_FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+
+    # Caché de detalles (fresco / servido vencido mientras se refresca) y batch
+    DETAILS_CACHE_TTL = int(os.environ.get('DETAILS_CACHE_TTL', 3600))
+    DETAILS_CACHE_STALE_TTL = int(os.environ.get('DETAILS_CACHE_STALE_TTL', 86400))
+    DETAILS_CACHE_MAX_ENTRIES = int(os.environ.get('DETAILS_CACHE_MAX_ENTRIES', 5000))
+    DETAILS_BATCH_MAX_IDS = int(os.environ.get('DETAILS_BATCH_MAX_IDS', 20))
+    DETAILS_BATCH_WORKERS = int(os.environ.get('DETAILS_BATCH_WORKERS', 8))
+
+    # Caché de fotos en disco (proxy /photo)
+    PHOTO_CACHE_DIR = os.environ.get('PHOTO_CACHE_DIR', 'instance/photos')
+    PHOTO_CACHE_MAX_BYTES = int(os.environ.get('PHOTO_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    PHOTO_CACHE_MAX_AGE = int(os.environ.get('PHOTO_CACHE_MAX_AGE', 604800))
+
+    # Caché HTTP de las respuestas JSON (ETag y Cache-Control, en segundos):
+    # tipos y catálogos HL7, detalles de un lugar y búsquedas
+    HTTP_CACHE_STATIC_MAX_AGE = int(os.environ.get('HTTP_CACHE_STATIC_MAX_AGE', 86400))
+    HTTP_CACHE_STATIC_STALE_WHILE_REVALIDATE = int(os.environ.get('HTTP_CACHE_STATIC_STALE_WHILE_REVALIDATE', 604800))
+    HTTP_CACHE_DETAILS_MAX_AGE = int(os.environ.get('HTTP_CACHE_DETAILS_MAX_AGE', 600))
+    HTTP_CACHE_DETAILS_STALE_WHILE_REVALIDATE = int(os.environ.get('HTTP_CACHE_DETAILS_STALE_WHILE_REVALIDATE', 3600))
+    HTTP_CACHE_SEARCH_MAX_AGE = int(os.environ.get('HTTP_CACHE_SEARCH_MAX_AGE', 60))
+    HTTP_CACHE_SEARCH_STALE_WHILE_REVALIDATE = int(os.environ.get('HTTP_CACHE_SEARCH_STALE_WHILE_REVALIDATE', 300))
+
+    # Snapshots FHIR de disponibilidad y stock (refresco en segundo plano)
+    FHIR_SNAPSHOT_REFRESH = float(os.environ.get('FHIR_SNAPSHOT_REFRESH', 60))
+    FHIR_SNAPSHOT_IDLE_TTL = float(os.environ.get('FHIR_SNAPSHOT_IDLE_TTL', 3600))
+    FHIR_SNAPSHOT_MAX_ENTRIES = int(os.environ.get('FHIR_SNAPSHOT_MAX_ENTRIES', 5000))
+    FHIR_BULK_MAX_IDS = int(os.environ.get('FHIR_BULK_MAX_IDS', 60))
+
+    # Backend FHIR: 'simulated' (datos aleatorios), 'http' (servidor FHIR R4) o 'local' (ingest.py)
+    FHIR_BACKEND = os.environ.get('FHIR_BACKEND', 'simulated')
+    FHIR_SERVER_URL = os.environ.get('FHIR_SERVER_URL', 'http://localhost:8080/fhir')
+    FHIR_AUTH_TOKEN = os.environ.get('FHIR_AUTH_TOKEN', '')
+    FHIR_TIMEOUT = float(os.environ.get('FHIR_TIMEOUT', 5))
+    FHIR_POOL_MAXSIZE = int(os.environ.get('FHIR_POOL_MAXSIZE', 10))
+    FHIR_BATCH_CHUNK = int(os.environ.get('FHIR_BATCH_CHUNK', 20))
+    FHIR_PLACE_ID_SYSTEM = os.environ.get('FHIR_PLACE_ID_SYSTEM', 'https://maps.google.com/place_id')
+    FHIR_LOCAL_PATH = os.environ.get('FHIR_LOCAL_PATH', 'instance/fhir.sqlite3')
+    FHIR_INGEST_BATCH = int(os.environ.get('FHIR_INGEST_BATCH', 1000))
+
+    # Búsqueda de medicamentos en farmacias cercanas (/api/medications/search)
+    MEDICATION_SEARCH_MAX_RESULTS = int(os.environ.get('MEDICATION_SEARCH_MAX_RESULTS', 20))
+
+    # Métricas (/metrics): directorio donde cada worker deja sus contadores
+    # (vacío: solo el worker que responde) y segundos entre escrituras
+    METRICS_DIR = os.environ.get('METRICS_DIR', 'instance/metrics')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+    # Servidor de producción (gunicorn.conf.py / python serve.py). Workers e
+    # hilos en 0 se calculan con los CPU y la fracción de cada petición que
+    # se pasa esperando a Google/FHIR (GUNICORN_UPSTREAM_IO_RATIO)
+    GUNICORN_BIND = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+    GUNICORN_WORKER_CLASS = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    GUNICORN_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 0))
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 0))
+    GUNICORN_UPSTREAM_IO_RATIO = float(os.environ.get('GUNICORN_UPSTREAM_IO_RATIO', 0.8))
+    GUNICORN_TIMEOUT = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+    GUNICORN_GRACEFUL_TIMEOUT = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+    GUNICORN_KEEPALIVE = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+    GUNICORN_MAX_REQUESTS = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+    GUNICORN_PIDFILE = os.environ.get('GUNICORN_PIDFILE', 'instance/gunicorn.pid')
+
+    # Configuración de la aplicación
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    JSON_SORT_KEYS = False
+    
+    # Configuración CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:5173,http://localhost:3000').split(',')
+    
+    @staticmethod
+    def validate_config():
+        """Validar que las configuraciones requeridas estén presentes"""
+        required_vars = ['GOOGLE_MAPS_API_KEY']
+        missing_vars = []
+        
+        for var in required_vars:
+            if not os.environ.get(var):
+                missing_vars.append(var)
+        
+        if missing_vars:
+            raise ValueError(f"Variables de entorno faltantes: {', '.join(missing_vars)}")
 
 class DevelopmentConfig(Config):
-    """Configuración de desarrollo"""
+    """Configuración para desarrollo"""
     DEBUG = True
     FLASK_ENV = 'development'
 
 class ProductionConfig(Config):
-    """Configuración de producción"""
+    """Configuración para producción"""
     DEBUG = False
     FLASK_ENV = 'production'
 
-# Configuración por defecto
+# Configuración por defecto (sin FLASK_ENV): la base, con DEBUG según FLASK_ENV
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
-    'default': DevelopmentConfig
+    'default': Config
 }
\ No newline at end of file
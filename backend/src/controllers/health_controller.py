@@ -1,46 +1,91 @@
 """
 Controlador para endpoints relacionados con lugares de salud
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_cors import cross_origin
-from src.services.google_maps_service import GoogleMapsService
 from src.services.fhir_service import FHIRService
-from src.utils.validators import validate_search_params
+from src.services.fhir_http_backend import FHIRServerError
+from src.services.photo_cache import InvalidPhotoError
+from src.services.registry import get_registry
+from src.services.upstream_limits import UpstreamThrottled, busy_result
+from src.utils.validators import (
+    validate_search_params, validate_max_results,
+    validate_detail_groups, parse_detail_groups, validate_photo_reference,
+    validate_place_id, validate_place_ids, parse_place_ids, validate_medication_search
+)
+from src.utils.response_utils import (
+    ndjson_response, cached_file_response, json_bytes_response, cache_policy, version_etag, not_modified
+)
+from src.utils.metrics import span
+from src.utils.lazy_import import lazy_import
 import logging
 
+googlemaps = lazy_import('googlemaps')
+
 health_bp = Blueprint('health', __name__, url_prefix='/api')
 fhir_service = FHIRService()
 logger = logging.getLogger(__name__)
 
+def _json_result(result, status_code=200):
+    """Responder un resultado con jsonify, midiendo la serialización (span 'serialization')"""
+    with span('serialization'):
+        return jsonify(result), status_code
+
+def _error_result(result):
+    """Responder un resultado con 'error' de los servicios (503 + Retry-After si falta cupo)"""
+    response = jsonify(result)
+    if 'retry_after' in result:
+        response.headers['Retry-After'] = str(result['retry_after'])
+        return response, 503
+    return response, 400
+
 @health_bp.route('/search', methods=['GET'])
 @cross_origin()
+@cache_policy('search')
 def search_health_places():
-    """Buscar lugares de salud cerca de una ubicación"""
+    """
+    Buscar lugares de salud cerca de una ubicación
+    
+    max_results (hasta 60) sigue next_page_token. Con stream=ndjson cada
+    página se envía como una línea JSON en cuanto llega de Google.
+    """
     try:
         # Obtener parámetros de la URL
         location = request.args.get('location', '').strip()
         place_type = request.args.get('type', 'pharmacy')
         radius = request.args.get('radius', '5000')
+        max_results = request.args.get('max_results', '20')
+        stream = request.args.get('stream', '')
         
-        logger.info(f"Búsqueda: location={location}, type={place_type}, radius={radius}")
+        logger.info(f"Búsqueda: location={location}, type={place_type}, radius={radius}, max_results={max_results}")
         
         # Validar parámetros
-        is_valid, error_msg = validate_search_params(location, place_type, radius)
+        with span('validation'):
+            is_valid, error_msg = validate_search_params(location, place_type, radius)
+            if is_valid:
+                is_valid, error_msg = validate_max_results(max_results)
         if not is_valid:
             return jsonify({'error': error_msg}), 400
         
-        # Convertir radio a entero
+        # Convertir a enteros
         radius = int(radius)
+        max_results = int(max_results)
         
-        # Usar el servicio de Google Maps
-        maps_service = GoogleMapsService()
-        result = maps_service.search_health_places(location, place_type, radius)
+        # Usar el servicio de Google Maps compartido del worker
+        maps_service = get_registry().maps_service
+        
+        if stream == 'ndjson':
+            return ndjson_response(
+                maps_service.iter_search_events(location, place_type, radius, max_results)
+            )
+        
+        result = maps_service.search_health_places(location, place_type, radius, max_results)
         
         if 'error' in result:
-            return jsonify(result), 400
+            return _error_result(result)
             
         logger.info(f"Encontrados {len(result.get('places', []))} lugares")
-        return jsonify(result)
+        return _json_result(result)
         
     except ValueError as e:
         logger.error(f"Error de valor en búsqueda: {str(e)}")
@@ -49,23 +94,75 @@ def search_health_places():
         logger.error(f"Error inesperado en búsqueda: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
-@health_bp.route('/place/<place_id>', methods=['GET'])
+@health_bp.route('/search/enriched', methods=['GET'])
 @cross_origin()
+@cache_policy('search')
+def search_health_places_enriched():
+    """Buscar lugares de salud e incluir disponibilidad/stock FHIR de cada uno"""
+    try:
+        location = request.args.get('location', '').strip()
+        place_type = request.args.get('type', 'pharmacy')
+        radius = request.args.get('radius', '5000')
+        
+        logger.info(f"Búsqueda enriquecida: location={location}, type={place_type}, radius={radius}")
+        
+        with span('validation'):
+            is_valid, error_msg = validate_search_params(location, place_type, radius)
+        if not is_valid:
+            return jsonify({'error': error_msg}), 400
+        
+        search_service = get_registry().enriched_search_service
+        result = search_service.search_health_places(location, place_type, int(radius))
+        
+        if 'error' in result:
+            return _error_result(result)
+        
+        return _json_result(result)
+        
+    except Exception as e:
+        logger.error(f"Error inesperado en búsqueda enriquecida: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@health_bp.route('/place/<place_id>', methods=['GET'])
+@cross_origin(expose_headers=['X-Cache-Source'])
+@cache_policy('details')
 def get_place_details(place_id):
-    """Obtener detalles completos de un lugar específico"""
+    """
+    Obtener detalles de un lugar específico
+    
+    ?fields=contact,hours limita los campos (basic, contact, hours, rating,
+    reviews, photos); por defecto se devuelven todos.
+    """
     try:
         if not place_id:
             return jsonify({'error': 'ID de lugar requerido'}), 400
+        
+        fields = request.args.get('fields', '')
+        with span('validation'):
+            is_valid, error_msg = validate_detail_groups(fields)
+        if not is_valid:
+            return jsonify({'error': error_msg}), 400
             
         logger.info(f"Obteniendo detalles para place_id: {place_id}")
         
-        maps_service = GoogleMapsService()
-        result = maps_service.get_place_details(place_id)
+        maps_service = get_registry().maps_service
+        result, source, version = maps_service.get_place_details(place_id, parse_detail_groups(fields))
         
         if 'error' in result:
-            return jsonify(result), 400
-            
-        return jsonify(result)
+            return _error_result(result)
+        
+        # El origen (cache, stale, google) va en un encabezado: en el cuerpo
+        # cambiaría el ETag entre la primera petición y las siguientes. La
+        # versión de la entrada de caché identifica el cuerpo, así que si el
+        # cliente ya la tiene se responde 304 sin serializar
+        etag = version_etag('place', place_id, version) if version else None
+        response = not_modified(etag) if etag else None
+        if response is None:
+            response, _ = _json_result(result)
+            if etag:
+                response.set_etag(etag)
+        response.headers['X-Cache-Source'] = source
+        return response
         
     except Exception as e:
         logger.error(f"Error obteniendo detalles del lugar: {str(e)}")
@@ -74,16 +171,57 @@ def get_place_details(place_id):
 @health_bp.route('/photo/<photo_reference>', methods=['GET'])
 @cross_origin()
 def get_place_photo(photo_reference):
-    """Obtener URL de una foto de Google Places"""
+    """Obtener la URL (servida por este backend) de una foto de Google Places"""
     try:
-        if not photo_reference:
-            return jsonify({'error': 'Referencia de foto requerida'}), 400
-            
-        maps_service = GoogleMapsService()
-        result = maps_service.get_photo_url(photo_reference)
+        is_valid, error_msg = validate_photo_reference(photo_reference)
+        if not is_valid:
+            return jsonify({'error': error_msg}), 400
+        
+        width = int(request.args.get('width', 400))
+        url = url_for('health.get_place_photo_image', photo_reference=photo_reference, width=width)
         
-        return jsonify(result)
+        return jsonify({'url': url})
         
+    except ValueError:
+        return jsonify({'error': 'Ancho debe ser un número válido'}), 400
+    except Exception as e:
+        logger.error(f"Error obteniendo foto: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@health_bp.route('/photo/<photo_reference>/image', methods=['GET'])
+@cross_origin()
+def get_place_photo_image(photo_reference):
+    """
+    Servir los bytes de una foto desde la caché en disco
+    
+    ?width= se redondea a 100, 200, 400, 800 o 1600 px. Responde con ETag y
+    Cache-Control, y 304 si el cliente ya tiene la imagen.
+    """
+    try:
+        is_valid, error_msg = validate_photo_reference(photo_reference)
+        if not is_valid:
+            return jsonify({'error': error_msg}), 400
+        
+        width = int(request.args.get('width', 400))
+        if not 1 <= width <= 1600:
+            return jsonify({'error': 'El ancho debe estar entre 1 y 1600'}), 400
+        
+        maps_service = get_registry().maps_service
+        path, etag, mimetype = maps_service.get_photo(photo_reference, width)
+        
+        return cached_file_response(
+            path, mimetype, etag, current_app.config.get('PHOTO_CACHE_MAX_AGE', 604800)
+        )
+        
+    except ValueError:
+        return jsonify({'error': 'Ancho debe ser un número válido'}), 400
+    except UpstreamThrottled as e:
+        return _error_result(busy_result(e))
+    except (InvalidPhotoError, googlemaps.exceptions.ApiError):
+        return jsonify({'error': 'Foto no encontrada'}), 404
+    except googlemaps.exceptions.TransportError as e:
+        logger.error(f"Error descargando foto: {str(e)}")
+        return jsonify({'error': 'Error descargando la foto'}), 502
     except Exception as e:
         logger.error(f"Error obteniendo foto: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -91,32 +229,80 @@ def get_place_photo(photo_reference):
 @health_bp.route('/health', methods=['GET'])
 @cross_origin()
 def health_check():
-    """Verificación de salud de la API"""
+    """
+    Verificación de salud de la API
+    
+    status es 'degraded' si algún circuit breaker de Google está abierto.
+    """
+    stats = get_registry().stats()
+    breakers = stats.get('circuit_breakers') or {}
+    degraded = any(breaker['state'] != 'closed' for breaker in breakers.values())
     return jsonify({
-        'status': 'healthy',
+        'status': 'degraded' if degraded else 'healthy',
         'service': 'BuscaSalud API',
         'version': '1.0.0',
         'endpoints': {
             'search': '/api/search',
+            'search_enriched': '/api/search/enriched',
             'place_details': '/api/place/{place_id}',
             'photo': '/api/photo/{photo_reference}',
+            'photo_image': '/api/photo/{photo_reference}/image',
             'fhir_availability': '/api/fhir/availability/{place_id}',
+            'fhir_availability_bulk': '/api/fhir/availability?ids={place_id},...',
             'pharmacy_stock': '/api/fhir/pharmacy/{place_id}/stock',
+            'pharmacy_stock_bulk': '/api/fhir/pharmacy/stock?ids={place_id},...',
+            'medication_search': '/api/medications/search?q={medicamento}&lat={lat}&lng={lng}&radius={m}',
             'hl7_services': '/api/hl7/services/{place_type}'
         },
-        'standards': ['FHIR 4.0.1', 'HL7 2.8']
+        'standards': ['FHIR 4.0.1', 'HL7 2.8'],
+        'stats': stats
     })
 
+def _snapshot_response(kind, place_id):
+    """Responder el snapshot FHIR de un lugar ({'success': True, 'data': ...})"""
+    with span('validation'):
+        is_valid, error_msg = validate_place_id(place_id)
+    if not is_valid:
+        return jsonify({'error': error_msg}), 400
+    snapshot = get_registry().fhir_store.get(kind, place_id)
+    if snapshot.data is None:
+        return jsonify({'error': 'Sin datos FHIR para este lugar'}), 404
+    return json_bytes_response(b'{"success":true,"data":' + snapshot.payload + b'}')
+
+def _bulk_snapshot_response(kind):
+    """Responder los snapshots FHIR de ?ids=a,b,c como {'success': True, 'data': {id: ...}}"""
+    ids_param = request.args.get('ids', '')
+    with span('validation'):
+        is_valid, error_msg = validate_place_ids(ids_param, current_app.config.get('FHIR_BULK_MAX_IDS', 60))
+    if not is_valid:
+        return jsonify({'error': error_msg}), 400
+    return json_bytes_response(get_registry().fhir_store.response_body(kind, parse_place_ids(ids_param)))
+
+@health_bp.route('/fhir/availability', methods=['GET'])
+@cross_origin()
+def get_fhir_availability_bulk():
+    """Obtener la disponibilidad FHIR de varios lugares (?ids=a,b,c) en una petición"""
+    try:
+        return _bulk_snapshot_response('availability')
+    except FHIRServerError as e:
+        logger.error(f"Servidor FHIR no disponible: {str(e)}")
+        return jsonify({'error': 'Servidor FHIR no disponible'}), 502
+    except Exception as e:
+        logger.error(f"Error al obtener disponibilidad FHIR: {str(e)}")
+        return jsonify({
+            'error': 'Error al consultar disponibilidad',
+            'message': str(e)
+        }), 500
+
 @health_bp.route('/fhir/availability/<place_id>', methods=['GET'])
 @cross_origin()
 def get_fhir_availability(place_id):
     """Obtener disponibilidad usando estándares FHIR"""
     try:
-        availability = fhir_service.get_hospital_availability(place_id)
-        return jsonify({
-            'success': True,
-            'data': availability
-        }), 200
+        return _snapshot_response('availability', place_id)
+    except FHIRServerError as e:
+        logger.error(f"Servidor FHIR no disponible: {str(e)}")
+        return jsonify({'error': 'Servidor FHIR no disponible'}), 502
     except Exception as e:
         logger.error(f"Error al obtener disponibilidad FHIR: {str(e)}")
         return jsonify({
@@ -124,16 +310,31 @@ def get_fhir_availability(place_id):
             'message': str(e)
         }), 500
 
+@health_bp.route('/fhir/pharmacy/stock', methods=['GET'])
+@cross_origin()
+def get_pharmacy_stock_bulk():
+    """Obtener el stock FHIR de varias farmacias (?ids=a,b,c) en una petición"""
+    try:
+        return _bulk_snapshot_response('stock')
+    except FHIRServerError as e:
+        logger.error(f"Servidor FHIR no disponible: {str(e)}")
+        return jsonify({'error': 'Servidor FHIR no disponible'}), 502
+    except Exception as e:
+        logger.error(f"Error al obtener stock FHIR: {str(e)}")
+        return jsonify({
+            'error': 'Error al consultar stock',
+            'message': str(e)
+        }), 500
+
 @health_bp.route('/fhir/pharmacy/<place_id>/stock', methods=['GET'])
 @cross_origin()
 def get_pharmacy_stock(place_id):
     """Obtener stock de farmacia usando FHIR"""
     try:
-        stock = fhir_service.get_pharmacy_stock(place_id)
-        return jsonify({
-            'success': True,
-            'data': stock
-        }), 200
+        return _snapshot_response('stock', place_id)
+    except FHIRServerError as e:
+        logger.error(f"Servidor FHIR no disponible: {str(e)}")
+        return jsonify({'error': 'Servidor FHIR no disponible'}), 502
     except Exception as e:
         logger.error(f"Error al obtener stock FHIR: {str(e)}")
         return jsonify({
@@ -141,8 +342,49 @@ def get_pharmacy_stock(place_id):
             'message': str(e)
         }), 500
 
+@health_bp.route('/medications/search', methods=['GET'])
+@cross_origin()
+def search_medications():
+    """
+    Buscar farmacias cercanas con un medicamento en stock
+    
+    ?q= es el nombre o código del medicamento (sin tildes ni mayúsculas,
+    admite prefijos como "amoxi"). Solo se consideran las farmacias que ya
+    aparecieron en alguna búsqueda; se ordenan por distancia.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        lat = request.args.get('lat', '')
+        lng = request.args.get('lng', '')
+        radius = request.args.get('radius', '5000')
+        
+        with span('validation'):
+            is_valid, error_msg = validate_medication_search(query, lat, lng, radius)
+        if not is_valid:
+            return jsonify({'error': error_msg}), 400
+        
+        results = get_registry().medication_index.search(
+            query, float(lat), float(lng), int(radius),
+            limit=current_app.config.get('MEDICATION_SEARCH_MAX_RESULTS', 20)
+        )
+        return _json_result({
+            'success': True,
+            'data': {
+                'query': query,
+                'pharmacies': results,
+                'total': len(results)
+            }
+        })
+    except FHIRServerError as e:
+        logger.error(f"Servidor FHIR no disponible: {str(e)}")
+        return jsonify({'error': 'Servidor FHIR no disponible'}), 502
+    except Exception as e:
+        logger.error(f"Error en búsqueda de medicamentos: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
 @health_bp.route('/hl7/services/<place_type>', methods=['GET'])
 @cross_origin()
+@cache_policy('static')
 def get_hl7_services(place_type):
     """Obtener servicios disponibles usando HL7"""
     try:
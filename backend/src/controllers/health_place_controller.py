@@ -1,101 +1,305 @@
 """
 Controlador para lugares de salud
 """
-from flask import request, jsonify
-from ..services.google_places_service import GooglePlacesService
-from ..utils.response_utils import success_response, error_response
+from flask import current_app, request, jsonify, url_for
+from ..models.health_place import HEALTH_PLACE_TYPES
+from ..models.place_batch import PlaceBatch
+from ..services.photo_cache import InvalidPhotoError
+from ..services.registry import get_registry
+from ..services.upstream_limits import UpstreamThrottled
+from ..utils.json_codec import extend_object
+from ..utils.lazy_import import lazy_import
+from ..utils.metrics import span
+from ..utils.response_utils import (
+    success_response, error_response, pagination_response, cached_file_response, throttled_response,
+    version_etag, not_modified
+)
+from ..utils.validators import (
+    validate_place_id, validate_detail_groups, parse_detail_groups, validate_photo_reference,
+    validate_ranking_params, parse_bool_param
+)
+
+googlemaps = lazy_import('googlemaps')
 
 class HealthPlaceController:
-    """Controlador para manejar las operaciones de lugares de salud"""
+    """
+    Controlador para manejar las operaciones de lugares de salud
+    
+    El servicio de lugares y el ranker vienen del registro de servicios
+    de la app (mismo cliente de Google y cachés que las rutas /api) y se
+    crean en la primera petición.
+    """
+    
+    @property
+    def fragments(self):
+        return get_registry().json_fragments
+    
+    @property
+    def places_service(self):
+        return get_registry().places_service
     
-    def __init__(self):
-        self.places_service = GooglePlacesService()
+    @property
+    def ranker(self):
+        return get_registry().place_ranker
     
     def search_places(self):
         """
         Endpoint para buscar lugares de salud
-        GET /api/places/search?location=...&type=...&radius=...
+        GET /api/places/search?location=...&type=...&radius=...&mode=...&page=...&per_page=...
+        
+        mode=local_first responde desde el índice local de lugares cuando la
+        zona tiene cobertura reciente, y solo consulta Google si no la tiene.
+        
+        page/per_page paginan sobre los resultados de Google (hasta 60,
+        siguiendo next_page_token); max_results fija cuántos se piden.
+        
+        open_now, min_rating y max_distance filtran los resultados y sort
+        (relevance, distance, rating o score) los ordena; cada lugar incluye
+        distance_m desde la ubicación buscada.
         """
         try:
             # Obtener parámetros de la petición
             location = request.args.get('location', '').strip()
             place_type = request.args.get('type', 'pharmacy')
             radius = int(request.args.get('radius', 5000))
+            mode = request.args.get('mode', 'google')
+            page = int(request.args.get('page', 1))
+            per_page = int(request.args.get('per_page', 20))
+            max_results = int(request.args.get('max_results', min(page * per_page, 60)))
+            open_now = request.args.get('open_now', '')
+            min_rating = request.args.get('min_rating', '')
+            max_distance = request.args.get('max_distance', '')
+            sort = request.args.get('sort', 'relevance')
             
             # Validar parámetros
-            if not location:
-                return error_response('Ubicación requerida', 400)
+            with span('validation'):
+                if not location:
+                    return error_response('Ubicación requerida', 400)
+            
+                if mode not in ('google', 'local_first'):
+                    return error_response('Modo inválido. Modos válidos: google, local_first', 400)
+            
+                if radius > 50000:  # Límite de 50km
+                    return error_response('Radio máximo permitido: 50km', 400)
+            
+                if page < 1 or not 1 <= per_page <= 60:
+                    return error_response('page debe ser >= 1 y per_page entre 1 y 60', 400)
+            
+                if not 1 <= max_results <= 60:
+                    return error_response('max_results debe estar entre 1 y 60', 400)
             
-            if radius > 50000:  # Límite de 50km
-                return error_response('Radio máximo permitido: 50km', 400)
+                is_valid, error_msg = validate_ranking_params(open_now, min_rating, max_distance, sort)
+                if not is_valid:
+                    return error_response(error_msg, 400)
+            
+                open_now = parse_bool_param(open_now)
+                min_rating = float(min_rating) if min_rating else None
+                max_distance = int(max_distance) if max_distance else None
             
             # Geocodificar ubicación
             search_location = self.places_service.geocode_location(location)
             if not search_location:
                 return error_response('Ubicación no encontrada', 404)
             
-            # Buscar lugares cercanos
-            places = self.places_service.search_nearby_places(
-                search_location, place_type, radius
-            )
+            # Columnar: se filtra y ordena sobre un lote y solo se arman
+            # dicts para las filas de la página
+            def rank(batch, rows=None, distances=None):
+                return self.ranker.rank(
+                    batch, search_location.lat, search_location.lng, radius, rows, distances,
+                    open_now=open_now, min_rating=min_rating, max_distance=max_distance, sort=sort
+                )
+            
+            # local_first ordena las filas del lote del propio índice; si la
+            # zona no tiene cobertura se consulta Google
+            local = None
+            if mode == 'local_first':
+                local = self.places_service.search_local_first(search_location, place_type, radius, rank)
+            if local is not None:
+                batch, rows, distances, scores = local
+                source = 'local'
+            else:
+                places = self.places_service.search_nearby_places(
+                    search_location, place_type, radius, max_results
+                )
+                batch = PlaceBatch.from_places(places)
+                rows, distances, scores = rank(batch)
+                source = 'google'
+            
+            total = min(len(rows), max_results)
+            start, end = (page - 1) * per_page, min(page * per_page, total)
+            page_rows = rows[start:end].tolist()
+            page_distances = distances[start:end].tolist()
+            page_scores = scores[start:end].tolist() if scores is not None else None
             
-            # Preparar respuesta
-            response_data = {
-                'location': {
-                    'address': search_location.address,
-                    'coordinates': {
-                        'lat': search_location.lat,
-                        'lng': search_location.lng
-                    }
-                },
-                'places': [self._serialize_place(place) for place in places],
-                'total': len(places),
-                'search_params': {
-                    'type': place_type,
-                    'radius': radius
+            # Cada lugar se serializa una vez y se reutiliza su JSON; solo
+            # distancia y puntuación (dependen de la búsqueda) se agregan.
+            # Las filas del índice se identifican por lote y fila
+            with span('serialization'):
+                if source == 'local':
+                    keys = [(batch.key, row) for row in page_rows]
+                else:
+                    keys = [places[row] for row in page_rows]
+                encoded_places = self.fragments.get_many(
+                    keys, lambda position: batch.to_dict(page_rows[position])
+                )
+                page_places = []
+                for position, encoded in enumerate(encoded_places):
+                    extra = {'distance_m': round(page_distances[position])}
+                    if page_scores is not None:
+                        extra['score'] = round(page_scores[position], 4)
+                    page_places.append(extend_object(encoded, extra))
+            
+                # Preparar respuesta
+                response_data = {
+                    'location': {
+                        'address': search_location.address,
+                        'coordinates': {
+                            'lat': search_location.lat,
+                            'lng': search_location.lng
+                        }
+                    },
+                    'places': page_places,
+                    'total': total,
+                    'search_params': {
+                        'type': place_type,
+                        'radius': radius,
+                        'mode': mode,
+                        'max_results': max_results,
+                        'open_now': open_now,
+                        'min_rating': min_rating,
+                        'max_distance': max_distance,
+                        'sort': sort
+                    },
+                    'source': source
                 }
-            }
             
-            return success_response(response_data)
+                return pagination_response(response_data, page, per_page, total)
             
         except ValueError:
-            return error_response('Radio debe ser un número válido', 400)
+            return error_response('Radio y paginación deben ser números válidos', 400)
+        except UpstreamThrottled as e:
+            return throttled_response(e.retry_after)
         except Exception as e:
             return error_response(f'Error interno del servidor: {str(e)}', 500)
     
     def get_place_details(self, place_id):
         """
         Endpoint para obtener detalles de un lugar específico
-        GET /api/places/<place_id>
+        GET /api/places/<place_id>?fields=contact,hours
+        
+        El ETag sale de la versión de la entrada en la caché de detalles.
         """
         try:
             if not place_id:
                 return error_response('ID de lugar requerido', 400)
             
+            with span('validation'):
+                fields = request.args.get('fields', '')
+                is_valid, error_msg = validate_detail_groups(fields)
+                if not is_valid:
+                    return error_response(error_msg, 400)
+            
             # Obtener detalles del lugar
-            place_details = self.places_service.get_place_details(place_id)
+            place_details = self.places_service.get_place_details(place_id, parse_detail_groups(fields))
             if not place_details:
                 return error_response('Lugar no encontrado', 404)
             
-            response_data = self._serialize_detailed_place(place_details)
-            return success_response(response_data)
+            if not place_details.version:
+                with span('serialization'):
+                    return success_response(self._detailed_place_fragment(place_details))
+            
+            # La versión de la entrada de caché identifica el cuerpo: si el
+            # cliente ya la tiene se responde 304 sin serializar
+            etag = version_etag('details', place_details.place_id, place_details.version)
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
+            with span('serialization'):
+                response, status_code = success_response(self._detailed_place_fragment(place_details))
+            response.set_etag(etag)
+            return response, status_code
+            
+        except UpstreamThrottled as e:
+            return throttled_response(e.retry_after)
+        except Exception as e:
+            return error_response(f'Error obteniendo detalles: {str(e)}', 500)
+    
+    def get_place_details_batch(self):
+        """
+        Endpoint para obtener detalles de varios lugares en una sola petición
+        POST /api/places/details:batch  {"place_ids": ["...", "..."], "fields": "contact,hours"}
+        
+        Responde con un resultado por ID (ok, invalid, not_found, throttled o error).
+        """
+        try:
+            payload = request.get_json(silent=True) or {}
+            place_ids = payload.get('place_ids')
+            max_ids = current_app.config.get('DETAILS_BATCH_MAX_IDS', 20)
+            
+            with span('validation'):
+                if not isinstance(place_ids, list) or not place_ids:
+                    return error_response('Se requiere una lista place_ids', 400)
+            
+                if len(place_ids) > max_ids:
+                    return error_response(f'Máximo {max_ids} IDs por petición', 400)
+            
+                fields = str(payload.get('fields') or '')
+                is_valid, error_msg = validate_detail_groups(fields)
+                if not is_valid:
+                    return error_response(error_msg, 400)
+            
+                # Quitar duplicados conservando el orden
+                unique_ids = list(dict.fromkeys(str(place_id) for place_id in place_ids))
+            
+                invalid = {}
+                valid_ids = []
+                for place_id in unique_ids:
+                    is_valid, error_msg = validate_place_id(place_id)
+                    if is_valid:
+                        valid_ids.append(place_id)
+                    else:
+                        invalid[place_id] = error_msg
+            
+            batch = self.places_service.get_places_details_batch(valid_ids, parse_detail_groups(fields))
+            
+            with span('serialization'):
+                results = []
+                for place_id in unique_ids:
+                    if place_id in invalid:
+                        results.append({'place_id': place_id, 'status': 'invalid', 'message': invalid[place_id]})
+                        continue
+                
+                    item = batch[place_id]
+                    entry = {'place_id': place_id, 'status': item['status'], 'source': item['source']}
+                    if item['status'] == 'ok':
+                        entry['data'] = self._detailed_place_fragment(item['place'])
+                    else:
+                        entry['message'] = item['message']
+                    results.append(entry)
+            
+                return success_response({
+                    'results': results,
+                    'total': len(results),
+                    'found': sum(1 for entry in results if entry['status'] == 'ok')
+                })
             
         except Exception as e:
             return error_response(f'Error obteniendo detalles: {str(e)}', 500)
     
     def get_photo_url(self):
         """
-        Endpoint para obtener URL de una foto
+        Endpoint para obtener URL de una foto (servida por este backend)
         GET /api/places/photo?reference=...&width=...
         """
         try:
             photo_reference = request.args.get('reference', '').strip()
             max_width = int(request.args.get('width', 400))
             
-            if not photo_reference:
-                return error_response('Referencia de foto requerida', 400)
+            is_valid, error_msg = validate_photo_reference(photo_reference)
+            if not is_valid:
+                return error_response(error_msg, 400)
             
-            photo_url = self.places_service.get_photo_url(photo_reference, max_width)
+            photo_url = url_for('health_places.get_photo_image', reference=photo_reference, width=max_width)
             
             return success_response({'url': photo_url})
             
@@ -104,34 +308,63 @@ class HealthPlaceController:
         except Exception as e:
             return error_response(f'Error obteniendo foto: {str(e)}', 500)
     
+    def get_photo_image(self):
+        """
+        Endpoint que sirve los bytes de una foto desde la caché en disco
+        GET /api/places/photo/image?reference=...&width=...
+        
+        Responde con ETag y Cache-Control, y 304 si el cliente ya la tiene.
+        """
+        try:
+            photo_reference = request.args.get('reference', '').strip()
+            max_width = int(request.args.get('width', 400))
+            
+            is_valid, error_msg = validate_photo_reference(photo_reference)
+            if not is_valid:
+                return error_response(error_msg, 400)
+            
+            if not 1 <= max_width <= 1600:
+                return error_response('El ancho debe estar entre 1 y 1600', 400)
+            
+            path, etag, mimetype = self.places_service.get_photo(photo_reference, max_width)
+            
+            return cached_file_response(
+                path, mimetype, etag, current_app.config.get('PHOTO_CACHE_MAX_AGE', 604800)
+            )
+            
+        except ValueError:
+            return error_response('Ancho debe ser un número válido', 400)
+        except UpstreamThrottled as e:
+            return throttled_response(e.retry_after)
+        except (InvalidPhotoError, googlemaps.exceptions.ApiError):
+            return error_response('Foto no encontrada', 404)
+        except googlemaps.exceptions.TransportError as e:
+            return error_response(f'Error descargando la foto: {str(e)}', 502)
+        except Exception as e:
+            return error_response(f'Error obteniendo foto: {str(e)}', 500)
+    
     def get_health_types(self):
         """
         Endpoint para obtener tipos de lugares de salud disponibles
         GET /api/places/types
         """
         try:
-            health_types = self.places_service.health_place_types
+            health_types = HEALTH_PLACE_TYPES
             return success_response({'types': health_types})
         except Exception as e:
             return error_response(f'Error obteniendo tipos: {str(e)}', 500)
     
-    def _serialize_place(self, place):
-        """Serializar un lugar básico para la respuesta JSON"""
-        return {
-            'place_id': place.place_id,
-            'name': place.name,
-            'address': place.address,
-            'coordinates': {
-                'lat': place.lat,
-                'lng': place.lng
-            },
-            'rating': place.rating,
-            'user_ratings_total': place.user_ratings_total,
-            'price_level': place.price_level,
-            'types': place.types,
-            'open_now': place.open_now,
-            'photo_reference': place.photo_reference
-        }
+    def _detailed_place_fragment(self, place):
+        """
+        JSON del lugar detallado, reutilizado mientras no cambie su entrada
+        en la caché de detalles
+        """
+        if not place.version:
+            return self._serialize_detailed_place(place)
+        return self.fragments.get(
+            ('details', place.place_id, place.version),
+            lambda: self._serialize_detailed_place(place)
+        )
     
     def _serialize_detailed_place(self, place):
         """Serializar un lugar detallado para la respuesta JSON"""
@@ -146,7 +379,7 @@ class HealthPlaceController:
             'rating': place.rating,
             'user_ratings_total': place.user_ratings_total,
             'price_level': place.price_level,
-            'types': place.types,
+            'types': list(place.types),
             'phone': place.phone,
             'website': place.website,
             'opening_hours': place.opening_hours,
@@ -3,20 +3,28 @@ Rutas de la API para lugares de salud
 """
 from flask import Blueprint
 from ..controllers.health_place_controller import HealthPlaceController
+from ..utils.response_utils import cache_policy
 
 # Crear blueprint
 health_places_bp = Blueprint('health_places', __name__, url_prefix='/api/places')
 
-# Instanciar controlador
+# Instanciar controlador (sus servicios se crean en la primera petición)
 controller = HealthPlaceController()
 
 # Definir rutas
 @health_places_bp.route('/search', methods=['GET'])
+@cache_policy('search')
 def search_places():
     """Buscar lugares de salud"""
     return controller.search_places()
 
+@health_places_bp.route('/details:batch', methods=['POST'])
+def get_place_details_batch():
+    """Obtener detalles de varios lugares en una sola petición"""
+    return controller.get_place_details_batch()
+
 @health_places_bp.route('/<place_id>', methods=['GET'])
+@cache_policy('details')
 def get_place_details(place_id):
     """Obtener detalles de un lugar específico"""
     return controller.get_place_details(place_id)
@@ -26,7 +34,13 @@ def get_photo_url():
     """Obtener URL de una foto"""
     return controller.get_photo_url()
 
+@health_places_bp.route('/photo/image', methods=['GET'])
+def get_photo_image():
+    """Servir una foto desde la caché en disco"""
+    return controller.get_photo_image()
+
 @health_places_bp.route('/types', methods=['GET'])
+@cache_policy('static')
 def get_health_types():
     """Obtener tipos de lugares de salud disponibles"""
     return controller.get_health_types()
\ No newline at end of file
@@ -1,12 +1,45 @@
 """
 Modelo para lugares de salud
 """
+import sys
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-@dataclass
+# Tipos de lugares de salud disponibles (GET /api/places/types)
+HEALTH_PLACE_TYPES = {
+    'pharmacy': 'Farmacia',
+    'hospital': 'Hospital',
+    'clinic': 'Clínica',
+    'doctor': 'Consultorio Médico',
+    'dentist': 'Dentista',
+    'physiotherapist': 'Fisioterapeuta',
+    'veterinary_care': 'Veterinaria'
+}
+
+# Tuplas de tipos compartidas: casi todos los lugares repiten unas pocas combinaciones
+_TYPE_TUPLES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+_MAX_TYPE_TUPLES = 4096
+
+def intern_types(types: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """Convertir una lista de tipos en una tupla compartida entre lugares"""
+    key = tuple(sys.intern(place_type) for place_type in types or ())
+    shared = _TYPE_TUPLES.get(key)
+    if shared is None:
+        shared = key
+        if len(_TYPE_TUPLES) < _MAX_TYPE_TUPLES:
+            _TYPE_TUPLES[key] = key
+    return shared
+
+@dataclass(frozen=True, slots=True)
 class HealthPlace:
-    """Modelo para un lugar de salud"""
+    """
+    Modelo para un lugar de salud
+
+    Inmutable y con __slots__: el índice local y las cachés guardan cientos
+    de miles de lugares y sin __dict__ por instancia cada uno ocupa bastante
+    menos (ver benchmarks/bench_places.py). `types` es una tupla compartida
+    (ver intern_types).
+    """
     place_id: str
     name: str
     address: str
@@ -15,35 +48,41 @@ class HealthPlace:
     rating: float = 0.0
     user_ratings_total: int = 0
     price_level: int = 0
-    types: List[str] = None
+    types: Tuple[str, ...] = ()
     open_now: Optional[bool] = None
     photo_reference: str = ""
-    
+
     def __post_init__(self):
-        if self.types is None:
-            self.types = []
+        object.__setattr__(self, 'types', intern_types(self.types))
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DetailedHealthPlace(HealthPlace):
-    """Modelo detallado para un lugar de salud"""
+    """
+    Modelo detallado para un lugar de salud
+
+    `version` es la versión de la entrada de la caché de detalles de la que
+    sale (vacía si no viene de la caché).
+    """
     phone: str = ""
     website: str = ""
     opening_hours: Dict = None
     reviews: List[Dict] = None
     photos: List[str] = None
-    
+    version: str = ""
+
     def __post_init__(self):
-        super().__post_init__()
+        # Con slots=True la clase se recrea y super() sin argumentos no funciona
+        HealthPlace.__post_init__(self)
         if self.opening_hours is None:
-            self.opening_hours = {}
+            object.__setattr__(self, 'opening_hours', {})
         if self.reviews is None:
-            self.reviews = []
+            object.__setattr__(self, 'reviews', [])
         if self.photos is None:
-            self.photos = []
+            object.__setattr__(self, 'photos', [])
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SearchLocation:
     """Modelo para ubicación de búsqueda"""
     address: str
     lat: float
-    lng: float
\ No newline at end of file
+    lng: float
@@ -0,0 +1,324 @@
+"""
+Representación columnar de un conjunto de lugares de salud
+"""
+import itertools
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .health_place import HealthPlace, intern_types
+from ..utils.lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+# open_now sin dato en la columna de bytes
+OPEN_UNKNOWN = -1
+
+_OPEN_VALUES = {True: 1, False: 0, None: OPEN_UNKNOWN}
+_OPEN_FROM_CODE = {1: True, 0: False, OPEN_UNKNOWN: None}
+
+# Textos de cada lugar, en este orden, en la tabla de cadenas
+_TEXT_FIELDS = ('place_id', 'name', 'address', 'photo_reference')
+
+# Identificadores de lote (claves de los fragmentos JSON de sus filas)
+_BATCH_KEYS = itertools.count()
+
+# Columnas numéricas por las que se puede ordenar
+SORT_KEYS = ('rating', 'user_ratings_total', 'price_level', 'lat', 'lng')
+
+
+def column(values) -> 'np.ndarray':
+    """
+    Vista NumPy (sin copia) de una columna array.array de PlaceBatch
+
+    Mientras la vista exista la columna no puede crecer (el array exporta
+    su buffer): quien agrega filas a un lote compartido debe usarla bajo
+    el mismo candado.
+    """
+    return np.frombuffer(values, dtype=np.dtype(values.typecode))
+
+
+class PlaceBatch:
+    """
+    Lugares guardados por columnas en vez de un objeto por lugar.
+
+    lat, lng y rating son `array('d')` (8 bytes por lugar, y NumPy puede
+    leerlos sin copiar con `numpy.frombuffer`). Los textos de todos los
+    lugares van concatenados en unas pocas cadenas (un bloque por cada
+    tanda de filas agregadas) con una tabla de offsets, así que no hay un
+    objeto str por campo. Cada combinación distinta de
+    tipos se guarda una vez, con su máscara de bits, y cada lugar guarda
+    solo el número de su combinación. Filtrar y ordenar son operaciones
+    NumPy sobre las columnas que devuelven índices de fila; los dicts de
+    la respuesta se arman solo para las filas que se devuelven.
+
+    Las filas no cambian una vez agregadas, así que un lote puede crecer
+    (el índice local agrega lugares) mientras otros hilos leen filas que
+    ya tenían.
+    """
+
+    def __init__(self):
+        # Junto con el número de fila identifica un lugar: las filas no cambian
+        self.key = next(_BATCH_KEYS)
+        self.lat = array('d')
+        self.lng = array('d')
+        self.rating = array('d')
+        self.user_ratings_total = array('l')
+        self.price_level = array('b')
+        self.open_now = array('b')
+        # Tabla de cadenas: el texto k del lugar i está en los caracteres
+        # _offsets[4i+k]:_offsets[4i+k+1] del texto concatenado, repartido en
+        # bloques; _chunk[i] es el bloque de la fila y _chunk_starts su inicio
+        self._chunks: List[str] = []
+        self._chunk_starts: List[int] = []
+        self._pending: List[str] = []
+        self._offsets = array('Q', [0])
+        self._chunk = array('I')
+        # Combinación de tipos de cada fila -> máscara de bits sobre type_names
+        self.type_set = array('H')
+        self.type_names: List[str] = []
+        self._type_bits: Dict[str, int] = {}
+        self._type_masks: List[int] = []
+        self._type_tuples: List[tuple] = []
+        self._type_set_ids: Dict[tuple, int] = {}
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _type_set_id(self, types: tuple) -> int:
+        type_set_id = self._type_set_ids.get(types)
+        if type_set_id is None:
+            mask = 0
+            for place_type in types:
+                bit = self._type_bits.get(place_type)
+                if bit is None:
+                    bit = self._type_bits[place_type] = len(self.type_names)
+                    self.type_names.append(place_type)
+                mask |= 1 << bit
+            type_set_id = self._type_set_ids[types] = len(self._type_masks)
+            self._type_masks.append(mask)
+            self._type_tuples.append(types)
+        return type_set_id
+
+    def append(
+        self,
+        place_id: str,
+        name: str,
+        address: str,
+        lat: float,
+        lng: float,
+        rating: float = 0.0,
+        user_ratings_total: int = 0,
+        price_level: int = 0,
+        types: Iterable[str] = (),
+        open_now: Optional[bool] = None,
+        photo_reference: str = ''
+    ) -> int:
+        """Agregar un lugar y devolver su número de fila"""
+        self.lat.append(lat or 0.0)
+        self.lng.append(lng or 0.0)
+        self.rating.append(rating or 0.0)
+        self.user_ratings_total.append(user_ratings_total or 0)
+        self.price_level.append(price_level or 0)
+        self.open_now.append(_OPEN_VALUES.get(open_now, OPEN_UNKNOWN))
+        if not self._pending:
+            self._chunk_starts.append(self._offsets[-1])
+        offset = self._offsets[-1]
+        for value in (place_id, name, address, photo_reference or ''):
+            self._pending.append(value)
+            offset += len(value)
+            self._offsets.append(offset)
+        self._chunk.append(len(self._chunks))
+        self.type_set.append(self._type_set_id(intern_types(types)))
+        return len(self.lat) - 1
+
+    @classmethod
+    def from_places(cls, places: Iterable[HealthPlace]) -> 'PlaceBatch':
+        """Crear un lote a partir de modelos HealthPlace"""
+        batch = cls()
+        for place in places:
+            batch.append(
+                place.place_id, place.name, place.address, place.lat, place.lng,
+                place.rating, place.user_ratings_total, place.price_level,
+                place.types, place.open_now, place.photo_reference
+            )
+        batch.compact()
+        return batch
+
+    @classmethod
+    def from_google_results(cls, results: Iterable[Dict[str, Any]]) -> 'PlaceBatch':
+        """Crear un lote directamente desde resultados crudos de places_nearby"""
+        batch = cls()
+        for result in results:
+            location = result.get('geometry', {}).get('location', {})
+            photos = result.get('photos')
+            batch.append(
+                result.get('place_id', ''),
+                result.get('name', 'Sin nombre'),
+                result.get('vicinity', 'Dirección no disponible'),
+                location.get('lat', 0.0),
+                location.get('lng', 0.0),
+                result.get('rating', 0.0),
+                result.get('user_ratings_total', 0),
+                result.get('price_level', 0),
+                result.get('types', ()),
+                result.get('opening_hours', {}).get('open_now'),
+                photos[0].get('photo_reference', '') if photos else ''
+            )
+        batch.compact()
+        return batch
+
+    def append_row(self, batch: 'PlaceBatch', row: int) -> int:
+        """Copiar una fila de otro lote y devolver su número de fila aquí"""
+        place_id, name, address, photo_reference = batch._texts(row)
+        return self.append(
+            place_id, name, address, batch.lat[row], batch.lng[row], batch.rating[row],
+            batch.user_ratings_total[row], batch.price_level[row], batch.types(row),
+            _OPEN_FROM_CODE[batch.open_now[row]], photo_reference
+        )
+
+    def take(self, rows: Iterable[int]) -> 'PlaceBatch':
+        """Lote nuevo con las filas indicadas, en ese orden"""
+        batch = PlaceBatch()
+        for row in rows:
+            batch.append_row(self, row)
+        batch.compact()
+        return batch
+
+    def compact(self):
+        """Cerrar en un bloque de la tabla de cadenas los textos agregados desde la última lectura"""
+        if self._pending:
+            self._chunks.append(''.join(self._pending))
+            self._pending = []
+
+    def _texts(self, row: int) -> List[str]:
+        """Los cuatro textos de una fila (ver _TEXT_FIELDS)"""
+        chunk = self._chunk[row]
+        if chunk >= len(self._chunks):
+            self.compact()
+        text, base = self._chunks[chunk], self._chunk_starts[chunk]
+        offsets = self._offsets
+        position = row * len(_TEXT_FIELDS)
+        start, name_start, address_start, photo_start, end = (
+            offsets[position] - base, offsets[position + 1] - base, offsets[position + 2] - base,
+            offsets[position + 3] - base, offsets[position + 4] - base
+        )
+        return [text[start:name_start], text[name_start:address_start],
+                text[address_start:photo_start], text[photo_start:end]]
+
+    def place_id(self, row: int) -> str:
+        return self._texts(row)[0]
+
+    def types(self, row: int) -> tuple:
+        # Se conserva el orden de Google (el tipo principal primero)
+        return self._type_tuples[self.type_set[row]]
+
+    def place(self, row: int) -> HealthPlace:
+        """Materializar una fila como HealthPlace"""
+        place_id, name, address, photo_reference = self._texts(row)
+        return HealthPlace(
+            place_id=place_id,
+            name=name,
+            address=address,
+            lat=self.lat[row],
+            lng=self.lng[row],
+            rating=self.rating[row],
+            user_ratings_total=self.user_ratings_total[row],
+            price_level=self.price_level[row],
+            types=self.types(row),
+            open_now=_OPEN_FROM_CODE[self.open_now[row]],
+            photo_reference=photo_reference
+        )
+
+    def to_places(self, rows: Optional[Iterable[int]] = None) -> List[HealthPlace]:
+        """Materializar las filas indicadas (todas por defecto)"""
+        return [self.place(row) for row in (range(len(self)) if rows is None else rows)]
+
+    def to_dict(self, row: int) -> Dict[str, Any]:
+        """Fila con el formato de lugar de la respuesta JSON de /api/places/search"""
+        place_id, name, address, photo_reference = self._texts(row)
+        return {
+            'place_id': place_id,
+            'name': name,
+            'address': address,
+            'coordinates': {
+                'lat': self.lat[row],
+                'lng': self.lng[row]
+            },
+            'rating': self.rating[row],
+            'user_ratings_total': self.user_ratings_total[row],
+            'price_level': self.price_level[row],
+            'types': list(self.types(row)),
+            'open_now': _OPEN_FROM_CODE[self.open_now[row]],
+            'photo_reference': photo_reference
+        }
+
+    def to_dicts(self, rows: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Filas indicadas (todas por defecto) con el formato de la respuesta JSON"""
+        return [self.to_dict(row) for row in (range(len(self)) if rows is None else rows)]
+
+    def type_sets_with(self, place_type: str) -> set:
+        """Números de las combinaciones de tipos que incluyen `place_type`"""
+        bit = self._type_bits.get(place_type)
+        if bit is None:
+            return set()
+        mask = 1 << bit
+        return {set_id for set_id, set_mask in enumerate(self._type_masks) if set_mask & mask}
+
+    def _values(self, name: str, rows: Optional['np.ndarray']) -> 'np.ndarray':
+        values = column(getattr(self, name))
+        return values if rows is None else values[rows]
+
+    def filter_rows(
+        self,
+        rows: Optional[Iterable[int]] = None,
+        place_type: Optional[str] = None,
+        open_now: Optional[bool] = None,
+        min_rating: Optional[float] = None
+    ) -> 'np.ndarray':
+        """
+        Filas que cumplen todos los filtros indicados
+
+        El tipo se resuelve una vez contra las combinaciones del lote (una
+        tabla booleana por combinación) y cada filtro es una máscara sobre
+        las columnas.
+        """
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.intp)
+        keep = np.ones(len(self) if rows is None else len(rows), dtype=bool)
+        if place_type is not None:
+            has_type = np.zeros(len(self._type_masks), dtype=bool)
+            has_type[list(self.type_sets_with(place_type))] = True
+            keep &= has_type[self._values('type_set', rows)]
+        if open_now is not None:
+            keep &= self._values('open_now', rows) == _OPEN_VALUES[bool(open_now)]
+        if min_rating is not None:
+            keep &= self._values('rating', rows) >= min_rating
+        selected = np.flatnonzero(keep)
+        return selected if rows is None else rows[selected]
+
+    def sort_rows(
+        self,
+        rows: Optional[Sequence[int]] = None,
+        key: str = 'rating',
+        reverse: bool = False
+    ) -> 'np.ndarray':
+        """Ordenar filas por una columna numérica (ver SORT_KEYS), de forma estable"""
+        if key not in SORT_KEYS:
+            raise ValueError(f"Columna de orden inválida: {key}. Válidas: {', '.join(SORT_KEYS)}")
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.intp)
+        values = self._values(key, rows)
+        order = np.argsort(-values if reverse else values, kind='stable')
+        return rows[order]
+
+    def nbytes(self) -> int:
+        """Memoria aproximada del lote (columnas, tabla de cadenas y tablas de tipos)"""
+        columns = (
+            self.lat, self.lng, self.rating, self.user_ratings_total, self.price_level,
+            self.open_now, self.type_set, self._offsets, self._chunk
+        )
+        total = sum(values.buffer_info()[1] * values.itemsize for values in columns)
+        total += sum(sys.getsizeof(chunk) for chunk in self._chunks)
+        total += sum(sys.getsizeof(value) for value in self._pending)
+        total += sum(sys.getsizeof(mask) for mask in self._type_masks)
+        return total
@@ -0,0 +1,318 @@
+"""
+Circuit breakers por endpoint de Google y peticiones cubiertas (hedging)
+para recortar la latencia de cola
+"""
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+import googlemaps
+
+from .upstream_limits import UpstreamThrottled
+
+logger = logging.getLogger(__name__)
+
+# Método del cliente -> endpoint protegido
+ENDPOINTS = {
+    'geocode': 'geocode',
+    'places_nearby': 'nearby',
+    'place': 'details',
+    'places_photo': 'photo',
+}
+
+# Las fotos devuelven un iterador que se lee fuera de la llamada: no se cubren
+HEDGED_ENDPOINTS = {'geocode', 'nearby', 'details'}
+
+# Estados de la API que indican un fallo de Google y no de la petición
+FAILURE_STATUSES = {'UNKNOWN_ERROR'}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(UpstreamThrottled):
+    """El circuito del endpoint está abierto: se falla rápido sin llamar a Google"""
+
+
+class UpstreamTimeout(UpstreamThrottled):
+    """Google no respondió dentro del plazo del endpoint"""
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """True si el error cuenta como fallo de Google para el circuit breaker"""
+    if isinstance(error, UpstreamThrottled):
+        return False
+    if isinstance(error, (googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError)):
+        return True
+    if isinstance(error, googlemaps.exceptions.ApiError):
+        return error.status in FAILURE_STATUSES
+    return False
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico: cerrado -> abierto tras `failure_threshold`
+    fallos seguidos; tras `recovery_timeout` segundos deja pasar una llamada
+    de prueba (semiabierto) que lo cierra o lo vuelve a abrir.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30):
+        """
+        Args:
+            name: Nombre del endpoint
+            failure_threshold: Fallos consecutivos que abren el circuito
+            recovery_timeout: Segundos que el circuito queda abierto
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """Estado actual (closed, open o half_open)"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Comprobar si se puede llamar; lanza CircuitOpenError si no"""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            remaining = self.recovery_timeout - (time.monotonic() - self._opened_at)
+            if remaining <= 0 and not self._probe_in_flight:
+                # Semiabierto: solo una llamada de prueba a la vez
+                self._state = HALF_OPEN
+                self._probe_in_flight = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(
+            f'Circuito de {self.name} abierto', max(remaining, 1.0)
+        )
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Liberar la llamada de prueba sin cambiar el estado (p. ej. sin cupo local)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                    logger.warning(f"Circuito de {self.name} abierto tras {self._failures} fallos")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
+
+
+class LatencyWindow:
+    """Latencias recientes de un endpoint para calcular percentiles"""
+
+    def __init__(self, size: int = 500):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, latency_ms: float):
+        with self._lock:
+            self._values.append(latency_ms)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+        return values[index]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class EndpointGuard:
+    """
+    Protección de un endpoint: circuit breaker, plazo máximo por llamada y,
+    opcionalmente, una segunda petición si la primera tarda más que el
+    percentil `hedge_percentile` de las latencias recientes.
+    """
+
+    # Muestras necesarias antes de lanzar peticiones cubiertas
+    MIN_SAMPLES = 20
+
+    def __init__(
+        self,
+        name: str,
+        executor: ThreadPoolExecutor,
+        timeout: float = 10.0,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_delay_ms: float = 50,
+        hedge_budget: float = 0.1
+    ):
+        """
+        Args:
+            name: Nombre del endpoint
+            executor: Pool de hilos donde corren los intentos
+            timeout: Segundos máximos que el llamador espera una respuesta
+            failure_threshold: Fallos consecutivos que abren el circuito
+            recovery_timeout: Segundos que el circuito queda abierto
+            hedge: Lanzar un segundo intento si el primero se retrasa
+            hedge_percentile: Percentil de latencia que dispara el segundo intento
+            hedge_min_delay_ms: Espera mínima antes del segundo intento
+            hedge_budget: Fracción máxima de llamadas que pueden duplicarse
+        """
+        self.name = name
+        self.executor = executor
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_timeout)
+        self.latencies = LatencyWindow()
+        self.hedge = hedge and name in HEDGED_ENDPOINTS
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_budget = hedge_budget
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latencies) < self.MIN_SAMPLES:
+            return None
+        with self._lock:
+            if self.hedges >= self.calls * self.hedge_budget:
+                return None
+        return max(self.latencies.percentile(self.hedge_percentile), self.hedge_min_delay_ms) / 1000
+
+    def _attempt(self, method, args, kwargs):
+        start = time.perf_counter()
+        result = method(*args, **kwargs)
+        self.latencies.add((time.perf_counter() - start) * 1000)
+        return result
+
+    def call(self, method, *args, **kwargs):
+        """Ejecutar una llamada al endpoint con breaker, plazo y hedging"""
+        self.breaker.before_call()
+        with self._lock:
+            self.calls += 1
+
+        deadline = time.monotonic() + self.timeout
+        futures = [self.executor.submit(self._attempt, method, args, kwargs)]
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None:
+            done, _ = wait(futures, timeout=min(hedge_delay, self.timeout))
+            if not done:
+                with self._lock:
+                    self.hedges += 1
+                futures.append(self.executor.submit(self._attempt, method, args, kwargs))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if len(futures) > 1 and future is futures[1]:
+                    with self._lock:
+                        self.hedge_wins += 1
+                self.breaker.record_success()
+                return result
+
+        if error is None:
+            # Ningún intento respondió a tiempo; los hilos terminan solos
+            with self._lock:
+                self.timeouts += 1
+            error = googlemaps.exceptions.Timeout(f'Sin respuesta en {self.timeout}s')
+
+        if is_upstream_failure(error):
+            self.breaker.record_failure()
+            if isinstance(error, googlemaps.exceptions.Timeout):
+                # Se trata como falta de cupo: 503 o respuesta desde la caché
+                raise UpstreamTimeout(f'Google no respondió a tiempo ({self.name})') from error
+        elif isinstance(error, UpstreamThrottled):
+            self.breaker.release_probe()
+        else:
+            # NOT_FOUND, INVALID_REQUEST...: Google respondió bien
+            self.breaker.record_success()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.breaker.stats()
+        p50 = self.latencies.percentile(50)
+        p95 = self.latencies.percentile(95)
+        stats.update({
+            'timeout_s': self.timeout,
+            'calls': self.calls,
+            'timeouts': self.timeouts,
+            'hedging': self.hedge,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'latency_ms': {
+                'p50': round(p50, 2) if p50 is not None else None,
+                'p95': round(p95, 2) if p95 is not None else None
+            }
+        })
+        return stats
+
+
+def guard_client(client, guards: Dict[str, EndpointGuard]):
+    """
+    Hacer pasar geocode, places_nearby, place y places_photo por el
+    EndpointGuard de su endpoint
+
+    Returns:
+        El mismo cliente, con los guards en `client.endpoint_guards`
+    """
+    for method_name, endpoint in ENDPOINTS.items():
+        guard = guards.get(endpoint)
+        if guard is None:
+            continue
+        method = getattr(client, method_name)
+
+        @functools.wraps(method)
+        def guarded(*args, _guard=guard, _method=method, **kwargs):
+            return _guard.call(_method, *args, **kwargs)
+
+        setattr(client, method_name, guarded)
+
+    client.endpoint_guards = guards
+    return client
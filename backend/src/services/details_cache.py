@@ -0,0 +1,250 @@
+"""
+Caché de detalles de lugares por place_id, consciente de los campos pedidos
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from ..utils.cache import TTLCache, MISSING, create_cache
+from ..utils.settings import get_setting
+from .upstream_limits import UpstreamThrottled
+
+logger = logging.getLogger(__name__)
+
+# Grupos de campos que puede pedir el cliente -> campos de Place Details
+FIELD_GROUPS = {
+    'basic': ('place_id', 'name', 'formatted_address', 'geometry', 'type'),
+    'contact': ('formatted_phone_number', 'website'),
+    'hours': ('opening_hours',),
+    'rating': ('rating', 'user_ratings_total', 'price_level'),
+    'reviews': ('reviews',),
+    'photos': ('photo',),
+}
+
+# Los campos básicos se piden siempre
+BASIC_FIELDS = frozenset(FIELD_GROUPS['basic'])
+ALL_FIELDS = frozenset(field for fields in FIELD_GROUPS.values() for field in fields)
+
+# Solo se guardan las primeras reseñas y fotos que se devuelven al cliente
+MAX_REVIEWS = 3
+MAX_PHOTOS = 5
+
+# Clave del resultado guardado con la versión de la entrada
+VERSION_KEY = '_version'
+
+
+def fields_for_groups(groups: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+    """
+    Campos de Place Details necesarios para los grupos pedidos
+
+    Args:
+        groups: Nombres de FIELD_GROUPS; None pide todos los campos
+    """
+    if not groups:
+        return ALL_FIELDS
+    fields = set(BASIC_FIELDS)
+    for group in groups:
+        fields.update(FIELD_GROUPS[group])
+    return frozenset(fields)
+
+
+def _trim(result: Dict[str, Any]) -> Dict[str, Any]:
+    if 'reviews' in result:
+        result['reviews'] = result['reviews'][:MAX_REVIEWS]
+    if 'photos' in result:
+        result['photos'] = result['photos'][:MAX_PHOTOS]
+    return result
+
+
+class DetailsCache:
+    """
+    Caché de resultados crudos de Place Details.
+
+    Cada entrada recuerda qué campos contiene: una petición de un subconjunto
+    se responde desde la caché, y si faltan campos solo se piden esos a
+    Google y se combinan con la entrada existente.
+
+    Las entradas vencidas se siguen sirviendo durante `stale_ttl` segundos
+    mientras se refrescan en segundo plano (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        stale_ttl: float = 86400,
+        max_entries: int = 5000,
+        refresh_workers: int = 2,
+        backend=None
+    ):
+        """
+        Args:
+            ttl: Segundos que una entrada se considera fresca
+            stale_ttl: Segundos adicionales que se sirve vencida mientras se refresca
+            max_entries: Número máximo de lugares en memoria
+            refresh_workers: Hilos para los refrescos en segundo plano
+            backend: Almacenamiento (ver utils.cache.create_cache); por defecto en memoria
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        if backend is None:
+            backend = TTLCache(max_entries=max_entries, default_ttl=ttl + stale_ttl)
+        self._cache = backend
+        self._refresh_workers = refresh_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.stale_served = 0
+        self.partial_fetches = 0
+        self.refreshes = 0
+        self.throttled_served = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'DetailsCache':
+        """Crear la caché a partir de un objeto o dict de configuración"""
+        ttl = get_setting(config, 'DETAILS_CACHE_TTL', 3600)
+        stale_ttl = get_setting(config, 'DETAILS_CACHE_STALE_TTL', 86400)
+        max_entries = get_setting(config, 'DETAILS_CACHE_MAX_ENTRIES', 5000)
+        return cls(
+            ttl=ttl,
+            stale_ttl=stale_ttl,
+            max_entries=max_entries,
+            backend=create_cache(config, 'details', max_entries, ttl + stale_ttl)
+        )
+
+    def lookup(
+        self,
+        place_id: str,
+        fields: FrozenSet[str],
+        fetch: Callable[[str, List[str]], Optional[Dict[str, Any]]]
+    ) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Buscar en la caché sin llamar a Google en el camino crítico
+
+        Si la entrada está vencida pero dentro de `stale_ttl`, se devuelve y
+        se programa un refresco con `fetch`.
+
+        Returns:
+            Tupla (resultado crudo, 'cache' o 'stale'), o None si no hay una
+            entrada con todos los campos pedidos
+        """
+        return self._serve(self._load(place_id), place_id, fields, fetch)
+
+    def _load(self, place_id):
+        # Las entradas se guardan serializables (lista de campos, hora de
+        # reloj) para poder compartirlas entre workers
+        entry = self._cache.get(place_id)
+        if entry is MISSING:
+            return MISSING
+        return dict(entry, fields=frozenset(entry['fields']))
+
+    def _serve(self, entry, place_id, fields, fetch):
+        if entry is MISSING or not fields <= entry['fields']:
+            return None
+
+        if time.time() - entry['fetched_at'] < self.ttl:
+            return entry['result'], 'cache'
+
+        self.stale_served += 1
+        self._refresh_in_background(place_id, entry['fields'], fetch)
+        return entry['result'], 'stale'
+
+    def get(
+        self,
+        place_id: str,
+        fields: FrozenSet[str],
+        fetch: Callable[[str, List[str]], Optional[Dict[str, Any]]]
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Obtener los campos pedidos de un lugar, llamando a Google solo por lo
+        que falta
+
+        Args:
+            place_id: ID del lugar
+            fields: Campos de Place Details necesarios
+            fetch: fetch(place_id, fields) -> resultado crudo o None si no existe
+
+        Returns:
+            Tupla (resultado crudo o None, origen 'cache', 'stale' o 'google').
+            Si Google no tiene cupo (UpstreamThrottled) y hay una entrada, se
+            devuelve esa entrada como 'stale'.
+        """
+        entry = self._load(place_id)
+        cached = self._serve(entry, place_id, fields, fetch)
+        if cached is not None:
+            return cached
+
+        fresh = entry is not MISSING and time.time() - entry['fetched_at'] < self.ttl
+        if fresh:
+            # Pedir solo los campos que faltan (más los básicos)
+            self.partial_fetches += 1
+            missing = (fields - entry['fields']) | BASIC_FIELDS
+        else:
+            missing = fields
+
+        try:
+            result = fetch(place_id, sorted(missing))
+        except UpstreamThrottled:
+            # Sin cupo para Google: mejor la entrada que haya (vencida o
+            # incompleta) que un error
+            if entry is MISSING:
+                raise
+            self.throttled_served += 1
+            return entry['result'], 'stale'
+        if result is None:
+            return None, 'google'
+
+        return self._store(place_id, result, missing, entry if fresh else None), 'google'
+
+    def _store(self, place_id, result, fields, previous=None) -> Dict[str, Any]:
+        result = _trim(dict(result))
+        if previous is not None:
+            result = dict(previous['result'], **result)
+            fields = previous['fields'] | fields
+            fetched_at = previous['fetched_at']
+        else:
+            fetched_at = time.time()
+        # Cambia con cada escritura: identifica el contenido para quien guarde
+        # derivados del resultado (fragmentos JSON ya serializados)
+        result[VERSION_KEY] = format(time.time_ns(), 'x')
+
+        self._cache.set(place_id, {
+            'result': result,
+            'fields': sorted(fields),
+            'fetched_at': fetched_at
+        })
+        return result
+
+    def _refresh_in_background(self, place_id, fields, fetch):
+        with self._lock:
+            if place_id in self._refreshing:
+                return
+            self._refreshing.add(place_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._refresh_workers,
+                    thread_name_prefix='details-refresh'
+                )
+        self._executor.submit(self._refresh, place_id, fields, fetch)
+
+    def _refresh(self, place_id, fields, fetch):
+        try:
+            result = fetch(place_id, sorted(fields))
+            if result is not None:
+                self._store(place_id, result, fields)
+                self.refreshes += 1
+        except Exception as e:
+            logger.error(f"Error refrescando detalles de {place_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(place_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos, fallos y refrescos"""
+        stats = self._cache.stats()
+        stats['stale_served'] = self.stale_served
+        stats['partial_fetches'] = self.partial_fetches
+        stats['refreshes'] = self.refreshes
+        stats['throttled_served'] = self.throttled_served
+        return stats
@@ -0,0 +1,97 @@
+"""
+Búsqueda enriquecida: geocodificación, lugares cercanos y datos FHIR de cada lugar
+"""
+import logging
+from typing import Any, Dict, List
+
+import googlemaps
+
+from .fhir_snapshot_store import FHIRSnapshotStore
+from .google_maps_service import GoogleMapsService
+from .upstream_limits import UpstreamThrottled, busy_result
+
+logger = logging.getLogger(__name__)
+
+# Tipos de lugar que tienen disponibilidad de atención
+AVAILABILITY_TYPES = {'hospital', 'clinic', 'doctor', 'dentist', 'physiotherapist'}
+
+
+class EnrichedSearchService:
+    """
+    Búsqueda de GoogleMapsService con disponibilidad o stock FHIR por lugar.
+
+    Cada paso depende del anterior (los lugares necesitan las coordenadas y
+    los datos FHIR necesitan los lugares), y los datos FHIR de todos los
+    lugares se leen de una vez del almacén de snapshots: no hay trabajo
+    independiente que solapar, así que todo corre en el hilo de la petición.
+    """
+
+    def __init__(self, maps_service: GoogleMapsService, fhir_store: FHIRSnapshotStore):
+        """
+        Args:
+            maps_service: Servicio de Google Maps compartido
+            fhir_store: Snapshots FHIR de disponibilidad y stock
+        """
+        self.maps_service = maps_service
+        self.fhir_store = fhir_store
+
+    def search_health_places(
+        self,
+        location: str,
+        place_type: str,
+        radius: int,
+        enrich: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Buscar lugares de salud y enriquecerlos con datos FHIR
+
+        Args:
+            location: Dirección o coordenadas para buscar
+            place_type: Tipo de lugar de salud
+            radius: Radio de búsqueda en metros
+            enrich: Agregar disponibilidad o stock FHIR a cada lugar
+
+        Returns:
+            Dict con el mismo formato que GoogleMapsService.search_health_places
+        """
+        try:
+            geocode_result = self.maps_service.geocode(location)
+            if not geocode_result:
+                return {'error': 'Ubicación no encontrada'}
+
+            location_coords = geocode_result['geometry']['location']
+            places = self.maps_service.find_nearby_places(location_coords, place_type, radius)
+
+            if enrich and places:
+                self._enrich_places(places, place_type)
+
+            return self.maps_service.build_search_result(geocode_result, places, place_type, radius)
+
+        except UpstreamThrottled as e:
+            logger.warning(f"Búsqueda rechazada por falta de cupo: {str(e)}")
+            return busy_result(e)
+        except googlemaps.exceptions.ApiError as e:
+            logger.error(f"Error de Google Maps API: {str(e)}")
+            return {'error': f'Error en la API de Google Maps: {str(e)}'}
+        except Exception as e:
+            logger.error(f"Error en búsqueda enriquecida: {str(e)}")
+            return {'error': 'Error interno en la búsqueda'}
+
+    def _enrich_places(self, places: List[Dict[str, Any]], place_type: str):
+        """Agregar datos FHIR a cada lugar con una sola lectura del almacén"""
+        if place_type == 'pharmacy':
+            kind = 'stock'
+        elif place_type in AVAILABILITY_TYPES:
+            kind = 'availability'
+        else:
+            return
+
+        try:
+            data = self.fhir_store.get_data(kind, [place['place_id'] for place in places])
+        except Exception as e:
+            logger.error(f"Error enriqueciendo lugares con FHIR: {str(e)}")
+            data = {}
+
+        for place in places:
+            resource = data.get(place['place_id'])
+            place['fhir'] = {kind: resource} if resource is not None else None
@@ -0,0 +1,181 @@
+"""
+Backend FHIR R4 sobre HTTP: una petición batch por página de lugares
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+from .fhir_resources import (
+    DEFAULT_PLACE_ID_SYSTEM, availability_from_service, inventory_items, is_inventory,
+    location_place_id, medication_summary, pharmacy_stock, reference_id
+)
+from ..utils.lazy_import import lazy_import
+
+# Los controladores importan FHIRServerError sin cargar requests
+requests = lazy_import('requests')
+
+logger = logging.getLogger(__name__)
+
+FHIR_JSON = 'application/fhir+json'
+
+
+class FHIRServerError(Exception):
+    """
+    El servidor FHIR no respondió o devolvió un error
+
+    `code` es el estado HTTP del error o 'transport' si no hubo respuesta.
+    """
+
+    def __init__(self, message: str, code: str = 'transport'):
+        super().__init__(message)
+        self.code = code
+
+
+def _resources(bundle: Dict[str, Any], resource_type: str) -> List[Dict[str, Any]]:
+    return [
+        entry['resource'] for entry in bundle.get('entry', [])
+        if entry.get('resource', {}).get('resourceType') == resource_type
+    ]
+
+
+class HTTPFHIRBackend:
+    """
+    Consulta disponibilidad y stock en un servidor FHIR R4 (HAPI u otro).
+
+    Cada lugar de Google es un Location con identifier
+    `<place_id_system>|<place_id>`. La disponibilidad sale de los
+    HealthcareService que apuntan al Location (`_revinclude`) y el stock de
+    la List de inventario del Location con sus Medication (`_include:iterate`).
+
+    Los IDs se agrupan en búsquedas de `chunk_size` identificadores y todas
+    las búsquedas de una página van en una sola Bundle de tipo batch, así
+    que una página de resultados cuesta un round-trip. Las conexiones salen
+    de un pool HTTP compartido por el worker.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 5.0,
+        pool_maxsize: int = 10,
+        chunk_size: int = 20,
+        auth_token: Optional[str] = None,
+        place_id_system: str = DEFAULT_PLACE_ID_SYSTEM
+    ):
+        """
+        Args:
+            base_url: URL base del servidor FHIR (p. ej. http://localhost:8080/fhir)
+            timeout: Timeout de lectura por petición, en segundos
+            pool_maxsize: Conexiones máximas del pool
+            chunk_size: Identificadores por búsqueda dentro de la batch
+            auth_token: Bearer token opcional
+            place_id_system: Sistema del identifier que guarda el place_id
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.place_id_system = place_id_system
+        from .google_client import PoolStatsAdapter
+
+        self.adapter = PoolStatsAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers.update({'Accept': FHIR_JSON, 'Content-Type': FHIR_JSON})
+        if auth_token:
+            self.session.headers['Authorization'] = f'Bearer {auth_token}'
+        self.batches = 0
+
+    def _search_urls(self, place_ids: List[str], query: str) -> List[str]:
+        urls = []
+        for start in range(0, len(place_ids), self.chunk_size):
+            chunk = place_ids[start:start + self.chunk_size]
+            identifiers = ','.join(quote(f'{self.place_id_system}|{place_id}', safe=':/') for place_id in chunk)
+            urls.append(f'Location?identifier={identifiers}&{query}&_count={len(chunk)}')
+        return urls
+
+    def _batch(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """Enviar las búsquedas en una Bundle batch y devolver los searchset"""
+        bundle = {
+            'resourceType': 'Bundle',
+            'type': 'batch',
+            'entry': [{'request': {'method': 'GET', 'url': url}} for url in urls]
+        }
+        try:
+            response = self.session.post(self.base_url, json=bundle, timeout=(3.0, self.timeout))
+            response.raise_for_status()
+            result = response.json()
+        except requests.HTTPError as e:
+            raise FHIRServerError(
+                f'Error consultando el servidor FHIR: {str(e)}', str(e.response.status_code)
+            ) from e
+        except requests.Timeout as e:
+            raise FHIRServerError(f'Error consultando el servidor FHIR: {str(e)}', 'timeout') from e
+        except requests.RequestException as e:
+            raise FHIRServerError(f'Error consultando el servidor FHIR: {str(e)}') from e
+        except ValueError as e:
+            raise FHIRServerError(f'Respuesta inválida del servidor FHIR: {str(e)}', 'invalid_response') from e
+        self.batches += 1
+
+        searchsets = []
+        for entry in result.get('entry', []):
+            status = entry.get('response', {}).get('status', '')
+            if not status.startswith('2'):
+                raise FHIRServerError(f'Búsqueda FHIR fallida dentro de la batch: {status}', status.split(' ')[0] or 'unknown')
+            searchset = entry.get('resource', {})
+            if any(link.get('relation') == 'next' for link in searchset.get('link', [])):
+                logger.warning("Búsqueda FHIR paginada: se ignoran las páginas siguientes")
+            searchsets.append(searchset)
+        return searchsets
+
+    def _locations_by_place_id(self, bundle: Dict[str, Any]) -> Dict[str, str]:
+        """Location.id -> place_id según el identifier de cada Location"""
+        return {
+            location['id']: location_place_id(location, self.place_id_system)
+            for location in _resources(bundle, 'Location')
+        }
+
+    def get_hospital_availability_many(self, place_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Disponibilidad de varios lugares (None si el servidor no conoce el lugar)"""
+        place_ids = list(place_ids)
+        result = dict.fromkeys(place_ids)
+        urls = self._search_urls(place_ids, '_revinclude=HealthcareService:location')
+        for searchset in self._batch(urls):
+            locations = self._locations_by_place_id(searchset)
+            for service in _resources(searchset, 'HealthcareService'):
+                for reference in service.get('location', []):
+                    place_id = locations.get(reference_id(reference))
+                    if place_id not in result:
+                        continue
+                    # Si hay varios servicios por lugar se prefiere uno activo
+                    current = result[place_id]
+                    if current is None or not current['fhir_data']['active']:
+                        result[place_id] = availability_from_service(service)
+        return result
+
+    def get_pharmacy_stock_many(self, place_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Stock de varias farmacias (None si el servidor no conoce el lugar)"""
+        place_ids = list(place_ids)
+        result = dict.fromkeys(place_ids)
+        urls = self._search_urls(place_ids, '_revinclude=List:subject&_include:iterate=List:item')
+        for searchset in self._batch(urls):
+            locations = self._locations_by_place_id(searchset)
+            medications = {resource['id']: resource for resource in _resources(searchset, 'Medication')}
+            for inventory in _resources(searchset, 'List'):
+                place_id = locations.get(reference_id(inventory.get('subject')))
+                if not is_inventory(inventory) or place_id not in result:
+                    continue
+                items = [medications.get(item) for item in inventory_items(inventory)]
+                result[place_id] = pharmacy_stock(
+                    place_id, inventory, (medication_summary(item) for item in items if item is not None)
+                )
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Batches enviadas y uso del pool de conexiones"""
+        return {
+            'backend': 'http',
+            'base_url': self.base_url,
+            'batches': self.batches,
+            'pool': self.adapter.stats()
+        }
@@ -0,0 +1,67 @@
+"""
+Ingesta en streaming de exportaciones FHIR en el backend local
+"""
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.fhir_stream import expand_paths, iter_resources
+from .fhir_local_backend import LocalFHIRBackend
+
+logger = logging.getLogger(__name__)
+
+
+def ingest(
+    paths: List[str],
+    backend: LocalFHIRBackend,
+    fmt: str = 'auto',
+    batch_size: int = 1000,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Cargar archivos NDJSON ($export) o Bundles en el backend local
+
+    Los recursos se leen de uno en uno y se escriben en lotes de
+    `batch_size` (una transacción por lote), así que la memoria no depende
+    del tamaño de los archivos.
+
+    Args:
+        paths: Archivos o directorios de la exportación
+        backend: Backend local donde se guardan los recursos
+        fmt: 'auto', 'ndjson' o 'bundle'
+        batch_size: Recursos por transacción
+        progress: Función que recibe el resumen parcial tras cada lote
+
+    Returns:
+        Resumen con recursos por tipo, archivos, segundos y recursos/segundo
+    """
+    counts = Counter()
+    files = expand_paths(paths)
+    start = time.perf_counter()
+
+    def report():
+        elapsed = time.perf_counter() - start
+        total = sum(count for resource_type, count in counts.items() if resource_type != 'skipped')
+        return {
+            'files': len(files),
+            'resources': total,
+            'by_type': dict(counts),
+            'seconds': round(elapsed, 2),
+            'resources_per_second': round(total / elapsed, 1) if elapsed else None
+        }
+
+    batch = []
+    for path in files:
+        logger.info(f"Ingestando {path}")
+        for resource in iter_resources(path, fmt):
+            batch.append(resource)
+            if len(batch) >= batch_size:
+                counts.update(backend.write_resources(batch))
+                batch = []
+                if progress is not None:
+                    progress(report())
+    if batch:
+        counts.update(backend.write_resources(batch))
+
+    return report()
@@ -0,0 +1,187 @@
+"""
+Backend FHIR local sobre SQLite, alimentado por la ingesta de exportaciones
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from .fhir_resources import (
+    DEFAULT_PLACE_ID_SYSTEM, availability_from_service, inventory_items, is_inventory,
+    location_place_id, medication_summary, pharmacy_stock, reference_id
+)
+
+logger = logging.getLogger(__name__)
+
+# Máximo de parámetros por consulta IN (SQLite antiguo admite 999)
+QUERY_CHUNK = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS location (id TEXT PRIMARY KEY, place_id TEXT) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS location_place_id ON location (place_id)',
+    'CREATE TABLE IF NOT EXISTS healthcare_service ('
+    ' id TEXT NOT NULL, location_id TEXT NOT NULL, active INTEGER NOT NULL, data TEXT NOT NULL,'
+    ' PRIMARY KEY (id, location_id)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS healthcare_service_location ON healthcare_service (location_id)',
+    'CREATE TABLE IF NOT EXISTS inventory ('
+    ' id TEXT PRIMARY KEY, location_id TEXT NOT NULL, updated TEXT, items TEXT NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS inventory_location ON inventory (location_id)',
+    'CREATE TABLE IF NOT EXISTS medication (id TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID',
+)
+
+
+def _chunks(values: List[str], size: int = QUERY_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class LocalFHIRBackend:
+    """
+    Disponibilidad y stock leídos de un archivo SQLite local.
+
+    El archivo se llena con `ingest.py` a partir de exportaciones FHIR Bulk
+    Data (NDJSON) o Bundles: cada recurso se guarda ya convertido al formato
+    de la API, así que las lecturas son consultas por índice sin volver a
+    interpretar FHIR. El archivo está en modo WAL, así que una ingesta en
+    curso no bloquea las lecturas de los workers.
+    """
+
+    def __init__(self, path: str = 'instance/fhir.sqlite3', place_id_system: str = DEFAULT_PLACE_ID_SYSTEM):
+        """
+        Args:
+            path: Archivo SQLite
+            place_id_system: Sistema del identifier de Location que guarda el place_id
+        """
+        self.path = path
+        self.place_id_system = place_id_system
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        for statement in SCHEMA:
+            connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo y por proceso (no se comparten tras un fork)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def write_resources(self, resources: Iterable[Dict[str, Any]]) -> Counter:
+        """
+        Guardar un lote de recursos en una sola transacción
+
+        Returns:
+            Recursos guardados por tipo; los tipos no usados cuentan como 'skipped'
+        """
+        rows = {'location': [], 'healthcare_service': [], 'inventory': [], 'medication': []}
+        counts = Counter()
+        for resource in resources:
+            resource_type = resource.get('resourceType')
+            if resource_type == 'Location':
+                rows['location'].append((resource['id'], location_place_id(resource, self.place_id_system)))
+            elif resource_type == 'HealthcareService':
+                data = json.dumps(availability_from_service(resource), ensure_ascii=False)
+                active = 1 if resource.get('active', True) else 0
+                for reference in resource.get('location', []):
+                    rows['healthcare_service'].append((resource['id'], reference_id(reference), active, data))
+            elif resource_type == 'List' and is_inventory(resource):
+                rows['inventory'].append((
+                    resource['id'],
+                    reference_id(resource.get('subject')),
+                    resource.get('date') or resource.get('meta', {}).get('lastUpdated'),
+                    json.dumps(inventory_items(resource))
+                ))
+            elif resource_type == 'Medication':
+                rows['medication'].append((resource['id'], json.dumps(medication_summary(resource), ensure_ascii=False)))
+            else:
+                counts['skipped'] += 1
+                continue
+            counts[resource_type] += 1
+
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT OR REPLACE INTO location VALUES (?, ?)', rows['location'])
+            connection.executemany('INSERT OR REPLACE INTO healthcare_service VALUES (?, ?, ?, ?)', rows['healthcare_service'])
+            connection.executemany('INSERT OR REPLACE INTO inventory VALUES (?, ?, ?, ?)', rows['inventory'])
+            connection.executemany('INSERT OR REPLACE INTO medication VALUES (?, ?)', rows['medication'])
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return counts
+
+    def _locations(self, place_ids: List[str]) -> Dict[str, str]:
+        """Location.id -> place_id de los lugares pedidos"""
+        locations = {}
+        for chunk in _chunks(place_ids):
+            placeholders = ','.join('?' * len(chunk))
+            locations.update(self._connection().execute(
+                f'SELECT id, place_id FROM location WHERE place_id IN ({placeholders})', chunk
+            ).fetchall())
+        return locations
+
+    def get_hospital_availability_many(self, place_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Disponibilidad de varios lugares (None si no hay datos del lugar)"""
+        place_ids = list(place_ids)
+        result = dict.fromkeys(place_ids)
+        locations = self._locations(place_ids)
+        for chunk in _chunks(list(locations)):
+            placeholders = ','.join('?' * len(chunk))
+            # Los servicios activos primero: se queda el primero de cada lugar
+            rows = self._connection().execute(
+                f'SELECT location_id, data FROM healthcare_service WHERE location_id IN ({placeholders})'
+                ' ORDER BY active DESC', chunk
+            ).fetchall()
+            for location_id, data in rows:
+                place_id = locations[location_id]
+                if result.get(place_id) is None:
+                    result[place_id] = json.loads(data)
+        return result
+
+    def get_pharmacy_stock_many(self, place_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Stock de varias farmacias (None si no hay inventario del lugar)"""
+        place_ids = list(place_ids)
+        result = dict.fromkeys(place_ids)
+        locations = self._locations(place_ids)
+
+        inventories = []
+        for chunk in _chunks(list(locations)):
+            placeholders = ','.join('?' * len(chunk))
+            inventories.extend(self._connection().execute(
+                f'SELECT location_id, updated, items FROM inventory WHERE location_id IN ({placeholders})', chunk
+            ).fetchall())
+
+        items = {location_id: json.loads(item_ids) for location_id, _, item_ids in inventories}
+        medication_ids = list({medication_id for ids in items.values() for medication_id in ids})
+        medications = {}
+        for chunk in _chunks(medication_ids):
+            placeholders = ','.join('?' * len(chunk))
+            medications.update(self._connection().execute(
+                f'SELECT id, data FROM medication WHERE id IN ({placeholders})', chunk
+            ).fetchall())
+
+        for location_id, updated, _ in inventories:
+            place_id = locations[location_id]
+            summaries = (json.loads(medications[item]) for item in items[location_id] if item in medications)
+            result[place_id] = pharmacy_stock(place_id, {'date': updated}, summaries)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Archivo y tamaño de la base local"""
+        return {
+            'backend': 'local',
+            'path': self.path,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
@@ -0,0 +1,97 @@
+"""
+Conversión de recursos FHIR R4 al formato de disponibilidad y stock de la API
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+# Sistema de identificadores con el que los recursos Location guardan el place_id de Google
+DEFAULT_PLACE_ID_SYSTEM = 'https://maps.google.com/place_id'
+
+# Extensión de HealthcareService con los tiempos de espera (minutos) por tipo de atención
+WAIT_TIME_EXTENSION = 'https://buscasalud.app/fhir/StructureDefinition/wait-time'
+WAIT_TIME_KINDS = ('emergency', 'consultation', 'specialist')
+
+# Código de List que agrupa los medicamentos en inventario de una farmacia
+INVENTORY_LIST_CODE = 'inventory'
+
+
+def reference_id(reference: Optional[Dict[str, Any]]) -> Optional[str]:
+    """{'reference': 'Location/abc'} -> 'abc'"""
+    if not reference or not reference.get('reference'):
+        return None
+    return reference['reference'].rsplit('/', 1)[-1]
+
+
+def location_place_id(location: Dict[str, Any], place_id_system: str = DEFAULT_PLACE_ID_SYSTEM) -> Optional[str]:
+    """place_id de Google guardado en el identifier de un Location"""
+    for identifier in location.get('identifier', []):
+        if identifier.get('system') == place_id_system:
+            return identifier.get('value')
+    return None
+
+
+def is_inventory(resource: Dict[str, Any]) -> bool:
+    """True si la List es el inventario de una farmacia"""
+    codes = [coding.get('code') for coding in resource.get('code', {}).get('coding', [])]
+    return INVENTORY_LIST_CODE in codes
+
+
+def inventory_items(inventory: Dict[str, Any]) -> List[str]:
+    """IDs de los Medication de una List de inventario"""
+    items = (reference_id(entry.get('item')) for entry in inventory.get('entry', []))
+    return [item for item in items if item]
+
+
+def availability_from_service(service: Dict[str, Any]) -> Dict[str, Any]:
+    """HealthcareService R4 -> formato del backend simulado; next_appointment no se consulta (sin Slot)"""
+    wait_times = dict.fromkeys(WAIT_TIME_KINDS)
+    for extension in service.get('extension', []):
+        if extension.get('url') != WAIT_TIME_EXTENSION:
+            continue
+        for item in extension.get('extension', []):
+            if item.get('url') in wait_times:
+                wait_times[item['url']] = item.get('valueInteger')
+
+    active = service.get('active', True)
+    return {
+        'fhir_data': {
+            'resourceType': 'HealthcareService',
+            'id': service.get('id'),
+            'active': active,
+            'availableTime': service.get('availableTime', []),
+            'notAvailable': service.get('notAvailable', []),
+            'availabilityExceptions': service.get('availabilityExceptions')
+        },
+        'wait_times': wait_times,
+        'status': 'available' if active else 'busy',
+        'next_appointment': None
+    }
+
+
+def medication_summary(medication: Dict[str, Any]) -> Dict[str, Any]:
+    """Medication R4 -> formato del backend simulado (amount.value = unidades)"""
+    numerator = medication.get('amount', {}).get('numerator', {})
+    code = {'text': medication.get('code', {}).get('text', '')}
+    # Los códigos (ATC, CUM...) se conservan para buscar medicamentos por código
+    coding = [
+        {'system': item.get('system'), 'code': item['code']}
+        for item in medication.get('code', {}).get('coding', []) if item.get('code')
+    ]
+    if coding:
+        code['coding'] = coding
+    return {
+        'resourceType': 'Medication',
+        'id': medication.get('id'),
+        'code': code,
+        'status': medication.get('status', 'active'),
+        'amount': {'value': numerator.get('value', 0)}
+    }
+
+
+def pharmacy_stock(place_id: str, inventory: Dict[str, Any], medications: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Stock de una farmacia a partir de su List de inventario y sus Medication ya resumidos"""
+    return {
+        'pharmacy_id': place_id,
+        'medications': list(medications),
+        'last_updated': inventory.get('date') or inventory.get('meta', {}).get('lastUpdated'),
+        'fhir_version': '4.0.1'
+    }
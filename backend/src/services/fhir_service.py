@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 """
-Servicio FHIR para integración superficial con estándares de salud
-Simula datos de disponibilidad y recursos médicos
+Servicio FHIR para integración con estándares de salud
+Por defecto simula datos de disponibilidad y recursos médicos; con
+FHIR_BACKEND=http los consulta en un servidor FHIR R4 y con
+FHIR_BACKEND=local en la base cargada con ingest.py
 """
 
 import random
 from datetime import datetime, timedelta
 
-class FHIRService:
-    """Servicio para simular integración con estándares FHIR/HL7"""
+from ..utils.metrics import UPSTREAM_CALLS, UPSTREAM_ERRORS, span
+from ..utils.settings import get_setting
+
+FHIR_BACKENDS = ('simulated', 'http', 'local')
+
+class SimulatedFHIRBackend:
+    """Backend que genera datos FHIR simulados con random"""
     
     @staticmethod
     def get_hospital_availability(place_id):
@@ -78,6 +85,109 @@ class FHIRService:
             "fhir_version": "4.0.1"
         }
     
+    def get_hospital_availability_many(self, place_ids):
+        """Disponibilidad simulada de varios lugares"""
+        return {place_id: self.get_hospital_availability(place_id) for place_id in place_ids}
+    
+    def get_pharmacy_stock_many(self, place_ids):
+        """Stock simulado de varias farmacias"""
+        return {place_id: self.get_pharmacy_stock(place_id) for place_id in place_ids}
+    
+    def stats(self):
+        return {'backend': 'simulated'}
+
+def create_fhir_backend(config):
+    """
+    Crear el backend FHIR indicado en FHIR_BACKEND
+    
+    - simulated (por defecto): datos generados con random
+    - http: servidor FHIR R4 en FHIR_SERVER_URL
+    - local: archivo SQLite FHIR_LOCAL_PATH cargado con ingest.py
+    """
+    backend = get_setting(config, 'FHIR_BACKEND', 'simulated')
+    
+    if backend == 'simulated':
+        return SimulatedFHIRBackend()
+    
+    if backend == 'http':
+        from .fhir_http_backend import HTTPFHIRBackend
+        from .fhir_resources import DEFAULT_PLACE_ID_SYSTEM
+        return HTTPFHIRBackend(
+            get_setting(config, 'FHIR_SERVER_URL', 'http://localhost:8080/fhir'),
+            timeout=get_setting(config, 'FHIR_TIMEOUT', 5.0),
+            pool_maxsize=get_setting(config, 'FHIR_POOL_MAXSIZE', 10),
+            chunk_size=get_setting(config, 'FHIR_BATCH_CHUNK', 20),
+            auth_token=get_setting(config, 'FHIR_AUTH_TOKEN') or None,
+            place_id_system=get_setting(config, 'FHIR_PLACE_ID_SYSTEM', DEFAULT_PLACE_ID_SYSTEM)
+        )
+    
+    if backend == 'local':
+        from .fhir_local_backend import LocalFHIRBackend
+        from .fhir_resources import DEFAULT_PLACE_ID_SYSTEM
+        return LocalFHIRBackend(
+            get_setting(config, 'FHIR_LOCAL_PATH', 'instance/fhir.sqlite3'),
+            place_id_system=get_setting(config, 'FHIR_PLACE_ID_SYSTEM', DEFAULT_PLACE_ID_SYSTEM)
+        )
+    
+    raise ValueError(f"FHIR_BACKEND inválido: {backend}. Válidos: {', '.join(FHIR_BACKENDS)}")
+
+class FHIRService:
+    """
+    Servicio FHIR/HL7: disponibilidad y stock desde un backend intercambiable
+    
+    Los métodos *_many consultan una página completa de lugares de una vez;
+    devuelven None para los lugares sin datos en el backend.
+    """
+    
+    def __init__(self, backend=None, metrics=None):
+        """
+        Args:
+            backend: Backend FHIR (por defecto el simulado)
+            metrics: Métricas donde contar llamadas y errores del backend (opcional)
+        """
+        self.backend = backend if backend is not None else SimulatedFHIRBackend()
+        self.metrics = metrics
+    
+    @classmethod
+    def from_config(cls, config, metrics=None):
+        """Crear el servicio con el backend de la configuración"""
+        return cls(create_fhir_backend(config), metrics)
+    
+    def _call(self, endpoint, method, place_ids):
+        # Cada consulta al backend es un span 'fhir' de la petición en curso
+        if self.metrics is not None:
+            self.metrics.inc(UPSTREAM_CALLS, service='fhir', endpoint=endpoint)
+        try:
+            with span('fhir'):
+                return method(place_ids)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.inc(
+                    UPSTREAM_ERRORS, service='fhir', endpoint=endpoint,
+                    code=getattr(e, 'code', type(e).__name__)
+                )
+            raise
+    
+    def get_hospital_availability(self, place_id):
+        """Disponibilidad de un lugar (None si el backend no lo conoce)"""
+        return self.get_hospital_availability_many([place_id]).get(place_id)
+    
+    def get_pharmacy_stock(self, place_id):
+        """Stock de una farmacia (None si el backend no la conoce)"""
+        return self.get_pharmacy_stock_many([place_id]).get(place_id)
+    
+    def get_hospital_availability_many(self, place_ids):
+        """Disponibilidad de varios lugares en una consulta al backend"""
+        return self._call('availability', self.backend.get_hospital_availability_many, place_ids)
+    
+    def get_pharmacy_stock_many(self, place_ids):
+        """Stock de varias farmacias en una consulta al backend"""
+        return self._call('stock', self.backend.get_pharmacy_stock_many, place_ids)
+    
+    def stats(self):
+        """Estadísticas del backend"""
+        return self.backend.stats()
+    
     @staticmethod
     def get_hl7_patient_data():
         """Simula datos de paciente usando estándares HL7"""
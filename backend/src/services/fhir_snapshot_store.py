@@ -0,0 +1,270 @@
+"""
+Snapshots precalculados de disponibilidad y stock FHIR por lugar
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..utils.settings import get_setting
+from .fhir_service import FHIRService
+
+logger = logging.getLogger(__name__)
+
+# Tipos de snapshot -> método de FHIRService que los genera por lotes
+KINDS = {
+    'availability': 'get_hospital_availability_many',
+    'stock': 'get_pharmacy_stock_many',
+}
+
+# Lugares por consulta al backend durante el refresco
+REFRESH_BATCH = 100
+
+
+class Snapshot(NamedTuple):
+    """Recurso FHIR de un lugar, ya serializado (data None si el backend no lo conoce)"""
+    data: Optional[Dict[str, Any]]
+    payload: bytes
+    generated_at: float
+
+
+def serialize(data: Any) -> bytes:
+    """Serializar a JSON compacto en UTF-8"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FHIRSnapshotStore:
+    """
+    Guarda un snapshot de disponibilidad y otro de stock por place_id.
+
+    Las peticiones leen el snapshot ya serializado (bytes) en vez de
+    reconstruir los recursos FHIR; un hilo en segundo plano los regenera
+    cada `refresh_interval` segundos. Los lugares que nadie pide durante
+    `idle_ttl` segundos dejan de refrescarse y se descartan, y cada tipo
+    guarda como mucho `max_entries` lugares (se descartan los menos usados).
+
+    Los oyentes registrados con `add_listener` reciben cada snapshot nuevo o
+    regenerado, y None cuando un lugar se descarta.
+    """
+
+    def __init__(
+        self,
+        fhir_service: FHIRService,
+        refresh_interval: float = 60,
+        idle_ttl: float = 3600,
+        max_entries: int = 5000
+    ):
+        """
+        Args:
+            fhir_service: Servicio que genera los recursos FHIR
+            refresh_interval: Segundos entre regeneraciones de los snapshots
+            idle_ttl: Segundos sin peticiones tras los que se descarta un lugar
+            max_entries: Lugares máximos por tipo de snapshot
+        """
+        self.fhir_service = fhir_service
+        self.refresh_interval = refresh_interval
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # kind -> OrderedDict(place_id -> Snapshot), en orden de uso
+        self._snapshots = {kind: OrderedDict() for kind in KINDS}
+        # (kind, place_id) -> última petición (time.monotonic)
+        self._last_access: Dict[tuple, float] = {}
+        self._refresher: Optional[threading.Thread] = None
+        self._refresher_pid = None
+        self._stop = threading.Event()
+        self._listeners: List[Callable[[str, str, Optional[Snapshot]], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.last_refresh_ms = None
+        self._last_refresh_at = None
+
+    @classmethod
+    def from_config(cls, config, fhir_service: FHIRService) -> 'FHIRSnapshotStore':
+        """Crear el almacén a partir de un objeto o dict de configuración"""
+        return cls(
+            fhir_service,
+            refresh_interval=get_setting(config, 'FHIR_SNAPSHOT_REFRESH', 60),
+            idle_ttl=get_setting(config, 'FHIR_SNAPSHOT_IDLE_TTL', 3600),
+            max_entries=get_setting(config, 'FHIR_SNAPSHOT_MAX_ENTRIES', 5000)
+        )
+
+    def add_listener(self, listener: Callable[[str, str, Optional[Snapshot]], None]):
+        """Registrar listener(kind, place_id, snapshot) para los cambios de snapshots"""
+        self._listeners.append(listener)
+
+    def _notify(self, kind: str, changes: List[Tuple[str, Optional[Snapshot]]]):
+        # Fuera del lock: los oyentes pueden volver a leer el almacén
+        for listener in self._listeners:
+            for place_id, snapshot in changes:
+                try:
+                    listener(kind, place_id, snapshot)
+                except Exception as e:
+                    logger.error(f"Error en un oyente de snapshots FHIR: {str(e)}")
+
+    def _generate_many(self, kind: str, place_ids: List[str]) -> Dict[str, Snapshot]:
+        generated_at = time.time()
+        resources = getattr(self.fhir_service, KINDS[kind])(place_ids)
+        return {
+            place_id: Snapshot(resources.get(place_id), serialize(resources.get(place_id)), generated_at)
+            for place_id in place_ids
+        }
+
+    def _store(self, kind: str, place_id: str, snapshot: Snapshot) -> List[str]:
+        """Guardar un snapshot; devuelve los lugares descartados para hacerle sitio"""
+        snapshots = self._snapshots[kind]
+        snapshots[place_id] = snapshot
+        snapshots.move_to_end(place_id)
+        evicted = []
+        while len(snapshots) > self.max_entries:
+            oldest, _ = snapshots.popitem(last=False)
+            self._last_access.pop((kind, oldest), None)
+            self.evictions += 1
+            evicted.append(oldest)
+        return evicted
+
+    def get_many(self, kind: str, place_ids: Iterable[str]) -> Dict[str, Snapshot]:
+        """
+        Obtener los snapshots de varios lugares, generando los que falten
+
+        Args:
+            kind: 'availability' o 'stock'
+            place_ids: IDs de lugares de Google
+
+        Returns:
+            Dict place_id -> Snapshot, en el orden pedido
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de snapshot inválido: {kind}")
+        self._ensure_refresher()
+
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with self._lock:
+            snapshots = self._snapshots[kind]
+            for place_id in place_ids:
+                self._last_access[(kind, place_id)] = now
+                snapshot = snapshots.get(place_id)
+                if snapshot is None:
+                    missing.append(place_id)
+                else:
+                    snapshots.move_to_end(place_id)
+                    result[place_id] = snapshot
+            self.hits += len(result)
+            self.misses += len(missing)
+
+        if missing:
+            generated = self._generate_many(kind, missing)
+            changes = list(generated.items())
+            with self._lock:
+                for place_id, snapshot in generated.items():
+                    changes.extend((evicted, None) for evicted in self._store(kind, place_id, snapshot))
+            result.update(generated)
+            self._notify(kind, changes)
+
+        return {place_id: result[place_id] for place_id in place_ids if place_id in result}
+
+    def get(self, kind: str, place_id: str) -> Snapshot:
+        """Obtener el snapshot de un lugar, generándolo si no existe"""
+        return self.get_many(kind, [place_id])[place_id]
+
+    def get_data(self, kind: str, place_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Igual que get_many, pero devolviendo los recursos como dicts"""
+        return {place_id: snapshot.data for place_id, snapshot in self.get_many(kind, place_ids).items()}
+
+    def response_body(self, kind: str, place_ids: List[str]) -> bytes:
+        """
+        Cuerpo JSON {"success": true, "data": {place_id: recurso}} armado
+        con los fragmentos ya serializados, sin volver a codificarlos
+        """
+        snapshots = self.get_many(kind, place_ids)
+        items = [serialize(place_id) + b':' + snapshot.payload for place_id, snapshot in snapshots.items()]
+        return b'{"success":true,"data":{' + b','.join(items) + b'}}'
+
+    def refresh(self):
+        """Regenerar los snapshots de los lugares pedidos recientemente"""
+        start = time.perf_counter()
+        now = time.monotonic()
+        with self._lock:
+            stale = [key for key, accessed in self._last_access.items() if now - accessed > self.idle_ttl]
+            for kind, place_id in stale:
+                del self._last_access[(kind, place_id)]
+                self._snapshots[kind].pop(place_id, None)
+            pending = [(kind, list(snapshots)) for kind, snapshots in self._snapshots.items()]
+
+        for kind, place_id in stale:
+            self._notify(kind, [(place_id, None)])
+
+        for kind, place_ids in pending:
+            for offset in range(0, len(place_ids), REFRESH_BATCH):
+                try:
+                    generated = self._generate_many(kind, place_ids[offset:offset + REFRESH_BATCH])
+                except Exception as e:
+                    # Se conservan los snapshots anteriores hasta el próximo refresco
+                    logger.error(f"Error regenerando snapshots FHIR de {kind}: {str(e)}")
+                    continue
+                changes = []
+                with self._lock:
+                    snapshots = self._snapshots[kind]
+                    for place_id, snapshot in generated.items():
+                        # Solo se reemplaza si el lugar sigue en el almacén
+                        if place_id in snapshots:
+                            snapshots[place_id] = snapshot
+                            changes.append((place_id, snapshot))
+                self._notify(kind, changes)
+
+        self.refreshes += 1
+        self.last_refresh_ms = round((time.perf_counter() - start) * 1000, 2)
+        self._last_refresh_at = time.monotonic()
+
+    def _ensure_refresher(self):
+        # El hilo no sobrevive a un fork: cada worker arranca el suyo
+        if self._refresher_pid == os.getpid() or self.refresh_interval <= 0:
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name='fhir-snapshots', daemon=True
+            )
+            self._refresher_pid = os.getpid()
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error en el refresco de snapshots FHIR: {str(e)}")
+
+    def close(self):
+        """Detener el hilo de refresco"""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño del almacén, aciertos y estado del refresco"""
+        with self._lock:
+            entries = {kind: len(snapshots) for kind, snapshots in self._snapshots.items()}
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'refresh_interval_s': self.refresh_interval,
+            'refreshes': self.refreshes,
+            'last_refresh_ms': self.last_refresh_ms,
+            'last_refresh_age_s': (
+                round(time.monotonic() - self._last_refresh_at, 1)
+                if self._last_refresh_at is not None else None
+            )
+        }
@@ -0,0 +1,96 @@
+"""
+Caché de geocodificación compartida por los servicios de Google
+"""
+import re
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.cache import TTLCache, MISSING, create_cache
+from ..utils.settings import get_setting
+
+
+def normalize_location(location: str) -> str:
+    """
+    Normalizar un texto de ubicación para usarlo como clave de caché
+
+    Ignora mayúsculas, tildes y espacios repetidos:
+    "  Bogotá ,Colombia" y "bogota, colombia" producen la misma clave.
+    """
+    text = unicodedata.normalize('NFKD', location or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = text.lower()
+    text = re.sub(r'\s*,\s*', ', ', text)
+    return ' '.join(text.split()).strip(' ,')
+
+
+class GeocodeCache:
+    """Caché de resultados de geocodificación con TTL, LRU y resultados negativos"""
+
+    def __init__(
+        self,
+        ttl: float = 86400,
+        negative_ttl: float = 600,
+        max_entries: int = 5000,
+        backend=None
+    ):
+        """
+        Args:
+            ttl: Segundos que se guarda una ubicación encontrada
+            negative_ttl: Segundos que se guarda una ubicación no encontrada
+            max_entries: Número máximo de ubicaciones en memoria
+            backend: Almacenamiento (ver utils.cache.create_cache); por defecto en memoria
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        if backend is None:
+            backend = TTLCache(max_entries=max_entries, default_ttl=ttl)
+        self._cache = backend
+
+    @classmethod
+    def from_config(cls, config) -> 'GeocodeCache':
+        """Crear la caché a partir de un objeto o dict de configuración"""
+        ttl = get_setting(config, 'GEOCODE_CACHE_TTL', 86400)
+        max_entries = get_setting(config, 'GEOCODE_CACHE_MAX_ENTRIES', 5000)
+        return cls(
+            ttl=ttl,
+            negative_ttl=get_setting(config, 'GEOCODE_CACHE_NEGATIVE_TTL', 600),
+            max_entries=max_entries,
+            backend=create_cache(config, 'geocode', max_entries, ttl)
+        )
+
+    def get_or_fetch(
+        self,
+        location: str,
+        fetch: Callable[[str], List[Dict[str, Any]]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Obtener el primer resultado de geocodificación de una ubicación
+
+        Args:
+            location: Texto de ubicación tal como lo envió el usuario
+            fetch: Función que llama a la API (p. ej. client.geocode)
+
+        Returns:
+            Primer resultado de la API, o None si la ubicación no existe.
+            Los errores de la API no se cachean y se propagan.
+        """
+        key = normalize_location(location)
+        cached = self._cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        results = fetch(location)
+        if results:
+            self._cache.set(key, results[0], self.ttl)
+            return results[0]
+
+        self._cache.set(key, None, self.negative_ttl)
+        return None
+
+    def clear(self):
+        """Vaciar la caché"""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos y fallos"""
+        return self._cache.stats()
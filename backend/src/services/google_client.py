@@ -0,0 +1,424 @@
+"""
+Cliente HTTP compartido para Google Maps con pool de conexiones
+"""
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional
+
+import googlemaps
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..utils.metrics import UPSTREAM_CALLS, UPSTREAM_ERRORS, span
+from ..utils.settings import get_setting
+from ..utils.singleflight import SingleFlight
+from .circuit_breaker import ENDPOINTS, CircuitOpenError, EndpointGuard, UpstreamTimeout, guard_client
+from .upstream_limits import AdaptiveConcurrencyLimiter, SharedTokenBucket, UpstreamThrottled, throttle_client
+
+
+class PoolStatsAdapter(HTTPAdapter):
+    """Adaptador HTTP que lleva contadores de uso del pool de conexiones"""
+
+    def __init__(self, *args, latency_window: int = 1000, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._latencies = deque(maxlen=latency_window)
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        with self._stats_lock:
+            self._requests += 1
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+        start = time.perf_counter()
+        try:
+            return super().send(request, **kwargs)
+        except Exception:
+            with self._stats_lock:
+                self._errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self._in_flight -= 1
+                self._latencies.append(elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumen de uso del pool (peticiones, conexiones y latencias)"""
+        connections = 0
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            connections += getattr(pool, 'num_connections', 0)
+
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            requests_total = self._requests
+            stats = {
+                'requests': requests_total,
+                'errors': self._errors,
+                'in_flight': self._in_flight,
+                'max_in_flight': self._max_in_flight,
+            }
+
+        stats['connections_opened'] = connections
+        stats['connections_reused'] = max(requests_total - connections, 0)
+        stats['latency_ms'] = {
+            'p50': _percentile(latencies, 50),
+            'p99': _percentile(latencies, 99),
+            'samples': len(latencies)
+        }
+        return stats
+
+
+def _percentile(sorted_values, percent: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+
+def create_google_client(
+    api_key: str,
+    pool_connections: int = 10,
+    pool_maxsize: int = 20,
+    keep_alive: bool = True,
+    connect_timeout: float = 3.0,
+    read_timeout: float = 10.0,
+    retry_timeout: int = 60,
+    base_url: Optional[str] = None,
+    coalesce: bool = True,
+    rate_limiter: Optional[SharedTokenBucket] = None,
+    concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    queue_timeout: float = 2.0,
+    guards: Optional[Dict[str, EndpointGuard]] = None
+) -> googlemaps.Client:
+    """
+    Crear un cliente de Google Maps con un pool de conexiones configurable
+
+    Args:
+        api_key: API key de Google Maps
+        pool_connections: Número de pools por host a mantener
+        pool_maxsize: Conexiones máximas por pool (debe cubrir los hilos del worker)
+        keep_alive: Reutilizar conexiones TLS entre peticiones
+        connect_timeout: Timeout de conexión por llamada, en segundos
+        read_timeout: Timeout de lectura por llamada, en segundos
+        retry_timeout: Tiempo máximo acumulado de reintentos, en segundos
+        base_url: URL base alternativa (útil para servidores de prueba)
+        coalesce: Agrupar llamadas idénticas concurrentes (ver coalesce_client)
+        rate_limiter: Token bucket compartido por los workers del host
+        concurrency_limiter: Límite adaptativo de llamadas simultáneas
+        queue_timeout: Segundos que una llamada espera cupo antes de rechazarse
+        guards: Circuit breaker, plazo y hedging por endpoint (ver circuit_breaker)
+
+    Returns:
+        Cliente de googlemaps con la sesión HTTP configurada
+    """
+    session = requests.Session()
+    adapter = PoolStatsAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=False
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+
+    client_kwargs = {
+        'key': api_key,
+        'connect_timeout': connect_timeout,
+        'read_timeout': read_timeout,
+        'retry_timeout': retry_timeout,
+        # Sin reintentos internos ante OVER_QUERY_LIMIT: los gestiona el limitador
+        'retry_over_query_limit': False,
+        'requests_session': session
+    }
+    if base_url:
+        client_kwargs['base_url'] = base_url
+
+    client = googlemaps.Client(**client_kwargs)
+    client.pool_adapter = adapter
+    if rate_limiter is not None or concurrency_limiter is not None:
+        throttle_client(client, rate_limiter, concurrency_limiter, queue_timeout)
+    if guards:
+        # Cada intento cubierto pasa por los límites: el guard va por fuera
+        guard_client(client, guards)
+    if coalesce:
+        # Las llamadas coalescidas no consumen cupo: el single-flight va por fuera
+        coalesce_client(client)
+    return client
+
+
+def google_client_from_config(config, api_key: Optional[str] = None) -> googlemaps.Client:
+    """
+    Crear el cliente de Google Maps de un worker a partir de la configuración
+
+    Args:
+        config: Objeto o dict de configuración
+        api_key: API key (por defecto GOOGLE_MAPS_API_KEY)
+    """
+    api_key = api_key or get_setting(config, 'GOOGLE_MAPS_API_KEY')
+    if not api_key:
+        raise ValueError("GOOGLE_MAPS_API_KEY no encontrada en variables de entorno")
+
+    rate_limiter = None
+    rate = get_setting(config, 'GOOGLE_MAPS_RATE_LIMIT', 50)
+    if rate:
+        rate_limiter = SharedTokenBucket(
+            rate,
+            get_setting(config, 'GOOGLE_MAPS_RATE_BURST', 100),
+            get_setting(config, 'GOOGLE_MAPS_RATE_LIMIT_FILE', 'instance/google_rate_limit.bin') or None
+        )
+
+    max_concurrency = get_setting(config, 'GOOGLE_MAPS_MAX_CONCURRENCY', 20)
+    concurrency_limiter = AdaptiveConcurrencyLimiter(
+        initial=max_concurrency,
+        min_limit=get_setting(config, 'GOOGLE_MAPS_MIN_CONCURRENCY', 2),
+        max_limit=max_concurrency,
+        latency_target_ms=get_setting(config, 'GOOGLE_MAPS_LATENCY_TARGET_MS', 2000)
+    ) if max_concurrency else None
+
+    guards = None
+    if get_setting(config, 'GOOGLE_MAPS_CIRCUIT_BREAKER', True):
+        executor = ThreadPoolExecutor(
+            max_workers=get_setting(config, 'GOOGLE_MAPS_GUARD_WORKERS', 32),
+            thread_name_prefix='google-call'
+        )
+        guards = {
+            endpoint: EndpointGuard(
+                endpoint,
+                executor,
+                timeout=get_setting(config, f'GOOGLE_MAPS_TIMEOUT_{endpoint.upper()}', 10.0),
+                failure_threshold=get_setting(config, 'GOOGLE_MAPS_BREAKER_FAILURES', 5),
+                recovery_timeout=get_setting(config, 'GOOGLE_MAPS_BREAKER_RECOVERY', 30),
+                hedge=get_setting(config, 'GOOGLE_MAPS_HEDGE', False),
+                hedge_percentile=get_setting(config, 'GOOGLE_MAPS_HEDGE_PERCENTILE', 95),
+                hedge_min_delay_ms=get_setting(config, 'GOOGLE_MAPS_HEDGE_MIN_DELAY_MS', 50),
+                hedge_budget=get_setting(config, 'GOOGLE_MAPS_HEDGE_BUDGET', 0.1)
+            )
+            for endpoint in ENDPOINTS.values()
+        }
+
+    return create_google_client(
+        api_key,
+        pool_connections=get_setting(config, 'GOOGLE_MAPS_POOL_CONNECTIONS', 10),
+        pool_maxsize=get_setting(config, 'GOOGLE_MAPS_POOL_MAXSIZE', 20),
+        keep_alive=get_setting(config, 'GOOGLE_MAPS_KEEP_ALIVE', True),
+        connect_timeout=get_setting(config, 'GOOGLE_MAPS_CONNECT_TIMEOUT', 3.0),
+        read_timeout=get_setting(config, 'GOOGLE_MAPS_READ_TIMEOUT', 10.0),
+        retry_timeout=get_setting(config, 'GOOGLE_MAPS_RETRY_TIMEOUT', 60),
+        base_url=get_setting(config, 'GOOGLE_MAPS_BASE_URL') or None,
+        coalesce=get_setting(config, 'GOOGLE_MAPS_COALESCE', True),
+        rate_limiter=rate_limiter,
+        concurrency_limiter=concurrency_limiter,
+        queue_timeout=get_setting(config, 'GOOGLE_MAPS_QUEUE_TIMEOUT', 2.0),
+        guards=guards
+    )
+
+
+# Métodos del cliente cuyas llamadas idénticas en curso se agrupan
+COALESCED_METHODS = ('geocode', 'places_nearby', 'place')
+
+
+def _freeze(value):
+    """Convertir argumentos (dicts, listas) en una clave hashable"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(item) for item in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def coalesce_client(client, flight: Optional[SingleFlight] = None):
+    """
+    Envolver geocode, places_nearby y place con un single-flight
+
+    Las llamadas concurrentes con los mismos argumentos dentro del proceso
+    esperan el resultado de la primera en vez de repetirla contra Google.
+    El resultado es compartido: los llamadores no deben modificarlo.
+
+    Returns:
+        El mismo cliente, con el SingleFlight en `client.single_flight`
+    """
+    flight = flight or SingleFlight()
+    for name in COALESCED_METHODS:
+        method = getattr(client, name)
+
+        @functools.wraps(method)
+        def coalesced(*args, _name=name, _method=method, **kwargs):
+            key = (_name, _freeze(args), _freeze(kwargs))
+            return flight.do(key, _method, *args, **kwargs)
+
+        setattr(client, name, coalesced)
+    client.single_flight = flight
+    return client
+
+
+def error_code(error: Exception) -> str:
+    """Código corto de un error de Google para las métricas (estado de la API, HTTP o tipo)"""
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, UpstreamTimeout):
+        return 'deadline'
+    if isinstance(error, UpstreamThrottled):
+        return 'throttled'
+    if isinstance(error, googlemaps.exceptions.ApiError):
+        return error.status
+    if isinstance(error, googlemaps.exceptions.HTTPError):
+        return f'http_{error.status_code}'
+    if isinstance(error, googlemaps.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, googlemaps.exceptions.TransportError):
+        return 'transport'
+    return type(error).__name__
+
+
+def instrument_client(client, metrics):
+    """
+    Medir geocode, places_nearby, place y places_photo
+
+    Cada llamada suma un span con el nombre de su endpoint (geocode, nearby,
+    details, photo) a la petición en curso y cuenta llamadas y errores por
+    código en `metrics`. Va por fuera de todas las capas: mide lo que
+    espera la petición, incluidas la cola de los límites y el single-flight.
+
+    Returns:
+        El mismo cliente
+    """
+    for method_name, endpoint in ENDPOINTS.items():
+        method = getattr(client, method_name)
+
+        @functools.wraps(method)
+        def instrumented(*args, _endpoint=endpoint, _method=method, **kwargs):
+            metrics.inc(UPSTREAM_CALLS, service='google', endpoint=_endpoint)
+            try:
+                with span(_endpoint):
+                    return _method(*args, **kwargs)
+            except Exception as e:
+                metrics.inc(UPSTREAM_ERRORS, service='google', endpoint=_endpoint, code=error_code(e))
+                raise
+
+        setattr(client, method_name, instrumented)
+    return client
+
+
+# places_nearby entrega 20 resultados por página y como máximo 3 páginas
+PAGE_SIZE = 20
+MAX_PAGES = 3
+
+# Google tarda unos segundos en activar un next_page_token
+PAGE_TOKEN_DELAY = 2.0
+PAGE_TOKEN_RETRIES = 3
+
+
+def pages_for(max_results: int) -> int:
+    """Número de páginas de places_nearby necesarias para `max_results` resultados"""
+    return max(1, min(MAX_PAGES, -(-max_results // PAGE_SIZE)))
+
+
+def iter_places_nearby_pages(
+    client,
+    location: Dict[str, float],
+    radius: int,
+    place_type: str,
+    max_pages: int = 1
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Recorrer las páginas de places_nearby siguiendo next_page_token
+
+    Args:
+        client: Cliente de googlemaps
+        location: Dict con 'lat' y 'lng'
+        radius: Radio de búsqueda en metros
+        place_type: Tipo de lugar de Google Places
+        max_pages: Número máximo de páginas (Google entrega como máximo 3)
+
+    Yields:
+        Lista de resultados crudos de cada página
+    """
+    response = client.places_nearby(location=location, radius=radius, type=place_type)
+    yield response.get('results', [])
+
+    pages = 1
+    token = response.get('next_page_token')
+    while token and pages < max_pages:
+        for attempt in range(PAGE_TOKEN_RETRIES):
+            time.sleep(PAGE_TOKEN_DELAY)
+            try:
+                response = client.places_nearby(page_token=token)
+                break
+            except googlemaps.exceptions.ApiError as e:
+                # INVALID_REQUEST: el token todavía no está activo
+                if e.status != 'INVALID_REQUEST' or attempt == PAGE_TOKEN_RETRIES - 1:
+                    raise
+        pages += 1
+        yield response.get('results', [])
+        token = response.get('next_page_token')
+
+
+# Estados de Places que indican que el place_id no existe
+NOT_FOUND_STATUSES = {'NOT_FOUND', 'INVALID_REQUEST', 'ZERO_RESULTS'}
+
+
+def fetch_place_result(client, place_id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Llamar a Place Details con una máscara de campos
+
+    Returns:
+        El `result` crudo de Google, o None si el lugar no existe.
+        Otros errores de la API se propagan.
+    """
+    try:
+        response = client.place(place_id=place_id, fields=fields)
+    except googlemaps.exceptions.ApiError as e:
+        if e.status in NOT_FOUND_STATUSES:
+            return None
+        raise
+    return response.get('result') or None
+
+
+def get_pool_stats(client) -> Optional[Dict[str, Any]]:
+    """Obtener los contadores del pool de un cliente, si los tiene"""
+    adapter = getattr(client, 'pool_adapter', None)
+    if adapter is None:
+        return None
+    return adapter.stats()
+
+
+def get_limiter_stats(client) -> Optional[Dict[str, Any]]:
+    """Obtener los contadores del token bucket y del límite de concurrencia"""
+    bucket = getattr(client, 'rate_limiter', None)
+    limiter = getattr(client, 'concurrency_limiter', None)
+    if bucket is None and limiter is None:
+        return None
+    return {
+        'rate': bucket.stats() if bucket is not None else None,
+        'concurrency': limiter.stats() if limiter is not None else None
+    }
+
+
+def get_guard_stats(client) -> Optional[Dict[str, Any]]:
+    """Obtener el estado de los circuit breakers y el hedging por endpoint"""
+    guards = getattr(client, 'endpoint_guards', None)
+    if not guards:
+        return None
+    return {endpoint: guard.stats() for endpoint, guard in guards.items()}
+
+
+def get_coalescing_stats(client) -> Optional[Dict[str, Any]]:
+    """Obtener los contadores del single-flight de un cliente, si lo tiene"""
+    flight = getattr(client, 'single_flight', None)
+    if flight is None:
+        return None
+    return flight.stats()
@@ -4,20 +4,55 @@ Servicio para interactuar con Google Maps Places API
 import googlemaps
 import os
 import logging
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Iterator, Optional, Tuple
+from .details_cache import DetailsCache, VERSION_KEY, fields_for_groups
+from .geocode_cache import GeocodeCache
+from .google_client import iter_places_nearby_pages, fetch_place_result, pages_for, PAGE_SIZE
+from .nearby_cache import NearbyCache
+from .photo_cache import PhotoCache
+from .upstream_limits import UpstreamThrottled, busy_result
 
 logger = logging.getLogger(__name__)
 
 class GoogleMapsService:
     """Servicio para manejar operaciones con Google Maps API"""
     
-    def __init__(self):
-        """Inicializar el cliente de Google Maps"""
-        api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
-        if not api_key:
-            raise ValueError("GOOGLE_MAPS_API_KEY no encontrada en variables de entorno")
-        
-        self.client = googlemaps.Client(key=api_key)
+    def __init__(
+        self,
+        api_key: str = None,
+        client: googlemaps.Client = None,
+        geocode_cache: GeocodeCache = None,
+        nearby_cache: NearbyCache = None,
+        details_cache: DetailsCache = None,
+        photo_cache: PhotoCache = None,
+        on_places: Callable[[str, List[Dict[str, Any]]], None] = None
+    ):
+        """
+        Inicializar el cliente de Google Maps
+
+        Args:
+            api_key: API key de Google Maps (por defecto, la variable de entorno)
+            client: Cliente ya creado para reutilizar su pool de conexiones
+            geocode_cache: Caché de geocodificación compartida
+            nearby_cache: Caché espacial de búsquedas cercanas
+            details_cache: Caché de detalles por place_id
+            photo_cache: Caché de fotos en disco
+            on_places: Función llamada con (place_type, lugares) por cada página encontrada
+        """
+        self.geocode_cache = geocode_cache or GeocodeCache()
+        self.nearby_cache = nearby_cache or NearbyCache()
+        self.details_cache = details_cache or DetailsCache()
+        self.photo_cache = photo_cache or PhotoCache()
+        self.on_places = on_places
+        if client is not None:
+            self.client = client
+            self.api_key = client.key
+        else:
+            api_key = api_key or os.environ.get('GOOGLE_MAPS_API_KEY')
+            if not api_key:
+                raise ValueError("GOOGLE_MAPS_API_KEY no encontrada en variables de entorno")
+            self.api_key = api_key
+            self.client = googlemaps.Client(key=api_key)
         
         # Tipos de lugares de salud soportados
         self.health_types = {
@@ -30,7 +65,13 @@ class GoogleMapsService:
             'veterinary_care': 'veterinary_care'
         }
     
-    def search_health_places(self, location: str, place_type: str, radius: int) -> Dict[str, Any]:
+    def search_health_places(
+        self,
+        location: str,
+        place_type: str,
+        radius: int,
+        max_results: int = PAGE_SIZE
+    ) -> Dict[str, Any]:
         """
         Buscar lugares de salud cerca de una ubicación
         
@@ -38,99 +79,233 @@ class GoogleMapsService:
             location: Dirección o coordenadas para buscar
             place_type: Tipo de lugar de salud
             radius: Radio de búsqueda en metros
+            max_results: Resultados máximos (hasta 60, siguiendo next_page_token)
             
         Returns:
             Dict con lugares encontrados y información de ubicación
         """
         try:
-            # Geocodificar la ubicación
-            geocode_result = self.client.geocode(location)
+            # Geocodificar la ubicación (con caché)
+            geocode_result = self.geocode(location)
             if not geocode_result:
                 return {'error': 'Ubicación no encontrada'}
                 
-            location_coords = geocode_result[0]['geometry']['location']
+            location_coords = geocode_result['geometry']['location']
             
-            # Buscar lugares cercanos
-            places_result = self.client.places_nearby(
-                location=location_coords,
-                radius=radius,
-                type=place_type
-            )
+            # Buscar lugares cercanos (con caché por celda geohash)
+            places = self.find_nearby_places(location_coords, place_type, radius, max_results)
+            
+            return self.build_search_result(geocode_result, places, place_type, radius)
+            
+        except UpstreamThrottled as e:
+            logger.warning(f"Búsqueda rechazada por falta de cupo: {str(e)}")
+            return busy_result(e)
+        except googlemaps.exceptions.ApiError as e:
+            logger.error(f"Error de Google Maps API: {str(e)}")
+            return {'error': f'Error en la API de Google Maps: {str(e)}'}
+        except Exception as e:
+            logger.error(f"Error en búsqueda: {str(e)}")
+            return {'error': 'Error interno en la búsqueda'}
+    
+    def geocode(self, location: str) -> Optional[Dict[str, Any]]:
+        """
+        Geocodificar una ubicación usando la caché compartida
+        
+        Args:
+            location: Dirección o nombre de lugar
             
-            # Procesar los resultados
-            places = []
-            for place in places_result.get('results', []):
-                processed_place = self._process_place_data(place)
-                places.append(processed_place)
+        Returns:
+            Primer resultado de geocodificación, o None si no se encontró
+        """
+        return self.geocode_cache.get_or_fetch(location, self.client.geocode)
+    
+    def find_nearby_places(
+        self,
+        location_coords: Dict[str, float],
+        place_type: str,
+        radius: int,
+        max_results: int = PAGE_SIZE
+    ) -> List[Dict[str, Any]]:
+        """
+        Buscar lugares cercanos a unas coordenadas ya geocodificadas
+        
+        Args:
+            location_coords: Dict con 'lat' y 'lng'
+            place_type: Tipo de lugar de salud
+            radius: Radio de búsqueda en metros
+            max_results: Resultados máximos
             
-            return {
+        Returns:
+            Lista de lugares procesados
+        """
+        places = []
+        for page in self.iter_nearby_pages(location_coords, place_type, radius, max_results):
+            places.extend(page)
+        return places[:max_results]
+    
+    def iter_nearby_pages(
+        self,
+        location_coords: Dict[str, float],
+        place_type: str,
+        radius: int,
+        max_results: int = PAGE_SIZE
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorrer los lugares cercanos página a página a medida que llegan
+        
+        Yields:
+            Lista de lugares procesados de cada página
+        """
+        for page in self.nearby_cache.iter_pages(
+            location_coords['lat'], location_coords['lng'],
+            radius, place_type, self._fetch_nearby_pages, pages_for(max_results)
+        ):
+            places = [self._process_place_data(place) for place in page]
+            if self.on_places is not None:
+                self.on_places(place_type, places)
+            yield places
+    
+    def iter_search_events(
+        self,
+        location: str,
+        place_type: str,
+        radius: int,
+        max_results: int = PAGE_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Búsqueda en streaming: un evento por cada página de resultados
+        
+        Emite {'event': 'location'}, luego un {'event': 'page'} por página y
+        termina con {'event': 'done'} o {'event': 'error'}.
+        """
+        try:
+            geocode_result = self.geocode(location)
+            if not geocode_result:
+                yield {'event': 'error', 'error': 'Ubicación no encontrada'}
+                return
+            
+            location_coords = geocode_result['geometry']['location']
+            yield {
+                'event': 'location',
                 'location': {
-                    'address': geocode_result[0]['formatted_address'],
+                    'address': geocode_result['formatted_address'],
                     'coords': location_coords
                 },
-                'places': places,
-                'total': len(places),
                 'search_params': {
                     'type': place_type,
-                    'radius': radius
+                    'radius': radius,
+                    'max_results': max_results
                 }
             }
             
+            total = 0
+            page_number = 0
+            for page in self.iter_nearby_pages(location_coords, place_type, radius, max_results):
+                page = page[:max_results - total]
+                total += len(page)
+                page_number += 1
+                yield {'event': 'page', 'page': page_number, 'places': page}
+            
+            yield {'event': 'done', 'pages': page_number, 'total': total}
+            
+        except UpstreamThrottled as e:
+            logger.warning(f"Búsqueda rechazada por falta de cupo: {str(e)}")
+            yield dict(busy_result(e), event='error')
         except googlemaps.exceptions.ApiError as e:
             logger.error(f"Error de Google Maps API: {str(e)}")
-            return {'error': f'Error en la API de Google Maps: {str(e)}'}
+            yield {'event': 'error', 'error': f'Error en la API de Google Maps: {str(e)}'}
         except Exception as e:
             logger.error(f"Error en búsqueda: {str(e)}")
-            return {'error': 'Error interno en la búsqueda'}
+            yield {'event': 'error', 'error': 'Error interno en la búsqueda'}
+    
+    def build_search_result(
+        self,
+        geocode_result: Dict[str, Any],
+        places: List[Dict[str, Any]],
+        place_type: str,
+        radius: int
+    ) -> Dict[str, Any]:
+        """Armar la respuesta estándar de una búsqueda"""
+        return {
+            'location': {
+                'address': geocode_result['formatted_address'],
+                'coords': geocode_result['geometry']['location']
+            },
+            'places': places,
+            'total': len(places),
+            'search_params': {
+                'type': place_type,
+                'radius': radius
+            }
+        }
+    
+    def _fetch_nearby_pages(self, location: Dict[str, float], radius: int, place_type: str, max_pages: int):
+        """Recorrer las páginas crudas de places_nearby"""
+        return iter_places_nearby_pages(self.client, location, radius, place_type, max_pages)
     
-    def get_place_details(self, place_id: str) -> Dict[str, Any]:
+    def get_place_details(
+        self,
+        place_id: str,
+        groups: List[str] = None
+    ) -> Tuple[Dict[str, Any], Optional[str], Optional[str]]:
         """
-        Obtener detalles completos de un lugar específico
+        Obtener detalles de un lugar específico
         
         Args:
             place_id: ID del lugar en Google Places
+            groups: Grupos de campos a incluir (ver details_cache.FIELD_GROUPS);
+                por defecto todos. Pedir menos evita los SKUs caros
+                (reviews, photos) cuando no se necesitan.
             
         Returns:
-            Dict con detalles completos del lugar
+            Tupla (dict con detalles del lugar o con 'error', origen 'cache',
+            'stale' o 'google', versión de la entrada en la caché de
+            detalles). El origen y la versión son None si hubo error; no
+            van en el cuerpo para que el mismo lugar dé el mismo ETag.
         """
         try:
-            # Campos a solicitar
-            fields = [
-                'name', 'formatted_address', 'formatted_phone_number',
-                'opening_hours', 'website', 'rating', 'reviews', 
-                'geometry', 'photos', 'types', 'price_level',
-                'place_id'
-            ]
-            
-            place_detail = self.client.place(place_id=place_id, fields=fields)
+            result, source = self.details_cache.get(
+                place_id, fields_for_groups(groups), self._fetch_place_result
+            )
             
-            if not place_detail.get('result'):
-                return {'error': 'Lugar no encontrado'}
+            if not result:
+                return {'error': 'Lugar no encontrado'}, None, None
             
-            processed_place = self._process_detailed_place_data(place_detail['result'])
-            return processed_place
+            return self._process_detailed_place_data(result), source, result.get(VERSION_KEY)
             
+        except UpstreamThrottled as e:
+            logger.warning(f"Detalles rechazados por falta de cupo: {str(e)}")
+            return busy_result(e), None, None
         except googlemaps.exceptions.ApiError as e:
             logger.error(f"Error obteniendo detalles: {str(e)}")
-            return {'error': f'Error en la API de Google Maps: {str(e)}'}
+            return {'error': f'Error en la API de Google Maps: {str(e)}'}, None, None
         except Exception as e:
             logger.error(f"Error obteniendo detalles: {str(e)}")
-            return {'error': 'Error interno obteniendo detalles'}
+            return {'error': 'Error interno obteniendo detalles'}, None, None
     
-    def get_photo_url(self, photo_reference: str, max_width: int = 400) -> Dict[str, str]:
+    def _fetch_place_result(self, place_id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """Llamar a Place Details con la máscara de campos indicada"""
+        return fetch_place_result(self.client, place_id, fields)
+    
+    def get_photo(self, photo_reference: str, max_width: int = 400) -> Tuple[str, str, str]:
         """
-        Generar URL para una foto de Google Places
+        Obtener una foto de Google Places desde la caché en disco
+        
+        La imagen se descarga una sola vez por ancho redondeado; la API key
+        nunca sale del backend.
         
         Args:
             photo_reference: Referencia de la foto
             max_width: Ancho máximo de la imagen
             
         Returns:
-            Dict con la URL de la foto
+            Tupla (ruta del archivo, etag, mimetype)
         """
-        api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
-        url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={max_width}&photoreference={photo_reference}&key={api_key}"
-        return {'url': url}
+        return self.photo_cache.get_photo(photo_reference, max_width, self._fetch_photo)
+    
+    def _fetch_photo(self, photo_reference: str, max_width: int) -> Iterator[bytes]:
+        """Descargar los bytes de una foto desde Google"""
+        return self.client.places_photo(photo_reference, max_width=max_width)
     
     def _process_place_data(self, place: Dict[str, Any]) -> Dict[str, Any]:
         """Procesar datos básicos de un lugar"""
@@ -1,39 +1,65 @@
 """
 Servicio para interactuar con Google Places API
 """
-import googlemaps
-from typing import List, Dict, Optional
-from ..models.health_place import HealthPlace, DetailedHealthPlace, SearchLocation
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from ..models.health_place import HealthPlace, DetailedHealthPlace, SearchLocation, HEALTH_PLACE_TYPES
 from ..config.config import Config
+from .details_cache import DetailsCache, VERSION_KEY, fields_for_groups
+from .geocode_cache import GeocodeCache
+from .google_client import (
+    iter_places_nearby_pages, fetch_place_result, pages_for, google_client_from_config, PAGE_SIZE
+)
+from .nearby_cache import NearbyCache
+from .photo_cache import PhotoCache
+from .upstream_limits import UpstreamThrottled
+from .place_index import PlaceIndex
+from ..utils.settings import get_setting
 
 class GooglePlacesService:
     """Servicio para manejar las operaciones con Google Places API"""
     
-    def __init__(self, api_key: str = None):
-        self.api_key = api_key or Config.GOOGLE_MAPS_API_KEY
-        self.client = googlemaps.Client(key=self.api_key)
+    def __init__(
+        self,
+        api_key: str = None,
+        geocode_cache: GeocodeCache = None,
+        nearby_cache: NearbyCache = None,
+        place_index: PlaceIndex = None,
+        details_cache: DetailsCache = None,
+        photo_cache: PhotoCache = None,
+        client=None,
+        config=None
+    ):
+        """
+        Args:
+            client: Cliente de Google ya creado (el del registro de servicios)
+            config: Configuración (app.config); por defecto, Config
+        """
+        config = config or Config
+        self.api_key = api_key or get_setting(config, 'GOOGLE_MAPS_API_KEY')
+        self.client = client or google_client_from_config(config, self.api_key)
+        self.geocode_cache = geocode_cache or GeocodeCache.from_config(config)
+        self.nearby_cache = nearby_cache or NearbyCache.from_config(config)
+        self.place_index = place_index or PlaceIndex.from_config(config)
+        self.details_cache = details_cache or DetailsCache.from_config(config)
+        self.photo_cache = photo_cache or PhotoCache.from_config(config)
+        self.details_executor = ThreadPoolExecutor(
+            max_workers=get_setting(config, 'DETAILS_BATCH_WORKERS', 8),
+            thread_name_prefix='place-details'
+        )
         
         # Tipos de lugares de salud disponibles
-        self.health_place_types = {
-            'pharmacy': 'Farmacia',
-            'hospital': 'Hospital', 
-            'clinic': 'Clínica',
-            'doctor': 'Consultorio Médico',
-            'dentist': 'Dentista',
-            'physiotherapist': 'Fisioterapeuta',
-            'veterinary_care': 'Veterinaria'
-        }
+        self.health_place_types = HEALTH_PLACE_TYPES
     
     def geocode_location(self, location: str) -> Optional[SearchLocation]:
         """
-        Geocodificar una ubicación
+        Geocodificar una ubicación (con caché de resultados)
         """
         try:
-            geocode_result = self.client.geocode(location)
-            if not geocode_result:
+            result = self.geocode_cache.get_or_fetch(location, self.client.geocode)
+            if not result:
                 return None
                 
-            result = geocode_result[0]
             coords = result['geometry']['location']
             
             return SearchLocation(
@@ -41,6 +67,8 @@ class GooglePlacesService:
                 lat=coords['lat'],
                 lng=coords['lng']
             )
+        except UpstreamThrottled:
+            raise
         except Exception as e:
             print(f"Error geocodificando ubicación: {e}")
             return None
@@ -49,55 +77,170 @@ class GooglePlacesService:
         self, 
         location: SearchLocation, 
         place_type: str = 'pharmacy', 
-        radius: int = 5000
+        radius: int = 5000,
+        max_results: int = PAGE_SIZE
     ) -> List[HealthPlace]:
         """
-        Buscar lugares de salud cercanos
+        Buscar lugares de salud cercanos (con caché por celda geohash)
+        
+        Con max_results > 20 se siguen las páginas de next_page_token (hasta 60).
         """
         try:
-            places_result = self.client.places_nearby(
-                location={'lat': location.lat, 'lng': location.lng},
-                radius=radius,
-                type=place_type
+            nearby_results = self.nearby_cache.search(
+                location.lat, location.lng, radius, place_type,
+                self._fetch_nearby_pages, pages_for(max_results)
             )
             
             places = []
-            for place_data in places_result.get('results', []):
+            for place_data in nearby_results[:max_results]:
                 place = self._convert_to_health_place(place_data)
                 if place:
                     places.append(place)
             
+            # Alimentar el índice local con lo que devolvió Google
+            self.place_index.add_many(places, place_type)
+            self.place_index.record_coverage(location.lat, location.lng, radius, place_type)
+            
             return places
             
+        except UpstreamThrottled:
+            raise
         except Exception as e:
             print(f"Error buscando lugares: {e}")
             return []
     
-    def get_place_details(self, place_id: str) -> Optional[DetailedHealthPlace]:
+    def search_local_first(
+        self,
+        location: SearchLocation,
+        place_type: str,
+        radius: int,
+        rank: Callable
+    ) -> Optional[Tuple]:
+        """
+        Buscar en el índice local y ordenar ahí mismo sus filas
+
+        Returns:
+            Tupla (lote, filas, distancias, puntuaciones) con las filas del
+            lote del índice, o None si la zona no tiene cobertura reciente o
+            hay pocos resultados (hay que consultar Google)
+        """
+        return self.place_index.search_local_ranked(location.lat, location.lng, radius, place_type, rank)
+    
+    def _fetch_nearby_pages(self, location: Dict, radius: int, place_type: str, max_pages: int):
         """
-        Obtener detalles completos de un lugar
+        Recorrer las páginas crudas de places_nearby
+        """
+        return iter_places_nearby_pages(self.client, location, radius, place_type, max_pages)
+    
+    def get_place_details(self, place_id: str, groups: List[str] = None) -> Optional[DetailedHealthPlace]:
+        """
+        Obtener detalles de un lugar
+        
+        groups limita los campos pedidos (ver details_cache.FIELD_GROUPS);
+        por defecto se piden todos.
         """
         try:
-            place_detail = self.client.place(
-                place_id=place_id,
-                fields=[
-                    'name', 'formatted_address', 'formatted_phone_number',
-                    'opening_hours', 'website', 'rating', 'reviews', 
-                    'geometry', 'photos', 'types', 'price_level'
-                ]
-            )
-            
-            return self._convert_to_detailed_health_place(place_detail['result'])
-            
+            place, _ = self.fetch_place_details(place_id, groups)
+            return place
+        except UpstreamThrottled:
+            raise
         except Exception as e:
             print(f"Error obteniendo detalles: {e}")
             return None
     
-    def get_photo_url(self, photo_reference: str, max_width: int = 400) -> str:
+    def fetch_place_details(
+        self,
+        place_id: str,
+        groups: List[str] = None
+    ) -> Tuple[Optional[DetailedHealthPlace], str]:
+        """
+        Obtener detalles de un lugar desde la caché, pidiendo a Google solo
+        los campos que falten
+        
+        Returns:
+            Tupla (lugar o None si no existe, origen 'cache', 'stale' o 'google').
+            Los errores de la API se propagan.
+        """
+        result, source = self.details_cache.get(
+            place_id, fields_for_groups(groups), self._fetch_place_result
+        )
+        if result is None:
+            return None, source
+        return self._convert_to_detailed_health_place(result), source
+    
+    def _fetch_place_result(self, place_id: str, fields: List[str]) -> Optional[Dict]:
+        """
+        Llamar a Place Details y alimentar el índice local con la respuesta
+        """
+        result = fetch_place_result(self.client, place_id, fields)
+        if result:
+            place = self._convert_to_detailed_health_place(result)
+            if place:
+                self.place_index.add(place)
+        return result
+    
+    def get_places_details_batch(self, place_ids: List[str], groups: List[str] = None) -> Dict[str, Dict]:
+        """
+        Obtener detalles de varios lugares: primero los cacheados y luego los
+        faltantes en paralelo con un pool de hilos acotado
+        
+        Returns:
+            Dict place_id -> {'status': 'ok'|'not_found'|'throttled'|'error', 'source',
+            'place'|'message'|'retry_after'}
+        """
+        fields = fields_for_groups(groups)
+        results = {}
+        misses = []
+        for place_id in place_ids:
+            cached = self.details_cache.lookup(place_id, fields, self._fetch_place_result)
+            if cached is not None:
+                result, source = cached
+                results[place_id] = {
+                    'status': 'ok',
+                    'source': source,
+                    'place': self._convert_to_detailed_health_place(result)
+                }
+            else:
+                misses.append(place_id)
+        
+        futures = {
+            self.details_executor.submit(self.fetch_place_details, place_id, groups): place_id
+            for place_id in misses
+        }
+        for future in as_completed(futures):
+            place_id = futures[future]
+            try:
+                place, source = future.result()
+            except UpstreamThrottled as e:
+                results[place_id] = {'status': 'throttled', 'source': 'google', 'retry_after': e.retry_after}
+                continue
+            except Exception as e:
+                print(f"Error obteniendo detalles de {place_id}: {e}")
+                results[place_id] = {'status': 'error', 'source': 'google', 'message': str(e)}
+                continue
+            
+            if place is None:
+                results[place_id] = {'status': 'not_found', 'source': source, 'message': 'Lugar no encontrado'}
+            else:
+                results[place_id] = {'status': 'ok', 'source': source, 'place': place}
+        
+        return results
+    
+    def get_photo(self, photo_reference: str, max_width: int = 400) -> Tuple[str, str, str]:
+        """
+        Obtener una foto desde la caché en disco (descargándola de Google la
+        primera vez)
+        
+        Returns:
+            Tupla (ruta del archivo, etag, mimetype)
+        """
+        return self.photo_cache.get_photo(photo_reference, max_width, self._fetch_photo)
+    
+    def _fetch_photo(self, photo_reference: str, max_width: int) -> Iterator[bytes]:
         """
-        Obtener URL de una foto
+        Descargar los bytes de una foto desde Google
         """
-        return f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={max_width}&photoreference={photo_reference}&key={self.api_key}"
+        return self.client.places_photo(photo_reference, max_width=max_width)
     
     def _convert_to_health_place(self, place_data: Dict) -> Optional[HealthPlace]:
         """
@@ -155,7 +298,8 @@ class GooglePlacesService:
                     'weekday_text': opening_hours_text
                 },
                 reviews=place_data.get('reviews', [])[:3],  # Solo las primeras 3 reseñas
-                photos=[photo.get('photo_reference', '') for photo in place_data.get('photos', [])][:5]
+                photos=[photo.get('photo_reference', '') for photo in place_data.get('photos', [])][:5],
+                version=place_data.get(VERSION_KEY, '')
             )
         except Exception as e:
             print(f"Error convirtiendo lugar detallado: {e}")
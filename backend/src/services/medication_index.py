@@ -0,0 +1,230 @@
+"""
+Índice invertido de medicamentos en stock por farmacia
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Set
+
+from .fhir_snapshot_store import FHIRSnapshotStore, Snapshot
+from .place_index import PlaceIndex
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text: str) -> str:
+    """'Amoxicilina 500mg' -> 'amoxicilina 500mg' (sin tildes, minúsculas, solo letras y números)"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', stripped.lower()).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras normalizadas de un texto"""
+    return normalize(text).split()
+
+
+def medication_terms(medication: Dict[str, Any]) -> Set[str]:
+    """Términos con los que se encuentra un Medication: palabras del nombre y códigos"""
+    code = medication.get('code') or {}
+    terms = set(tokenize(code.get('text', '')))
+    for coding in code.get('coding', []):
+        if coding.get('code'):
+            terms.add(normalize(coding['code']).replace(' ', ''))
+    return terms
+
+
+def in_stock(medication: Dict[str, Any]) -> bool:
+    """Un medicamento está disponible si está activo y tiene unidades"""
+    return medication.get('status', 'active') == 'active' and (medication.get('amount') or {}).get('value', 0) > 0
+
+
+class MedicationIndex:
+    """
+    Farmacias con un medicamento en stock cerca de una coordenada.
+
+    Guarda un índice invertido término -> {place_id: {medication_id}} sobre
+    los nombres y códigos normalizados (sin tildes ni mayúsculas) y una lista
+    ordenada de términos, así que "amoxi" encuentra "Amoxicilina" con una
+    búsqueda binaria. El stock llega de los snapshots FHIR: el índice se
+    registra como oyente del almacén y actualiza solo la farmacia que cambió
+    cada vez que un snapshot se genera, se refresca o se descarta. Las
+    farmacias, con sus coordenadas, salen del índice de lugares: lo
+    comparten todos los workers a través de su archivo y sobrevive a los
+    reinicios, así que no dependen de qué búsquedas pasaron por este worker.
+    """
+
+    def __init__(self, place_index: PlaceIndex, fhir_store: Optional[FHIRSnapshotStore] = None):
+        """
+        Args:
+            place_index: Índice de lugares del que salen las farmacias cercanas
+            fhir_store: Snapshots de stock; el índice se suscribe a sus cambios
+        """
+        self.place_index = place_index
+        self.fhir_store = fhir_store
+        self._lock = threading.RLock()
+        # place_id -> {medication_id: medicamento}
+        self._stock: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # término -> {place_id: {medication_id}}
+        self._postings: Dict[str, Dict[str, Set[str]]] = {}
+        # Términos de _postings ordenados, para buscar por prefijo
+        self._terms: List[str] = []
+        self.updates = 0
+        self.searches = 0
+        self.last_search_ms = None
+        if fhir_store is not None:
+            fhir_store.add_listener(self._on_snapshot)
+
+    def update_stock(self, place_id: str, stock: Optional[Dict[str, Any]]):
+        """
+        Reemplazar el stock indexado de una farmacia
+
+        Args:
+            place_id: ID del lugar de Google
+            stock: Recurso de stock FHIR (None si el backend no tiene datos del lugar)
+        """
+        medications = {}
+        for medication in (stock or {}).get('medications', []):
+            if in_stock(medication):
+                medications[medication.get('id') or medication.get('code', {}).get('text', '')] = medication
+
+        with self._lock:
+            self._remove_stock(place_id)
+            self._stock[place_id] = medications
+            for medication_id, medication in medications.items():
+                for term in medication_terms(medication):
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = {}
+                        bisect.insort(self._terms, term)
+                    postings.setdefault(place_id, set()).add(medication_id)
+            self.updates += 1
+
+    def remove(self, place_id: str):
+        """Quitar el stock indexado de una farmacia (se volverá a pedir al buscar)"""
+        with self._lock:
+            self._remove_stock(place_id)
+
+    def _remove_stock(self, place_id: str):
+        medications = self._stock.pop(place_id, None)
+        if not medications:
+            return
+        for medication in medications.values():
+            for term in medication_terms(medication):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(place_id, None)
+                if not postings:
+                    del self._postings[term]
+                    position = bisect.bisect_left(self._terms, term)
+                    if position < len(self._terms) and self._terms[position] == term:
+                        del self._terms[position]
+
+    def _on_snapshot(self, kind: str, place_id: str, snapshot: Optional[Snapshot]):
+        if kind != 'stock':
+            return
+        if snapshot is None:
+            self.remove(place_id)
+        else:
+            self.update_stock(place_id, snapshot.data)
+
+    def _prefix_matches(self, prefix: str) -> Dict[str, Set[str]]:
+        """place_id -> medicamentos con algún término que empieza por `prefix`"""
+        matches: Dict[str, Set[str]] = {}
+        position = bisect.bisect_left(self._terms, prefix)
+        while position < len(self._terms) and self._terms[position].startswith(prefix):
+            for place_id, medication_ids in self._postings[self._terms[position]].items():
+                matches.setdefault(place_id, set()).update(medication_ids)
+            position += 1
+        return matches
+
+    def search(self, query: str, lat: float, lng: float, radius: float, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Farmacias cercanas con el medicamento en stock, de la más cercana a la más lejana
+
+        Cada palabra de `query` se busca como prefijo y todas deben aparecer
+        en el mismo medicamento. Las farmacias del radio cuyo stock aún no
+        está indexado se piden al almacén de snapshots en una sola consulta
+        por lotes antes de responder, estén ya en caché o no.
+
+        Returns:
+            Lista de {'place_id', 'name', 'address', 'location', 'distance_m',
+            'medications': [{'id', 'name', 'quantity'}], 'total_quantity'}
+        """
+        start = time.perf_counter()
+        words = tokenize(query)
+        if not words:
+            return []
+
+        nearby = self.place_index.nearby(lat, lng, radius, 'pharmacy')
+        with self._lock:
+            unknown = [place_id for place_id in nearby if place_id not in self._stock]
+        if unknown and self.fhir_store is not None:
+            # El oyente solo ve los snapshots recién generados; los que ya
+            # estaban en el almacén (de otro endpoint) se indexan aquí
+            for place_id, snapshot in self.fhir_store.get_many('stock', unknown).items():
+                with self._lock:
+                    indexed = place_id in self._stock
+                if not indexed:
+                    self.update_stock(place_id, snapshot.data)
+
+        results = []
+        with self._lock:
+            matches = None
+            for word in words:
+                word_matches = self._prefix_matches(word)
+                if matches is None:
+                    matches = word_matches
+                else:
+                    matches = {
+                        place_id: medication_ids & word_matches[place_id]
+                        for place_id, medication_ids in matches.items()
+                        if place_id in word_matches and medication_ids & word_matches[place_id]
+                    }
+
+            for place_id, medication_ids in matches.items():
+                if place_id not in nearby:
+                    continue
+                place = self.place_index.get(place_id)
+                if place is None:
+                    continue
+                stock = self._stock.get(place_id, {})
+                medications = [
+                    {
+                        'id': medication_id,
+                        'name': stock[medication_id].get('code', {}).get('text', ''),
+                        'quantity': stock[medication_id].get('amount', {}).get('value', 0)
+                    }
+                    for medication_id in sorted(medication_ids) if medication_id in stock
+                ]
+                if not medications:
+                    continue
+                results.append({
+                    'place_id': place_id,
+                    'name': place.name,
+                    'address': place.address,
+                    'location': {'lat': place.lat, 'lng': place.lng},
+                    'distance_m': round(nearby[place_id]),
+                    'medications': medications,
+                    'total_quantity': sum(medication['quantity'] for medication in medications)
+                })
+
+        # Más cerca primero; a igual distancia, más unidades
+        results.sort(key=lambda result: (result['distance_m'], -result['total_quantity']))
+        self.searches += 1
+        self.last_search_ms = round((time.perf_counter() - start) * 1000, 2)
+        return results[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño del índice y duración de la última búsqueda"""
+        with self._lock:
+            return {
+                'pharmacies_with_stock': len(self._stock),
+                'terms': len(self._terms),
+                'updates': self.updates,
+                'searches': self.searches,
+                'last_search_ms': self.last_search_ms
+            }
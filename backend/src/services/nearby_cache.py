@@ -0,0 +1,221 @@
+"""
+Caché espacial de resultados de places_nearby (por celda geohash y radio)
+"""
+import threading
+from typing import Any, Callable, Dict, Iterator, List
+
+from ..utils.cache import TTLCache, MISSING, create_cache
+from ..utils.geo import haversine_m, geohash_encode, geohash_center, geohash_half_diagonal_m
+from ..utils.settings import get_setting
+from .upstream_limits import UpstreamThrottled
+
+# Radios (metros) a los que se redondea cada búsqueda
+RADIUS_BUCKETS = (500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+# Radio máximo que acepta la API de Places
+MAX_UPSTREAM_RADIUS = 50000
+
+# Resultados por página de places_nearby y páginas que entrega como máximo
+PAGE_SIZE = 20
+MAX_UPSTREAM_PAGES = 3
+
+
+def radius_bucket(radius: int) -> int:
+    """Menor radio de la tabla que cubre el radio pedido"""
+    for bucket in RADIUS_BUCKETS:
+        if radius <= bucket:
+            return bucket
+    return RADIUS_BUCKETS[-1]
+
+
+def geohash_precision(bucket: int) -> int:
+    """Precisión geohash cuya celda es pequeña frente al radio"""
+    if bucket <= 2000:
+        return 7  # ~150 m
+    if bucket <= 10000:
+        return 6  # ~1,2 km x 0,6 km
+    return 5  # ~4,9 km
+
+
+def _place_coords(place: Dict[str, Any]):
+    location = place.get('geometry', {}).get('location', {})
+    return location.get('lat'), location.get('lng')
+
+
+class NearbyCache:
+    """
+    Caché de búsquedas cercanas con clave (tipo, celda geohash, radio redondeado).
+
+    En un fallo se consulta la API desde el centro de la celda con el radio
+    redondeado más la media diagonal de la celda, de modo que cualquier
+    círculo pedido dentro de esa celda queda contenido en el círculo
+    cacheado. Los aciertos se resuelven filtrando por distancia haversine
+    los resultados crudos guardados, sin llamar a Google.
+
+    Como el círculo consultado es mayor que el pedido, el filtro descarta
+    parte de cada página: se siguen pidiendo páginas (hasta las 3 que da
+    Google) mientras no se junten los max_pages * 20 resultados dentro del
+    radio pedido.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 2000, backend=None):
+        """
+        Args:
+            ttl: Segundos que se reutiliza una búsqueda
+            max_entries: Número máximo de celdas en memoria
+            backend: Almacenamiento (ver utils.cache.create_cache); por defecto en memoria
+        """
+        self.ttl = ttl
+        if backend is None:
+            backend = TTLCache(max_entries=max_entries, default_ttl=ttl)
+        self._cache = backend
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.bypassed = 0
+        self.throttled_served = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'NearbyCache':
+        """Crear la caché a partir de un objeto o dict de configuración"""
+        ttl = get_setting(config, 'NEARBY_CACHE_TTL', 600)
+        max_entries = get_setting(config, 'NEARBY_CACHE_MAX_ENTRIES', 2000)
+        return cls(
+            ttl=ttl,
+            max_entries=max_entries,
+            backend=create_cache(config, 'nearby', max_entries, ttl)
+        )
+
+    def search(
+        self,
+        lat: float,
+        lng: float,
+        radius: int,
+        place_type: str,
+        fetch_pages: Callable[..., Iterator[List[Dict[str, Any]]]],
+        max_pages: int = 1
+    ) -> List[Dict[str, Any]]:
+        """
+        Buscar lugares cercanos reutilizando resultados de la misma celda
+
+        Returns:
+            Resultados crudos de Google dentro del radio pedido (todas las páginas)
+        """
+        results = []
+        for page in self.iter_pages(lat, lng, radius, place_type, fetch_pages, max_pages):
+            results.extend(page)
+        return results
+
+    def iter_pages(
+        self,
+        lat: float,
+        lng: float,
+        radius: int,
+        place_type: str,
+        fetch_pages: Callable[..., Iterator[List[Dict[str, Any]]]],
+        max_pages: int = 1
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorrer página a página una búsqueda cercana, usando la caché si cubre
+        las páginas pedidas
+
+        Args:
+            lat, lng: Punto de búsqueda (ya geocodificado)
+            radius: Radio pedido en metros
+            place_type: Tipo de lugar de Google Places
+            fetch_pages: Generador fetch_pages(location, radius, place_type, max_pages)
+                que devuelve los `results` crudos de cada página de places_nearby
+            max_pages: Páginas pedidas; se entregan hasta max_pages * 20
+                resultados dentro del radio
+
+        Yields:
+            Resultados crudos de cada página dentro del radio pedido
+        """
+        bucket = radius_bucket(radius)
+        cell = geohash_encode(lat, lng, geohash_precision(bucket))
+        upstream_radius = bucket + geohash_half_diagonal_m(cell)
+
+        if upstream_radius > MAX_UPSTREAM_RADIUS:
+            # El círculo de la celda no cabe en una sola llamada: no se cachea
+            with self._lock:
+                self.bypassed += 1
+            for page in fetch_pages({'lat': lat, 'lng': lng}, radius, place_type, max_pages):
+                with self._lock:
+                    self.upstream_calls += 1
+                yield page
+            return
+
+        key = (place_type, cell, bucket)
+        wanted = max_pages * PAGE_SIZE
+        entry = self._cache.get(key)
+        if entry is not MISSING:
+            cached = [self._filter_by_distance(page, lat, lng, radius) for page in entry['pages']]
+            if entry['complete'] or sum(map(len, cached)) >= wanted:
+                yield from self._take(cached, wanted)
+                return
+
+        center_lat, center_lng = geohash_center(cell)
+        pages = []
+        found = 0
+        complete = True
+        try:
+            for page in fetch_pages(
+                {'lat': center_lat, 'lng': center_lng},
+                int(upstream_radius) + 1,
+                place_type,
+                MAX_UPSTREAM_PAGES
+            ):
+                with self._lock:
+                    self.upstream_calls += 1
+                pages.append(page)
+                filtered = self._filter_by_distance(page, lat, lng, radius)
+                yield filtered[:wanted - found]
+                found += len(filtered)
+                if found >= wanted:
+                    # Puede haber más páginas, pero no hacen falta
+                    complete = len(pages) >= MAX_UPSTREAM_PAGES
+                    break
+        except UpstreamThrottled:
+            # Sin cupo para Google: quedarse con las páginas ya entregadas o
+            # con las que hubiera en caché (menos de las pedidas)
+            if not pages and entry is MISSING:
+                raise
+            with self._lock:
+                self.throttled_served += 1
+            if not pages:
+                yield from self._take(cached, wanted)
+            return
+
+        # Si el generador terminó antes, Google no tiene más resultados
+        self._cache.set(key, {'pages': pages, 'complete': complete})
+
+    @staticmethod
+    def _take(pages, wanted):
+        # Páginas filtradas hasta juntar `wanted` resultados
+        for page in pages:
+            if wanted <= 0:
+                return
+            yield page[:wanted]
+            wanted -= len(page)
+
+    @staticmethod
+    def _filter_by_distance(results, lat, lng, radius):
+        filtered = []
+        for place in results:
+            place_lat, place_lng = _place_coords(place)
+            if place_lat is None or place_lng is None:
+                continue
+            if haversine_m(lat, lng, place_lat, place_lng) <= radius:
+                filtered.append(place)
+        return filtered
+
+    def clear(self):
+        """Vaciar la caché"""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos, fallos y llamadas a Google"""
+        stats = self._cache.stats()
+        stats['upstream_calls'] = self.upstream_calls
+        stats['bypassed'] = self.bypassed
+        stats['throttled_served'] = self.throttled_served
+        return stats
@@ -0,0 +1,249 @@
+"""
+Caché en disco de fotos de Google Places (direccionada por contenido)
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from typing import Callable, Iterable, Optional, Tuple
+
+from ..utils.settings import get_setting
+
+
+def _pil_image():
+    """Módulo PIL.Image, importado al primer redimensionado (None sin Pillow)"""
+    try:
+        from PIL import Image
+    except ImportError:  # Está en requirements.txt; sin él se pide cada ancho a Google
+        return None
+    return Image
+
+logger = logging.getLogger(__name__)
+
+# Anchos a los que se redondea cada petición de foto
+WIDTH_BUCKETS = (100, 200, 400, 800, 1600)
+
+# Ancho que se descarga de Google; los menores se derivan de él con Pillow
+SOURCE_WIDTH = WIDTH_BUCKETS[-1]
+
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG', 'image/png'),
+    (b'GIF8', 'image/gif'),
+    (b'RIFF', 'image/webp'),
+)
+
+
+def width_bucket(width: int) -> int:
+    """Menor ancho de la tabla que cubre el ancho pedido"""
+    for bucket in WIDTH_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+
+def sniff_mimetype(data: bytes) -> Optional[str]:
+    """Detectar el tipo de imagen por sus primeros bytes (None si no es imagen)"""
+    for signature, mimetype in _SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    return None
+
+
+class InvalidPhotoError(Exception):
+    """La respuesta de Google no es una imagen (referencia inválida o vencida)"""
+
+
+class PhotoCache:
+    """
+    Caché de fotos en disco.
+
+    Las imágenes se guardan una sola vez por contenido en
+    `blobs/<sha256[:2]>/<sha256>`; cada par (referencia, ancho) apunta a su
+    blob desde `refs/`. El hash del contenido sirve como ETag. El uso total
+    de disco se acota borrando los blobs usados hace más tiempo (mtime).
+
+    Con Pillow cada foto se descarga una sola vez, al ancho mayor, y los
+    demás anchos se generan a partir de esa copia.
+    """
+
+    def __init__(self, directory: str = 'instance/photos', max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            directory: Carpeta de la caché
+            max_bytes: Tamaño máximo total de las imágenes guardadas
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._blobs_dir = os.path.join(directory, 'blobs')
+        self._refs_dir = os.path.join(directory, 'refs')
+        os.makedirs(self._blobs_dir, exist_ok=True)
+        os.makedirs(self._refs_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._total_bytes = self._scan_size()
+        self.hits = 0
+        self.misses = 0
+        self.resized = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'PhotoCache':
+        """Crear la caché a partir de un objeto o dict de configuración"""
+        return cls(
+            directory=get_setting(config, 'PHOTO_CACHE_DIR', 'instance/photos'),
+            max_bytes=get_setting(config, 'PHOTO_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        )
+
+    def get_photo(
+        self,
+        photo_reference: str,
+        width: int,
+        fetch: Callable[[str, int], Iterable[bytes]]
+    ) -> Tuple[str, str, str]:
+        """
+        Obtener una foto desde el disco, descargándola o redimensionándola
+        solo la primera vez
+
+        Args:
+            photo_reference: Referencia de la foto en Google Places
+            width: Ancho pedido (se redondea a WIDTH_BUCKETS)
+            fetch: fetch(photo_reference, max_width) -> bloques de bytes de la imagen
+
+        Returns:
+            Tupla (ruta del archivo, etag, mimetype)
+
+        Raises:
+            InvalidPhotoError: Si Google no devolvió una imagen
+        """
+        bucket = width_bucket(width)
+        cached = self._lookup(photo_reference, bucket)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        Image = _pil_image()
+        if Image is None or bucket == SOURCE_WIDTH:
+            return self._store(photo_reference, bucket, b''.join(fetch(photo_reference, bucket)))
+
+        source = self._lookup(photo_reference, SOURCE_WIDTH)
+        if source is None:
+            source = self._store(
+                photo_reference, SOURCE_WIDTH, b''.join(fetch(photo_reference, SOURCE_WIDTH))
+            )
+        data = self._resize(Image, source[0], bucket)
+        if data is None:
+            data = b''.join(fetch(photo_reference, bucket))
+
+        return self._store(photo_reference, bucket, data)
+
+    def _ref_path(self, photo_reference: str, bucket: int) -> str:
+        key = hashlib.sha256(f"{photo_reference}|{bucket}".encode('utf-8')).hexdigest()
+        return os.path.join(self._refs_dir, key[:2], key)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blobs_dir, digest[:2], digest)
+
+    def _lookup(self, photo_reference: str, bucket: int) -> Optional[Tuple[str, str, str]]:
+        try:
+            with open(self._ref_path(photo_reference, bucket), 'r', encoding='ascii') as file:
+                digest, mimetype = file.read().split()
+        except (OSError, ValueError):
+            return None
+
+        blob_path = self._blob_path(digest)
+        try:
+            os.utime(blob_path)  # marca de uso para el desalojo LRU
+        except OSError:
+            return None
+        return blob_path, digest, mimetype
+
+    def _resize(self, Image, path: str, bucket: int) -> Optional[bytes]:
+        """Imagen de `path` reducida al ancho `bucket` (None si Pillow no puede leerla)"""
+        try:
+            with Image.open(path) as image:
+                if image.width <= bucket:
+                    # La original ya es más angosta: mismo contenido, mismo blob
+                    with open(path, 'rb') as file:
+                        return file.read()
+                height = round(image.height * bucket / image.width)
+                resized = image.resize((bucket, height), Image.LANCZOS)
+                output = io.BytesIO()
+                resized.save(output, format=image.format or 'JPEG', quality=85)
+                self.resized += 1
+                return output.getvalue()
+        except OSError as e:
+            logger.warning(f"No se pudo redimensionar la foto: {e}")
+            return None
+
+    def _store(self, photo_reference: str, bucket: int, data: bytes) -> Tuple[str, str, str]:
+        mimetype = sniff_mimetype(data)
+        if mimetype is None:
+            raise InvalidPhotoError('La respuesta de Google no es una imagen')
+
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+
+        if not os.path.exists(blob_path):
+            self._write_atomic(blob_path, data)
+            with self._lock:
+                self._total_bytes += len(data)
+
+        self._write_atomic(self._ref_path(photo_reference, bucket), f"{digest} {mimetype}".encode('ascii'))
+
+        if self._total_bytes > self.max_bytes:
+            self.cleanup()
+        return blob_path, digest, mimetype
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def _scan_blobs(self):
+        for root, _, files in os.walk(self._blobs_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._scan_blobs())
+
+    def cleanup(self):
+        """Borrar los blobs menos usados hasta quedar bajo el 90% del límite"""
+        with self._lock:
+            blobs = sorted(self._scan_blobs(), key=lambda blob: blob[2])
+            total = sum(size for _, size, _ in blobs)
+            target = self.max_bytes * 0.9
+            for path, size, _ in blobs:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evicted += 1
+            self._total_bytes = total
+
+    def stats(self):
+        """Uso de disco y contadores de la caché"""
+        return {
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'resized': self.resized,
+            'evicted': self.evicted
+        }
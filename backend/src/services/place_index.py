@@ -0,0 +1,476 @@
+"""
+Índice espacial local de lugares de salud conocidos
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import fields
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from ..models.health_place import HealthPlace
+from ..models.place_batch import PlaceBatch, column
+from ..utils.geo import haversine_m, haversine_many
+from ..utils.lazy_import import lazy_import
+from ..utils.settings import get_setting
+
+np = lazy_import('numpy')
+
+try:
+    import fcntl
+except ImportError:  # Windows: los guardados de los workers no se coordinan
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = 111320.0
+
+# Filas reemplazadas (lugares actualizados) a partir de las cuales se
+# reconstruye el lote, si además superan a las filas vigentes
+_MIN_DEAD_ROWS = 1024
+
+_HEALTH_PLACE_FIELDS = {field.name for field in fields(HealthPlace)}
+
+
+class PlaceIndex:
+    """
+    Índice espacial en memoria de lugares de salud, particionado por tipo.
+
+    Los lugares viven en un único PlaceBatch (columnas, sin un objeto por
+    lugar) y la rejilla de celdas de `cell_size` grados (~1,1 km con el
+    valor por defecto) guarda números de fila. Una búsqueda por radio solo
+    junta las filas de las celdas que tocan el rectángulo envolvente del
+    círculo y calcula sus distancias con NumPy, por lo que el coste
+    depende de la densidad local y no del tamaño total del índice. Un
+    lugar que cambia se agrega como fila nueva; las filas reemplazadas se
+    descartan al reconstruir el lote cuando son muchas.
+
+    Además registra qué círculos se consultaron a Google y cuándo, para
+    decidir si una zona tiene cobertura reciente. Cada círculo se anota en
+    las celdas de la misma rejilla que toca, así que comprobar la cobertura
+    solo revisa los círculos de la celda del centro buscado.
+
+    Todos los workers guardan en el mismo archivo: cada guardado primero
+    incorpora lo que otros workers escribieron (ver save()).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        cell_size: float = 0.01,
+        coverage_ttl: float = 86400,
+        min_results: int = 5,
+        save_interval: float = 60,
+        max_coverage_entries: int = 20000
+    ):
+        """
+        Args:
+            path: Archivo JSON donde se persiste el índice (None = solo memoria)
+            cell_size: Tamaño de celda de la rejilla en grados
+            coverage_ttl: Segundos que una zona consultada se considera vigente
+            min_results: Resultados locales mínimos para no consultar Google
+            save_interval: Segundos entre guardados automáticos a disco
+            max_coverage_entries: Círculos de cobertura máximos por tipo
+        """
+        self.path = path
+        self.cell_size = cell_size
+        self.coverage_ttl = coverage_ttl
+        self.min_results = min_results
+        self.save_interval = save_interval
+        self.max_coverage_entries = max_coverage_entries
+
+        self._lock = threading.RLock()
+        self._batch = PlaceBatch()
+        self._rows: Dict[str, int] = {}
+        self._dead_rows = 0
+        self._place_types: Dict[str, set] = {}
+        self._grid: Dict[str, Dict[Tuple[int, int], set]] = {}
+        # Círculos (lat, lng, radio, momento) por tipo, del más viejo al más
+        # nuevo, y los mismos círculos por celda de la rejilla
+        self._coverage: Dict[str, Deque[Tuple[float, float, float, float]]] = {}
+        self._coverage_grid: Dict[str, Dict[Tuple[int, int], list]] = {}
+        self._dirty = False
+        self._saver = None
+        self._saver_pid = None
+
+        self.local_hits = 0
+        self.local_misses = 0
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @classmethod
+    def from_config(cls, config) -> 'PlaceIndex':
+        """Crear el índice a partir de un objeto o dict de configuración"""
+        return cls(
+            path=get_setting(config, 'PLACE_INDEX_PATH') or None,
+            coverage_ttl=get_setting(config, 'PLACE_INDEX_COVERAGE_TTL', 86400),
+            min_results=get_setting(config, 'PLACE_INDEX_MIN_RESULTS', 5),
+            save_interval=get_setting(config, 'PLACE_INDEX_SAVE_INTERVAL', 60)
+        )
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lng / self.cell_size))
+
+    def add(self, place: HealthPlace, place_types: Iterable[str] = ()):
+        """
+        Agregar o actualizar un lugar en el índice
+
+        Args:
+            place: Lugar a indexar (se guardan solo sus campos básicos)
+            place_types: Tipos bajo los que indexarlo, además de place.types
+        """
+        self.add_many((place,), None, place_types)
+
+    def add_many(
+        self,
+        places: Iterable[HealthPlace],
+        place_type: Optional[str] = None,
+        place_types: Iterable[str] = ()
+    ):
+        """Agregar varios lugares, opcionalmente bajo un tipo adicional"""
+        extra_types = set(place_types)
+        if place_type:
+            extra_types.add(place_type)
+        with self._lock:
+            for place in places:
+                self._add(place, extra_types)
+            self._commit()
+        self._ensure_saver()
+
+    def _add(self, place: HealthPlace, place_types: Iterable[str] = ()):
+        # Se llama con el candado tomado; las filas nuevas se cierran en _commit()
+        if not place.place_id or (not place.lat and not place.lng):
+            return
+
+        basic = HealthPlace(
+            place_id=place.place_id,
+            name=place.name,
+            address=place.address,
+            lat=place.lat,
+            lng=place.lng,
+            rating=place.rating or 0.0,
+            user_ratings_total=place.user_ratings_total or 0,
+            price_level=place.price_level or 0,
+            types=place.types,
+            open_now=place.open_now,
+            photo_reference=place.photo_reference or ''
+        )
+        types = set(place_types) | set(basic.types)
+        batch = self._batch
+
+        row = self._rows.get(basic.place_id)
+        if row is not None:
+            previous_types = self._place_types[basic.place_id]
+            types |= previous_types
+            if batch.place(row) == basic:
+                # Mismos datos (lo habitual al repetir una búsqueda): solo tipos nuevos
+                cell = self._cell(basic.lat, basic.lng)
+                for place_type in types - previous_types:
+                    self._grid.setdefault(place_type, {}).setdefault(cell, set()).add(row)
+                self._place_types[basic.place_id] = types
+                self._dirty = self._dirty or types != previous_types
+                return
+            old_cell = self._cell(batch.lat[row], batch.lng[row])
+            for place_type in previous_types:
+                self._grid.get(place_type, {}).get(old_cell, set()).discard(row)
+            self._dead_rows += 1
+
+        row = batch.append(
+            basic.place_id, basic.name, basic.address, basic.lat, basic.lng, basic.rating,
+            basic.user_ratings_total, basic.price_level, basic.types, basic.open_now,
+            basic.photo_reference
+        )
+        self._rows[basic.place_id] = row
+        self._place_types[basic.place_id] = types
+        cell = self._cell(basic.lat, basic.lng)
+        for place_type in types:
+            self._grid.setdefault(place_type, {}).setdefault(cell, set()).add(row)
+        self._dirty = True
+
+    def _commit(self):
+        """Cerrar las filas agregadas y reconstruir el lote si hay muchas reemplazadas"""
+        self._batch.compact()
+        if self._dead_rows < max(_MIN_DEAD_ROWS, len(self._rows)):
+            return
+        # Quien ya tenía filas del lote anterior puede seguir leyéndolas
+        live_rows = sorted(self._rows.values())
+        new_rows = {row: position for position, row in enumerate(live_rows)}
+        self._batch = self._batch.take(live_rows)
+        self._rows = {place_id: new_rows[row] for place_id, row in self._rows.items()}
+        for grid in self._grid.values():
+            for cell, rows in grid.items():
+                grid[cell] = {new_rows[row] for row in rows}
+        self._dead_rows = 0
+
+    def _query_rows(self, lat: float, lng: float, radius: float, place_type: str):
+        """
+        Filas de un tipo dentro de un radio, ordenadas por distancia, y sus distancias
+
+        Se llama con el candado tomado (las vistas NumPy del lote impiden
+        agregarle filas mientras existen).
+        """
+        lat_delta = radius / METERS_PER_DEGREE
+        lng_delta = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        min_cell = self._cell(lat - lat_delta, lng - lng_delta)
+        max_cell = self._cell(lat + lat_delta, lng + lng_delta)
+
+        candidates = []
+        grid = self._grid.get(place_type) or {}
+        for cell_lat in range(min_cell[0], max_cell[0] + 1):
+            for cell_lng in range(min_cell[1], max_cell[1] + 1):
+                rows = grid.get((cell_lat, cell_lng))
+                if rows:
+                    candidates.extend(rows)
+
+        rows = np.array(candidates, dtype=np.intp)
+        distances = haversine_many(lat, lng, column(self._batch.lat)[rows], column(self._batch.lng)[rows])
+        inside = np.flatnonzero(distances <= radius)
+        order = inside[np.argsort(distances[inside], kind='stable')]
+        return rows[order], distances[order]
+
+    def query(self, lat: float, lng: float, radius: float, place_type: str) -> List[HealthPlace]:
+        """
+        Lugares de un tipo dentro de un radio, ordenados por distancia
+        """
+        with self._lock:
+            batch = self._batch
+            rows, _ = self._query_rows(lat, lng, radius, place_type)
+        return batch.to_places(rows.tolist())
+
+    def nearby(self, lat: float, lng: float, radius: float, place_type: str) -> Dict[str, float]:
+        """
+        place_id -> distancia de los lugares de un tipo dentro de un radio,
+        del más cercano al más lejano (sin crear un HealthPlace por lugar)
+        """
+        with self._lock:
+            batch = self._batch
+            rows, distances = self._query_rows(lat, lng, radius, place_type)
+            return {
+                batch.place_id(row): distance
+                for row, distance in zip(rows.tolist(), distances.tolist())
+            }
+
+    def get(self, place_id: str) -> Optional[HealthPlace]:
+        """Lugar indexado con ese ID (None si no está)"""
+        with self._lock:
+            row = self._rows.get(place_id)
+            return self._batch.place(row) if row is not None else None
+
+    def record_coverage(self, lat: float, lng: float, radius: float, place_type: str):
+        """Registrar que un círculo se acaba de consultar en Google"""
+        with self._lock:
+            self._add_coverage(place_type, (lat, lng, radius, time.time()))
+            self._dirty = True
+
+    def _coverage_cells(self, circle: Tuple[float, float, float, float]) -> Iterable[Tuple[int, int]]:
+        """Celdas de la rejilla que toca el rectángulo envolvente del círculo"""
+        lat, lng, radius, _ = circle
+        lat_delta = radius / METERS_PER_DEGREE
+        lng_delta = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        min_cell = self._cell(lat - lat_delta, lng - lng_delta)
+        max_cell = self._cell(lat + lat_delta, lng + lng_delta)
+        for cell_lat in range(min_cell[0], max_cell[0] + 1):
+            for cell_lng in range(min_cell[1], max_cell[1] + 1):
+                yield cell_lat, cell_lng
+
+    def _add_coverage(self, place_type: str, circle: Tuple[float, float, float, float]):
+        circles = self._coverage.setdefault(place_type, deque())
+        grid = self._coverage_grid.setdefault(place_type, {})
+        circles.append(circle)
+        for cell in self._coverage_cells(circle):
+            grid.setdefault(cell, []).append(circle)
+
+        # Se descartan los círculos vencidos y los que pasan del máximo (los más viejos)
+        cutoff = time.time() - self.coverage_ttl
+        while circles and (circles[0][3] < cutoff or len(circles) > self.max_coverage_entries):
+            expired = circles.popleft()
+            for cell in self._coverage_cells(expired):
+                cell_circles = grid.get(cell)
+                if cell_circles is None:
+                    continue
+                cell_circles.remove(expired)
+                if not cell_circles:
+                    del grid[cell]
+
+    def covers(self, lat: float, lng: float, radius: float, place_type: str) -> bool:
+        """Indicar si el círculo pedido está dentro de una consulta reciente a Google"""
+        cutoff = time.time() - self.coverage_ttl
+        with self._lock:
+            # Un círculo que cubre la búsqueda contiene su centro, así que está en su celda
+            circles = self._coverage_grid.get(place_type, {}).get(self._cell(lat, lng), ())
+            for cov_lat, cov_lng, cov_radius, timestamp in reversed(circles):
+                if timestamp < cutoff:
+                    continue
+                if haversine_m(lat, lng, cov_lat, cov_lng) + radius <= cov_radius:
+                    return True
+        return False
+
+    def search_local(self, lat: float, lng: float, radius: float, place_type: str) -> Optional[List[HealthPlace]]:
+        """
+        Responder una búsqueda solo con el índice
+
+        Returns:
+            Lugares encontrados, o None si la zona no tiene cobertura
+            reciente o hay menos de `min_results` lugares.
+        """
+        if self.covers(lat, lng, radius, place_type):
+            places = self.query(lat, lng, radius, place_type)
+            if len(places) >= self.min_results:
+                self.local_hits += 1
+                return places
+        self.local_misses += 1
+        return None
+
+    def search_local_ranked(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        place_type: str,
+        rank: Callable[[PlaceBatch, Any, Any], Tuple]
+    ) -> Optional[Tuple]:
+        """
+        Responder una búsqueda solo con el índice, filtrando y ordenando
+        las filas de su propio lote (sin copiar los candidatos)
+
+        Args:
+            rank: rank(lote, filas, distancias) -> (filas, distancias,
+                puntuaciones); corre con el candado tomado y debe devolver
+                arrays nuevos (ver PlaceRanker.rank)
+
+        Returns:
+            Tupla (lote, filas, distancias, puntuaciones), o None si la zona
+            no tiene cobertura reciente o hay menos de `min_results` lugares.
+            Las filas devueltas se pueden leer del lote sin el candado.
+        """
+        if self.covers(lat, lng, radius, place_type):
+            with self._lock:
+                batch = self._batch
+                rows, distances = self._query_rows(lat, lng, radius, place_type)
+                if len(rows) >= self.min_results:
+                    self.local_hits += 1
+                    return (batch,) + tuple(rank(batch, rows, distances))
+        self.local_misses += 1
+        return None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def save(self, path: Optional[str] = None):
+        """
+        Guardar el índice en disco de forma atómica
+
+        Varios workers comparten el archivo: con el archivo bloqueado se
+        incorporan antes los lugares y círculos que guardaron los demás
+        (los de este proceso ganan si un lugar está en ambos), así que
+        ningún worker borra lo que aprendieron los otros.
+        """
+        path = path or self.path
+        if not path:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            if os.path.exists(path):
+                self._merge(self._read(path))
+
+            with self._lock:
+                payload = {
+                    'version': 1,
+                    'places': [
+                        dict(
+                            {name: getattr(place, name) for name in _HEALTH_PLACE_FIELDS},
+                            index_types=sorted(self._place_types.get(place.place_id, ()))
+                        )
+                        for place in self._batch.to_places(sorted(self._rows.values()))
+                    ],
+                    'coverage': {place_type: list(circles) for place_type, circles in self._coverage.items()}
+                }
+                self._dirty = False
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(payload, file, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        finally:
+            os.close(lock_fd)
+
+    def load(self, path: Optional[str] = None):
+        """Cargar un índice guardado previamente"""
+        payload = self._read(path or self.path)
+        if payload:
+            self._merge(payload)
+            with self._lock:
+                self._dirty = False
+
+    def _read(self, path: str) -> Dict:
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo cargar el índice de lugares: {e}")
+            return {}
+
+    def _merge(self, payload: Dict):
+        """Incorporar los lugares y círculos de un archivo que este proceso no tiene"""
+        cutoff = time.time() - self.coverage_ttl
+        with self._lock:
+            for data in payload.get('places', []):
+                if data.get('place_id') in self._rows:
+                    continue
+                index_types = data.pop('index_types', [])
+                place = HealthPlace(**{key: value for key, value in data.items() if key in _HEALTH_PLACE_FIELDS})
+                # Sin arrancar el hilo de guardado: con preload_app la carga
+                # ocurre en el maestro y el hilo no sobreviviría al fork
+                self._add(place, index_types)
+            self._commit()
+
+            for place_type, circles in payload.get('coverage', {}).items():
+                known = set(self._coverage.get(place_type, ()))
+                merged = sorted(
+                    tuple(circle) for circle in circles
+                    if circle[3] >= cutoff and tuple(circle) not in known
+                )
+                for circle in merged:
+                    self._add_coverage(place_type, circle)
+
+    def _ensure_saver(self):
+        # El hilo no sobrevive a un fork: cada worker arranca el suyo
+        if not self.path or self._saver_pid == os.getpid():
+            return
+        with self._lock:
+            if self._saver_pid == os.getpid():
+                return
+            self._saver = threading.Thread(target=self._autosave, name='place-index-saver', daemon=True)
+            self._saver_pid = os.getpid()
+            self._saver.start()
+
+    def _autosave(self):
+        while True:
+            time.sleep(self.save_interval)
+            if self._dirty:
+                try:
+                    self.save()
+                except OSError as e:
+                    logger.error(f"Error guardando el índice de lugares: {e}")
+
+    def stats(self) -> Dict:
+        """Tamaño del índice y uso del modo local"""
+        return {
+            'places': len(self._rows),
+            'replaced_rows': self._dead_rows,
+            'memory_bytes': self._batch.nbytes(),
+            'types': {place_type: sum(len(ids) for ids in grid.values()) for place_type, grid in self._grid.items()},
+            'coverage_circles': {place_type: len(circles) for place_type, circles in self._coverage.items()},
+            'local_hits': self.local_hits,
+            'local_misses': self.local_misses
+        }
@@ -0,0 +1,282 @@
+"""
+Registro de servicios compartidos por worker
+"""
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from flask import current_app
+
+from .details_cache import DetailsCache
+from .fhir_service import FHIRService
+from .fhir_snapshot_store import FHIRSnapshotStore
+from .geocode_cache import GeocodeCache
+from .medication_index import MedicationIndex
+from .nearby_cache import NearbyCache
+from .photo_cache import PhotoCache
+from .place_index import PlaceIndex
+from ..models.health_place import HealthPlace
+from ..utils.json_codec import FragmentCache
+from ..utils.metrics import CACHE_HITS, CACHE_MISSES, get_metrics
+
+# Los módulos que importan googlemaps/requests o numpy se importan
+# al crear su servicio, no al arrancar la app
+if TYPE_CHECKING:
+    from .enriched_search_service import EnrichedSearchService
+    from .google_maps_service import GoogleMapsService
+    from .google_places_service import GooglePlacesService
+    from .place_ranking import PlaceRanker
+
+
+# Servicios con contadores de aciertos y fallos (se exportan en /metrics)
+CACHE_NAMES = ('geocode_cache', 'nearby_cache', 'details_cache', 'photo_cache', 'fhir_store')
+
+# Servicios que se pueden crear en el proceso maestro (preload_app) y
+# heredar tras el fork: sin hilos ni sockets abiertos, y sus backends
+# externos (SQLite, Redis) reconectan por proceso. El índice de lugares
+# carga su archivo una vez; cada worker arranca su hilo de guardado con
+# el primer lugar que agrega
+PRELOAD_NAMES = ('geocode_cache', 'nearby_cache', 'details_cache', 'photo_cache', 'place_index')
+
+
+def _health_place(place: Dict[str, Any]) -> Optional[HealthPlace]:
+    """Lugar con el formato de GoogleMapsService como HealthPlace (None sin coordenadas)"""
+    location = (place.get('geometry') or {}).get('location') or {}
+    if 'lat' not in location or 'lng' not in location:
+        return None
+    return HealthPlace(
+        place_id=place.get('place_id', ''),
+        name=place.get('name', ''),
+        address=place.get('address', ''),
+        lat=location['lat'],
+        lng=location['lng'],
+        rating=place.get('rating') or 0.0,
+        user_ratings_total=place.get('user_ratings_total') or 0,
+        price_level=place.get('price_level') or 0,
+        types=place.get('types', ()),
+        open_now=place.get('open_now'),
+        photo_reference=place.get('photo_reference', '')
+    )
+
+
+class ServiceRegistry:
+    """
+    Mantiene una instancia de larga vida de cada servicio por proceso.
+
+    Los servicios se crean de forma perezosa en la primera petición. Si el
+    proceso cambia (fork de un worker de gunicorn), se vuelven a crear para
+    no compartir sockets abiertos entre procesos, salvo los de
+    PRELOAD_NAMES creados en el maestro con `preload()`.
+    """
+
+    def __init__(self, app=None):
+        self.config: Dict[str, Any] = {}
+        self.metrics = None
+        self._lock = threading.RLock()
+        self._instances: Dict[str, Any] = {}
+        self._pid = os.getpid()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Registrar el registro de servicios en la aplicación"""
+        self.config = app.config
+        app.extensions['service_registry'] = self
+        # Las métricas (init_metrics) se inicializan antes que el registro
+        self.metrics = get_metrics(app)
+        if self.metrics is not None:
+            self.metrics.add_collector(self._cache_samples)
+
+    def _get(self, name: str, factory):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._instances = {
+                        name: instance for name, instance in self._instances.items()
+                        if name in PRELOAD_NAMES
+                    }
+                    self._pid = os.getpid()
+
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+        return instance
+
+    def preload(self):
+        """
+        Crear en el proceso actual los servicios que se heredan tras el fork.
+
+        Con preload_app, gunicorn.conf.py lo llama en el maestro para que
+        los workers compartan esas estructuras (copy-on-write).
+        """
+        for name in PRELOAD_NAMES:
+            getattr(self, name)
+        return PRELOAD_NAMES
+
+    @property
+    def google_client(self):
+        """Cliente de Google Maps con pool de conexiones compartido"""
+        return self._get('google_client', self._create_google_client)
+
+    @property
+    def geocode_cache(self) -> GeocodeCache:
+        """Caché de geocodificación del worker"""
+        return self._get('geocode_cache', lambda: GeocodeCache.from_config(self.config))
+
+    @property
+    def nearby_cache(self) -> NearbyCache:
+        """Caché espacial de búsquedas cercanas del worker"""
+        return self._get('nearby_cache', lambda: NearbyCache.from_config(self.config))
+
+    @property
+    def details_cache(self) -> DetailsCache:
+        """Caché de detalles de lugares del worker"""
+        return self._get('details_cache', lambda: DetailsCache.from_config(self.config))
+
+    @property
+    def photo_cache(self) -> PhotoCache:
+        """Caché de fotos en disco (compartida entre workers por el sistema de archivos)"""
+        return self._get('photo_cache', lambda: PhotoCache.from_config(self.config))
+
+    @property
+    def place_index(self) -> PlaceIndex:
+        """Índice espacial local de lugares (modo local_first de /api/places/search)"""
+        return self._get('place_index', lambda: PlaceIndex.from_config(self.config))
+
+    @property
+    def maps_service(self) -> 'GoogleMapsService':
+        """Servicio de Google Maps de las rutas /api"""
+        return self._get('maps_service', self._create_maps_service)
+
+    @property
+    def places_service(self) -> 'GooglePlacesService':
+        """Servicio de lugares de las rutas /api/places (mismo cliente y cachés que maps_service)"""
+        return self._get('places_service', self._create_places_service)
+
+    @property
+    def place_ranker(self) -> 'PlaceRanker':
+        """Filtros y orden vectorizados de /api/places/search"""
+        return self._get('place_ranker', self._create_place_ranker)
+
+    @property
+    def fhir_service(self) -> FHIRService:
+        """Servicio FHIR del worker"""
+        return self._get('fhir_service', lambda: FHIRService.from_config(self.config, self.metrics))
+
+    @property
+    def fhir_store(self) -> FHIRSnapshotStore:
+        """Snapshots FHIR precalculados del worker (se refrescan en segundo plano)"""
+        return self._get('fhir_store', lambda: FHIRSnapshotStore.from_config(self.config, self.fhir_service))
+
+    @property
+    def medication_index(self) -> MedicationIndex:
+        """Índice de medicamentos en stock por farmacia (se actualiza con los snapshots de stock)"""
+        return self._get('medication_index', lambda: MedicationIndex(self.place_index, self.fhir_store))
+
+    def _index_places(self, place_type: str, places):
+        # Lo que devuelve /api/search también alimenta el índice de lugares
+        # (de ahí salen, entre otras, las farmacias del índice de medicamentos)
+        self.place_index.add_many(
+            [place for place in map(_health_place, places) if place is not None], place_type
+        )
+
+    @property
+    def json_fragments(self) -> FragmentCache:
+        """JSON ya serializado de los lugares, reutilizado entre respuestas"""
+        return self._get('json_fragments', lambda: FragmentCache.from_config(self.config))
+
+    @property
+    def enriched_search_service(self) -> 'EnrichedSearchService':
+        """Búsqueda con disponibilidad o stock FHIR de cada lugar"""
+        return self._get('enriched_search_service', self._create_enriched_search_service)
+
+    def _create_google_client(self):
+        from .google_client import google_client_from_config, instrument_client
+
+        api_key = self.config.get('GOOGLE_MAPS_API_KEY') or os.environ.get('GOOGLE_MAPS_API_KEY')
+        client = google_client_from_config(self.config, api_key)
+        if self.metrics is not None:
+            instrument_client(client, self.metrics)
+        return client
+
+    def _create_maps_service(self):
+        from .google_maps_service import GoogleMapsService
+
+        return GoogleMapsService(
+            client=self.google_client,
+            geocode_cache=self.geocode_cache,
+            nearby_cache=self.nearby_cache,
+            details_cache=self.details_cache,
+            photo_cache=self.photo_cache,
+            on_places=self._index_places
+        )
+
+    def _create_places_service(self):
+        from .google_places_service import GooglePlacesService
+
+        return GooglePlacesService(
+            client=self.google_client,
+            geocode_cache=self.geocode_cache,
+            nearby_cache=self.nearby_cache,
+            place_index=self.place_index,
+            details_cache=self.details_cache,
+            photo_cache=self.photo_cache,
+            config=self.config
+        )
+
+    def _create_place_ranker(self):
+        from .place_ranking import PlaceRanker
+
+        return PlaceRanker.from_config(self.config)
+
+    def _create_enriched_search_service(self):
+        from .enriched_search_service import EnrichedSearchService
+
+        return EnrichedSearchService(self.maps_service, self.fhir_store)
+
+    def _cache_samples(self):
+        # Aciertos y fallos acumulados de las cachés ya creadas en este worker
+        if self._pid != os.getpid():
+            return
+        for name in CACHE_NAMES:
+            instance = self._instances.get(name)
+            if instance is None:
+                continue
+            stats = instance.stats()
+            yield CACHE_HITS, {'cache': name}, stats.get('hits', 0)
+            yield CACHE_MISSES, {'cache': name}, stats.get('misses', 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de los servicios ya creados en este worker"""
+        client = self._instances.get('google_client')
+        stats = {
+            'pid': self._pid,
+            'google_maps_pool': None,
+            'single_flight': None,
+            'upstream_limits': None,
+            'circuit_breakers': None
+        }
+        if client is not None:
+            from .google_client import get_pool_stats, get_coalescing_stats, get_limiter_stats, get_guard_stats
+
+            stats.update({
+                'google_maps_pool': get_pool_stats(client),
+                'single_flight': get_coalescing_stats(client),
+                'upstream_limits': get_limiter_stats(client),
+                'circuit_breakers': get_guard_stats(client)
+            })
+        fhir_service = self._instances.get('fhir_service')
+        stats['fhir_backend'] = fhir_service.stats() if fhir_service is not None else None
+        for name in CACHE_NAMES + ('medication_index', 'place_index'):
+            instance = self._instances.get(name)
+            stats[name] = instance.stats() if instance is not None else None
+        return stats
+
+
+def get_registry() -> ServiceRegistry:
+    """Obtener el registro de servicios de la aplicación actual"""
+    return current_app.extensions['service_registry']
@@ -0,0 +1,345 @@
+"""
+Límites de llamadas a Google: token bucket compartido por los workers del
+host y límite de concurrencia adaptativo (AIMD)
+"""
+import functools
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..utils.lazy_import import lazy_import
+
+googlemaps = lazy_import('googlemaps')
+
+try:
+    import fcntl
+except ImportError:  # Windows: el bucket queda limitado al proceso
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Métodos del cliente que cuentan contra la cuota de Google
+THROTTLED_METHODS = ('geocode', 'places_nearby', 'place', 'places_photo')
+
+# Métodos que devuelven el cuerpo en streaming: ocupan su hueco hasta leerlo
+STREAMED_METHODS = ('places_photo',)
+
+# Segundos que se pide esperar al cliente tras un OVER_QUERY_LIMIT de Google
+OVERLOAD_RETRY_AFTER = 5
+
+BUSY_MESSAGE = 'El servicio de mapas está saturado, intenta de nuevo en unos segundos'
+
+_STATE = struct.Struct('dd')  # tokens, última recarga (epoch)
+
+
+class UpstreamThrottled(Exception):
+    """
+    No hay cupo para llamar a Google antes del plazo de espera, o Google
+    respondió que se superó la cuota
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def busy_result(error: UpstreamThrottled) -> Dict[str, Any]:
+    """Resultado de error de los servicios cuando no hay cupo (se responde 503)"""
+    return {'error': BUSY_MESSAGE, 'retry_after': error.retry_after}
+
+
+class SharedTokenBucket:
+    """
+    Token bucket cuyo estado vive en un archivo mapeado en memoria y
+    protegido con flock, de modo que todos los workers del host comparten
+    la misma tasa. Sin archivo (o sin fcntl) el bucket es del proceso.
+    """
+
+    def __init__(self, rate: float, burst: float, path: Optional[str] = None):
+        """
+        Args:
+            rate: Tokens (llamadas) por segundo para todo el host
+            burst: Tokens máximos acumulables
+            path: Archivo de estado compartido
+        """
+        self.rate = rate
+        self.burst = burst
+        self.path = path if fcntl is not None else None
+        self._lock = threading.Lock()
+        self._local_state = [float(burst), time.time()]
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self.acquired = 0
+        self.rejected = 0
+
+    def _open(self):
+        # El flock es por descripción de archivo: cada proceso abre el suyo
+        if self._pid == os.getpid():
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size < _STATE.size:
+            os.ftruncate(fd, _STATE.size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, _STATE.size)
+        self._pid = os.getpid()
+
+    def _update(self, func):
+        """Aplicar func(tokens, last) -> (tokens, last, resultado) de forma atómica"""
+        with self._lock:
+            if self.path is None:
+                tokens, last, result = func(*self._local_state)
+                self._local_state = [tokens, last]
+                return result
+
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                tokens, last, result = func(*_STATE.unpack_from(self._map))
+                _STATE.pack_into(self._map, 0, tokens, last)
+                return result
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def try_acquire(self) -> float:
+        """
+        Tomar un token si hay
+
+        Returns:
+            0 si se tomó el token, o los segundos hasta que haya uno
+        """
+        def take(tokens, last):
+            now = time.time()
+            tokens = min(self.burst, tokens + max(0.0, now - last) * self.rate)
+            if tokens >= 1:
+                return tokens - 1, now, 0.0
+            return tokens, now, (1 - tokens) / self.rate
+
+        return self._update(take)
+
+    def acquire(self, deadline: float) -> bool:
+        """Esperar un token hasta `deadline` (time.monotonic); False si no llega a tiempo"""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                self.acquired += 1
+                return True
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                return False
+            time.sleep(wait)
+
+    def drain(self):
+        """Vaciar el bucket (Google respondió OVER_QUERY_LIMIT)"""
+        self._update(lambda tokens, last: (min(tokens, 0.0), time.time(), None))
+
+    def retry_after(self) -> float:
+        """Segundos estimados hasta que haya un token"""
+        return 1 / self.rate
+
+    def stats(self) -> Dict[str, Any]:
+        """Tasa configurada y tokens tomados o rechazados por este worker"""
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'shared': self.path is not None,
+            'acquired': self.acquired,
+            'rejected': self.rejected
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Límite de llamadas simultáneas que se ajusta solo (AIMD).
+
+    Cada llamada rápida y correcta sube el límite en 1/límite (≈ +1 por
+    ronda); un OVER_QUERY_LIMIT, un 429 o una latencia por encima del
+    objetivo lo multiplican por `backoff`, como mucho una vez por ventana.
+    """
+
+    def __init__(
+        self,
+        initial: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 50,
+        latency_target_ms: float = 2000,
+        backoff: float = 0.5
+    ):
+        """
+        Args:
+            initial: Límite inicial de llamadas simultáneas
+            min_limit: Límite mínimo
+            max_limit: Límite máximo
+            latency_target_ms: Latencia a partir de la cual se reduce el límite
+            backoff: Factor multiplicativo al reducir
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_ms = latency_target_ms
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self.rejected = 0
+        self.decreases = 0
+
+    def acquire(self, deadline: float) -> bool:
+        """Esperar un hueco hasta `deadline` (time.monotonic); False si no llega a tiempo"""
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def cancel(self):
+        """Devolver un hueco sin haber llamado a Google (no ajusta el límite)"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def release(self, latency_ms: float, overloaded: bool = False):
+        """Liberar el hueco y ajustar el límite según el resultado de la llamada"""
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if overloaded or latency_ms > self.latency_target_ms:
+                if now - self._last_decrease >= self.latency_target_ms / 1000:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Límite actual, llamadas en curso y rechazos"""
+        with self._cond:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self._in_flight,
+                'rejected': self.rejected,
+                'decreases': self.decreases
+            }
+
+
+class _ReleasingIterator:
+    """
+    Iterador sobre el cuerpo de una respuesta en streaming (places_photo)
+    que libera el hueco del límite de concurrencia cuando se termina de
+    leer, falla o se cierra
+    """
+
+    def __init__(self, chunks, limiter: AdaptiveConcurrencyLimiter, start: float):
+        self._chunks = iter(chunks)
+        self._limiter = limiter
+        self._start = start
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        """Liberar el hueco (una sola vez) con la latencia hasta el último byte"""
+        if not self._released:
+            self._released = True
+            self._limiter.release((time.perf_counter() - self._start) * 1000)
+
+    def __del__(self):
+        # Un cuerpo que nadie terminó de leer no debe dejar el hueco tomado
+        self.close()
+
+
+def is_overload_error(error: Exception) -> bool:
+    """True si Google indica que superamos la cuota (OVER_QUERY_LIMIT o HTTP 429)"""
+    if isinstance(error, googlemaps.exceptions.ApiError):
+        return error.status == 'OVER_QUERY_LIMIT'
+    if isinstance(error, googlemaps.exceptions.HTTPError):
+        return error.status_code == 429
+    return False
+
+
+def throttle_client(
+    client,
+    bucket: Optional[SharedTokenBucket] = None,
+    limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    queue_timeout: float = 2.0
+):
+    """
+    Hacer pasar las llamadas a Google del cliente por el token bucket y el
+    límite de concurrencia
+
+    Una llamada sin cupo espera como mucho `queue_timeout` segundos y luego
+    lanza UpstreamThrottled, en vez de dejar hilos bloqueados. El token se
+    toma solo después de conseguir hueco, y las fotos mantienen el hueco
+    hasta que se termina de leer la imagen. Un
+    OVER_QUERY_LIMIT o 429 de Google también se convierte en UpstreamThrottled.
+
+    Returns:
+        El mismo cliente, con `client.rate_limiter` y `client.concurrency_limiter`
+    """
+    for name in THROTTLED_METHODS:
+        method = getattr(client, name)
+
+        @functools.wraps(method)
+        def throttled(*args, _method=method, _streams=name in STREAMED_METHODS, **kwargs):
+            deadline = time.monotonic() + queue_timeout
+            # Primero el hueco y después el token: una llamada que el límite de
+            # concurrencia rechaza no debe gastar cupo del bucket compartido
+            if limiter is not None and not limiter.acquire(deadline):
+                raise UpstreamThrottled(
+                    'Demasiadas llamadas simultáneas a Google', limiter.latency_target_ms / 1000
+                )
+            if bucket is not None and not bucket.acquire(deadline):
+                if limiter is not None:
+                    limiter.cancel()
+                raise UpstreamThrottled(
+                    'Límite de llamadas a Google alcanzado', bucket.retry_after()
+                )
+
+            start = time.perf_counter()
+            overloaded = False
+            streaming = False
+            try:
+                result = _method(*args, **kwargs)
+                if _streams and limiter is not None:
+                    # El hueco se libera al terminar de leer el cuerpo
+                    streaming = True
+                    return _ReleasingIterator(result, limiter, start)
+                return result
+            except Exception as e:
+                overloaded = is_overload_error(e)
+                if not overloaded:
+                    raise
+                logger.warning(f"Google respondió que se superó la cuota: {str(e)}")
+                if bucket is not None:
+                    bucket.drain()
+                raise UpstreamThrottled('Cuota de Google superada', OVERLOAD_RETRY_AFTER) from e
+            finally:
+                if limiter is not None and not streaming:
+                    limiter.release((time.perf_counter() - start) * 1000, overloaded)
+
+        setattr(client, name, throttled)
+
+    client.rate_limiter = bucket
+    client.concurrency_limiter = limiter
+    return client
@@ -0,0 +1,143 @@
+"""
+Caché en memoria con expiración (TTL) y desalojo LRU, y selección del
+backend de caché (memoria, SQLite o Redis) según la configuración
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .settings import get_setting
+
+# Marcador para distinguir "no está en caché" de un valor None cacheado
+MISSING = object()
+
+CACHE_BACKENDS = ('memory', 'sqlite', 'redis')
+
+
+def cache_key(key) -> str:
+    """Convertir una clave (texto o tupla) en texto para backends externos"""
+    if isinstance(key, tuple):
+        return ':'.join(str(part) for part in key)
+    return str(key)
+
+
+class TTLCache:
+    """
+    Caché LRU acotada en número de entradas, con TTL por entrada.
+
+    Es segura para hilos: todas las operaciones toman un lock interno.
+    """
+
+    def __init__(self, max_entries: int = 1000, default_ttl: float = 300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        """Obtener un valor vigente, o `default` si no existe o expiró"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """Guardar un valor con el TTL indicado (o el TTL por defecto)"""
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Eliminar una entrada si existe"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Vaciar la caché"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+_redis_clients = {}
+_redis_clients_lock = threading.Lock()
+
+
+def create_cache(config, namespace: str, max_entries: int, default_ttl: float):
+    """
+    Crear la caché de `namespace` con el backend de CACHE_BACKEND
+
+    - memory: TTLCache propia de cada worker
+    - sqlite: archivo compartido por los workers del host (CACHE_SQLITE_PATH)
+    - redis: servidor compartido (CACHE_REDIS_URL); ver benchmarks/resp_server.py
+      para un sustituto local
+
+    Todas exponen get/set/delete/clear/stats. Los backends externos guardan
+    los valores como JSON.
+    """
+    backend = get_setting(config, 'CACHE_BACKEND', 'memory')
+
+    if backend == 'memory':
+        return TTLCache(max_entries=max_entries, default_ttl=default_ttl)
+
+    if backend == 'sqlite':
+        from .sqlite_cache import SQLiteCache
+        return SQLiteCache(
+            get_setting(config, 'CACHE_SQLITE_PATH', 'instance/cache.sqlite3'),
+            namespace,
+            max_entries=max_entries,
+            default_ttl=default_ttl
+        )
+
+    if backend == 'redis':
+        from .redis_cache import RedisCache, RespClient
+        url = get_setting(config, 'CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        timeout = get_setting(config, 'CACHE_REDIS_TIMEOUT', 0.5)
+        # Un cliente (y sus conexiones) por URL para todas las cachés
+        with _redis_clients_lock:
+            client = _redis_clients.get(url)
+            if client is None:
+                client = _redis_clients[url] = RespClient(url, timeout=timeout)
+        return RedisCache(
+            client,
+            namespace,
+            default_ttl=default_ttl,
+            prefix=get_setting(config, 'CACHE_KEY_PREFIX', 'buscasalud')
+        )
+
+    raise ValueError(f"CACHE_BACKEND inválido: {backend}. Válidos: {', '.join(CACHE_BACKENDS)}")
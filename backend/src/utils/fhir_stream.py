@@ -0,0 +1,184 @@
+"""
+Lectura en streaming de recursos FHIR: NDJSON de Bulk Data ($export) y
+Bundles grandes, con memoria constante
+"""
+import codecs
+import gzip
+import json
+import os
+import re
+from typing import Any, BinaryIO, Dict, Iterator, List
+
+# Bytes que se leen del archivo en cada paso
+CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = ' \t\r\n'
+_decoder = json.JSONDecoder()
+_BUNDLE_HEAD = re.compile(r'\s*\{\s*"resourceType"\s*:\s*"Bundle"')
+
+
+class FHIRParseError(ValueError):
+    """El archivo no es NDJSON ni una Bundle FHIR válida"""
+
+
+def open_export(path: str) -> BinaryIO:
+    """Abrir un archivo de exportación, descomprimiendo .gz al vuelo"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def iter_ndjson(stream: BinaryIO, source: str = '<stream>') -> Iterator[Dict[str, Any]]:
+    """Un recurso por línea (formato de FHIR Bulk Data); las líneas vacías se ignoran"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise FHIRParseError(f'{source}:{line_number}: {str(e)}') from e
+
+
+class _Reader:
+    """Texto del archivo en un buffer que se rellena a pedido y se recorta al avanzar"""
+
+    def __init__(self, stream: BinaryIO, chunk_size: int):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        # Decodificador incremental: un carácter UTF-8 puede quedar partido entre bloques
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Leer otro bloque; False si ya no queda nada"""
+        if self.eof:
+            return False
+        data = self._stream.read(self._chunk_size)
+        if not data:
+            self.eof = True
+            self.buffer = self.buffer[self.pos:] + self._utf8.decode(b'', final=True)
+        else:
+            self.buffer = self.buffer[self.pos:] + self._utf8.decode(data)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Siguiente carácter no blanco (sin consumirlo); '' al final del archivo"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise FHIRParseError(f"Se esperaba '{char}' y se encontró '{self.peek() or 'fin de archivo'}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decodificar el siguiente valor JSON completo, leyendo más si está cortado"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.fill():
+                    continue
+                raise FHIRParseError(f'JSON inválido: {e.msg}') from e
+            # Un número al final del buffer puede seguir en el próximo bloque
+            if end == len(self.buffer) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_bundle(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Recursos de `entry[*].resource` de una Bundle, de uno en uno
+
+    Solo cada entry (no la Bundle completa) se tiene en memoria, así que
+    un searchset de varios GB se recorre con memoria constante. Las claves
+    de primer nivel distintas de `entry` se decodifican y se descartan.
+    """
+    reader = _Reader(stream, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'entry':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    entry = reader.value()
+                    resource = entry.get('resource') if isinstance(entry, dict) else None
+                    if resource is not None:
+                        yield resource
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        raise FHIRParseError(f"Se esperaba ',' o ']' en entry y se encontró '{separator}'")
+        else:
+            reader.value()
+
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise FHIRParseError(f"Se esperaba ',' o '}}' y se encontró '{separator or 'fin de archivo'}'")
+
+
+def detect_format(path: str) -> str:
+    """'bundle' si el archivo empieza con una Bundle, 'ndjson' en otro caso"""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.ndjson') or name.endswith('.jsonl'):
+        return 'ndjson'
+    with open_export(path) as stream:
+        head = stream.read(4096).decode('utf-8', errors='ignore')
+    # Un NDJSON tiene un recurso completo por línea; una Bundle se extiende en varias
+    first_line, newline, _ = head.partition('\n')
+    try:
+        return 'bundle' if json.loads(first_line).get('resourceType') == 'Bundle' else 'ndjson'
+    except ValueError:
+        if newline:
+            return 'bundle'
+    # Primera línea más larga que el bloque leído: se mira el tipo del recurso raíz
+    return 'bundle' if _BUNDLE_HEAD.match(head) else 'ndjson'
+
+
+def iter_resources(path: str, fmt: str = 'auto', chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Recursos de un archivo NDJSON o Bundle (opcionalmente .gz)"""
+    if fmt == 'auto':
+        fmt = detect_format(path)
+    with open_export(path) as stream:
+        if fmt == 'ndjson':
+            yield from iter_ndjson(stream, path)
+        elif fmt == 'bundle':
+            yield from iter_bundle(stream, chunk_size)
+        else:
+            raise ValueError(f"Formato inválido: {fmt}. Válidos: auto, ndjson, bundle")
+
+
+def expand_paths(paths: List[str]) -> List[str]:
+    """Expandir directorios a sus archivos .ndjson, .json y .gz (ordenados)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(('.ndjson', '.ndjson.gz', '.json', '.json.gz', '.jsonl')):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
@@ -0,0 +1,121 @@
+"""
+Utilidades geográficas: distancia haversine y geohash
+"""
+import math
+from typing import Tuple
+
+from .lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+EARTH_RADIUS_M = 6371008.8
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+_GEOHASH_INDEX = {char: index for index, char in enumerate(_GEOHASH_ALPHABET)}
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Distancia en metros entre dos coordenadas sobre la esfera terrestre
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_many(lat: float, lng: float, lats: 'np.ndarray', lngs: 'np.ndarray') -> 'np.ndarray':
+    """
+    Distancias en metros desde (lat, lng) a cada coordenada, en una sola pasada (NumPy)
+    """
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lngs - lng)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 7) -> str:
+    """
+    Codificar una coordenada como geohash de `precision` caracteres
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Límites (lat_min, lat_max, lng_min, lng_max) de una celda geohash
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _GEOHASH_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    """
+    Centro (lat, lng) de una celda geohash
+    """
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    return (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+
+
+def geohash_half_diagonal_m(geohash: str) -> float:
+    """
+    Distancia en metros del centro de una celda a su esquina más lejana
+    """
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    lat_center, lng_center = (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+    return max(
+        haversine_m(lat_center, lng_center, lat, lng)
+        for lat in (lat_min, lat_max)
+        for lng in (lng_min, lng_max)
+    )
@@ -0,0 +1,166 @@
+"""
+Serialización JSON rápida (orjson si está instalado) con fragmentos ya codificados
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+from .settings import get_setting
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+
+class Fragment(bytes):
+    """JSON ya codificado que dumps() inserta tal cual, sin volver a codificarlo"""
+
+
+def _dumps_plain(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _key(key: Any) -> bytes:
+    return _dumps_plain(key if isinstance(key, str) else str(key))
+
+
+def _splice(obj: Any) -> bytes:
+    """Codificar una estructura que contiene Fragments, empalmando sus bytes"""
+    if isinstance(obj, Fragment):
+        return obj
+    if isinstance(obj, dict):
+        return b'{' + b','.join(_key(key) + b':' + dumps(value) for key, value in obj.items()) + b'}'
+    if isinstance(obj, (list, tuple)):
+        return b'[' + b','.join(item if isinstance(item, Fragment) else dumps(item) for item in obj) + b']'
+    return _dumps_plain(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serializar a JSON compacto en UTF-8
+
+    Usa orjson si está disponible y si no la librería estándar. Los
+    Fragment se insertan como JSON ya codificado: la estructura se codifica
+    de una vez y, solo si contiene fragmentos, se arma por partes.
+    """
+    if isinstance(obj, Fragment):
+        return obj
+    try:
+        return _dumps_plain(obj)
+    except TypeError:
+        # orjson y json rechazan bytes: hay Fragments dentro
+        return _splice(obj)
+
+
+def loads(data):
+    """Decodificar JSON (bytes o str)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def fragment(obj: Any) -> Fragment:
+    """Codificar un objeto una vez para reutilizarlo en varias respuestas"""
+    return Fragment(dumps(obj))
+
+
+def extend_object(encoded: bytes, fields: Dict[str, Any]) -> Fragment:
+    """Agregar campos a un objeto JSON ya codificado sin decodificarlo"""
+    if not fields:
+        return Fragment(encoded)
+    extra = dumps(fields)
+    if encoded == b'{}':
+        return Fragment(extra)
+    # '{"a":1}' + {"b":2} -> '{"a":1,"b":2}'
+    return Fragment(encoded[:-1] + b',' + extra[1:])
+
+
+def backend() -> str:
+    """'orjson' o 'json' según el codificador en uso"""
+    return 'orjson' if orjson is not None else 'json'
+
+
+class FragmentCache:
+    """
+    Fragmentos JSON de lugares ya serializados, por clave, con LRU.
+
+    La clave identifica el contenido (un HealthPlace inmutable o el par
+    place_id/versión de una entrada de caché), así que un fragmento nunca
+    queda desactualizado: un lugar que cambia tiene otra clave.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Fragment]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'FragmentCache':
+        """Crear la caché a partir de un objeto o dict de configuración"""
+        return cls(max_entries=get_setting(config, 'JSON_FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> Fragment:
+        """Fragmento de `key`, codificando build() la primera vez"""
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+
+        encoded = fragment(build())
+        with self._lock:
+            self._entries[key] = encoded
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return encoded
+
+    def get_many(self, keys: Sequence[Hashable], build: Callable[[int], Any]) -> List[Fragment]:
+        """
+        Fragmentos de varias claves con un solo paso por el candado
+
+        build(i) arma el objeto de keys[i] cuando no está en la caché.
+        """
+        entries = self._entries
+        missing = []
+        with self._lock:
+            found = [entries.get(key) for key in keys]
+            for position, encoded in enumerate(found):
+                if encoded is None:
+                    missing.append(position)
+                else:
+                    entries.move_to_end(keys[position])
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if not missing:
+            return found
+
+        for position in missing:
+            found[position] = fragment(build(position))
+        with self._lock:
+            for position in missing:
+                entries[keys[position]] = found[position]
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño y aciertos de la caché de fragmentos"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'encoder': backend()
+        }
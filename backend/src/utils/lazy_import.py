@@ -0,0 +1,36 @@
+"""
+Importación diferida de módulos pesados (googlemaps, requests, numpy)
+"""
+import importlib
+import sys
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """
+    Sustituto de un módulo que lo importa en el primer acceso a un atributo.
+
+    La importación real pasa por importlib (con su lock por módulo), así
+    que varios hilos pueden tocar el módulo a la vez en la primera petición.
+    Después se copian sus atributos al sustituto, para que los accesos
+    siguientes (np.* en los bucles de ranking) no pasen por __getattr__.
+    """
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Obtener un módulo sin importarlo todavía.
+
+    El arranque de la app (y los health checks de un contenedor que escala
+    desde cero) no paga la importación de dependencias que solo usan
+    algunas rutas. Si el módulo ya está importado se devuelve tal cual.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
@@ -0,0 +1,391 @@
+"""
+Métricas por petición (spans y Server-Timing) y endpoint /metrics en formato Prometheus
+"""
+import bisect
+import contextvars
+import functools
+import glob
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .json_codec import dumps, loads
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los buckets de los histogramas de latencia
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+REQUEST_DURATION = 'buscasalud_request_duration_ms'
+SPAN_DURATION = 'buscasalud_span_duration_ms'
+UPSTREAM_CALLS = 'buscasalud_upstream_calls_total'
+UPSTREAM_ERRORS = 'buscasalud_upstream_errors_total'
+CACHE_HITS = 'buscasalud_cache_hits_total'
+CACHE_MISSES = 'buscasalud_cache_misses_total'
+CACHE_HIT_RATIO = 'buscasalud_cache_hit_ratio'
+
+HELP = {
+    REQUEST_DURATION: 'Duración de las peticiones HTTP en milisegundos',
+    SPAN_DURATION: 'Tiempo por etapa de una petición (validación, Google, FHIR, serialización) en milisegundos',
+    UPSTREAM_CALLS: 'Llamadas a Google y al backend FHIR',
+    UPSTREAM_ERRORS: 'Errores de Google y del backend FHIR por código',
+    CACHE_HITS: 'Aciertos de las cachés',
+    CACHE_MISSES: 'Fallos de las cachés',
+    CACHE_HIT_RATIO: 'Proporción de aciertos de las cachés (todos los workers)',
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class RequestTiming:
+    """Spans acumulados de una petición: nombre -> (milisegundos, número de veces)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.spans: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, elapsed_ms: float):
+        # Las llamadas en paralelo (detalles en lote, hedging) suman desde varios hilos
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [elapsed_ms, 1]
+            else:
+                span[0] += elapsed_ms
+                span[1] += 1
+
+    def server_timing(self, total_ms: float, cpu_ms: float) -> str:
+        """
+        Valor del header Server-Timing
+
+        `cpu` es el tiempo de CPU del hilo de la petición; lo que falta hasta
+        `total` es espera (Google, FHIR, locks).
+        """
+        parts = [f'{name};dur={elapsed:.2f}' for name, (elapsed, _) in self.spans.items()]
+        parts.append(f'cpu;dur={cpu_ms:.2f}')
+        parts.append(f'total;dur={total_ms:.2f}')
+        return ', '.join(parts)
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar('request_timing', default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Medir un tramo de la petición en curso (no hace nada fuera de una petición)"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, (time.perf_counter() - start) * 1000)
+
+
+def bind(func: Callable) -> Callable:
+    """
+    Ejecutar func en otro hilo con el contexto actual
+
+    Los pools de hilos no heredan contextvars: sin esto los spans de las
+    llamadas hechas desde el pool no llegan a la petición.
+    """
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+class Metrics:
+    """
+    Contadores e histogramas del proceso, agregables entre workers.
+
+    Cada worker guarda periódicamente sus valores acumulados en
+    `<directory>/metrics-<pid>.json` (escritura atómica); /metrics suma los
+    archivos de todos los workers, como el modo multiproceso de
+    prometheus_client. Los valores de un worker que terminó siguen
+    sumando, así que el directorio se vacía al arrancar el servidor (ver
+    clear()). Sin directorio, /metrics muestra solo el worker que responde.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        flush_interval: float = 5.0,
+        buckets: Iterable[float] = DEFAULT_BUCKETS_MS
+    ):
+        """
+        Args:
+            directory: Directorio compartido por los workers (None: solo este proceso)
+            flush_interval: Segundos mínimos entre escrituras del archivo del worker
+            buckets: Límites superiores de los buckets de los histogramas, en ms
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+        self._reset(os.getpid())
+
+    @classmethod
+    def from_config(cls, config) -> 'Metrics':
+        """Crear las métricas a partir de un objeto o dict de configuración"""
+        return cls(
+            directory=get_setting(config, 'METRICS_DIR', 'instance/metrics') or None,
+            flush_interval=get_setting(config, 'METRICS_FLUSH_INTERVAL', 5.0)
+        )
+
+    def _reset(self, pid: int):
+        self._pid = pid
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._last_flush = 0.0
+
+    def _check_pid(self):
+        # Tras un fork, el worker empieza de cero con su propio archivo
+        if self._pid != os.getpid():
+            self._reset(os.getpid())
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Sumar a un contador"""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """Registrar un valor (ms) en un histograma"""
+        key = (name, _labels(labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._check_pid()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Un contador por bucket (+Inf al final), suma y cantidad
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 3)
+            histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """
+        Agregar una fuente de contadores acumulados que se leen al exportar
+
+        collector() devuelve tuplas (nombre, etiquetas, valor); sirve para
+        contadores que ya lleva otro componente (aciertos de las cachés).
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Valores actuales del proceso, serializables"""
+        counters = {}
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    key = (name, _labels(labels))
+                    counters[key] = counters.get(key, 0) + value
+            except Exception as e:
+                logger.error(f"Error leyendo métricas: {str(e)}")
+        with self._lock:
+            self._check_pid()
+            for key, value in self._counters.items():
+                counters[key] = counters.get(key, 0) + value
+            histograms = [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()]
+        return {
+            'buckets': list(self.buckets),
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': histograms
+        }
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+
+    def flush(self, force: bool = False):
+        """Guardar los valores del worker si pasó flush_interval desde la última vez"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path()
+            temporary = f'{path}.tmp'
+            with open(temporary, 'wb') as file:
+                file.write(dumps(self.snapshot()))
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.error(f"No se pudieron guardar las métricas: {str(e)}")
+
+    def clear(self):
+        """Borrar los archivos de todos los workers (al arrancar el servidor)"""
+        if not self.directory:
+            return
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json*')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def collect(self) -> Dict[str, Any]:
+        """Sumar los valores de todos los workers"""
+        if not self.directory:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(force=True)
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                try:
+                    with open(path, 'rb') as file:
+                        snapshots.append(loads(file.read()))
+                except (OSError, ValueError):
+                    # Archivo a medio escribir o borrado: se omite en esta lectura
+                    continue
+
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        for snapshot in snapshots:
+            if tuple(snapshot.get('buckets', ())) != self.buckets:
+                continue
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = list(values)
+                else:
+                    for index, value in enumerate(values):
+                        merged[index] += value
+        return {'counters': counters, 'histograms': histograms, 'workers': len(snapshots)}
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus"""
+        collected = self.collect()
+        counters, histograms = collected['counters'], collected['histograms']
+        lines = []
+
+        def header(name, kind):
+            if name in HELP:
+                lines.append(f'# HELP {name} {HELP[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for name in sorted({name for name, _ in counters}):
+            header(name, 'counter')
+            for (series, labels), value in sorted(counters.items()):
+                if series == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        # Proporción de aciertos de cada caché con los contadores ya sumados
+        ratios = []
+        for (series, labels), hits in sorted(counters.items()):
+            if series == CACHE_HITS:
+                lookups = hits + counters.get((CACHE_MISSES, labels), 0)
+                if lookups:
+                    ratios.append(f'{CACHE_HIT_RATIO}{_format_labels(labels)} {hits / lookups:.4f}')
+        if ratios:
+            header(CACHE_HIT_RATIO, 'gauge')
+            lines.extend(ratios)
+
+        for name in sorted({name for name, _ in histograms}):
+            header(name, 'histogram')
+            for (series, labels), values in sorted(histograms.items()):
+                if series != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), values):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {_format_value(cumulative)}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {values[-2]:.3f}')
+                lines.append(f'{name}_count{_format_labels(labels)} {_format_value(values[-1])}')
+
+        lines.append(f'buscasalud_metrics_workers {collected["workers"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def init_metrics(app, metrics: Optional[Metrics] = None) -> Metrics:
+    """
+    Medir cada petición de la aplicación y exponer GET /metrics
+
+    Cada respuesta lleva un header Server-Timing con los spans de la
+    petición (validation, geocode, nearby, details, photo, fhir,
+    serialization), el tiempo de CPU y el total; lo mismo va en el log.
+    """
+    from flask import Response, g, request
+
+    metrics = metrics or Metrics.from_config(app.config)
+    app.extensions['metrics'] = metrics
+
+    @app.before_request
+    def _start_timing():
+        timing = RequestTiming()
+        g.request_timing = timing
+        g.request_timing_token = _current.set(timing)
+
+    @app.after_request
+    def _finish_timing(response):
+        timing = g.pop('request_timing', None)
+        if timing is None:
+            return response
+        total_ms = (time.perf_counter() - timing.start) * 1000
+        cpu_ms = (time.thread_time() - timing.cpu_start) * 1000
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+        metrics.observe(
+            REQUEST_DURATION, total_ms,
+            endpoint=endpoint, method=request.method, status=response.status_code
+        )
+        for name, (elapsed_ms, _) in timing.spans.items():
+            metrics.observe(SPAN_DURATION, elapsed_ms, span=name)
+        metrics.observe(SPAN_DURATION, cpu_ms, span='cpu')
+
+        server_timing = timing.server_timing(total_ms, cpu_ms)
+        response.headers['Server-Timing'] = server_timing
+        logger.info(f"{request.method} {request.path} {response.status_code} {total_ms:.1f}ms Server-Timing: {server_timing}")
+        metrics.flush()
+        return response
+
+    @app.teardown_request
+    def _reset_timing(_error=None):
+        token = g.pop('request_timing_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
+
+
+def get_metrics(app=None) -> Optional[Metrics]:
+    """Métricas de la aplicación actual (None si no se inicializaron)"""
+    if app is None:
+        from flask import current_app
+        app = current_app
+    return app.extensions.get('metrics')
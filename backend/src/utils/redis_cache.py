@@ -0,0 +1,212 @@
+"""
+Caché compartida sobre Redis (o cualquier servidor que hable RESP)
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from .cache import MISSING, cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class RespError(Exception):
+    """Error devuelto por el servidor Redis"""
+
+
+class RespClient:
+    """
+    Cliente mínimo del protocolo de Redis (RESP2).
+
+    Mantiene una conexión por hilo y por proceso, y reconecta una vez si la
+    conexión se cayó. Basta para GET/SET/DEL/SCAN sin añadir dependencias.
+    """
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', timeout: float = 0.5):
+        """
+        Args:
+            url: redis://[:password@]host[:port][/db]
+            timeout: Timeout de conexión y lectura, en segundos
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        self._local.sock = None
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        self._local.pid = os.getpid()
+        if self.password:
+            self._roundtrip('AUTH', self.password)
+        if self.db:
+            self._roundtrip('SELECT', self.db)
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def execute(self, *args):
+        """Enviar un comando y devolver la respuesta decodificada"""
+        if getattr(self._local, 'sock', None) is None or self._local.pid != os.getpid():
+            self._connect()
+        try:
+            return self._roundtrip(*args)
+        except (ConnectionError, EOFError):
+            # Conexión cerrada por el servidor: reintentar una vez
+            self._close()
+            self._connect()
+            return self._roundtrip(*args)
+        except OSError:
+            # Timeout a mitad de respuesta: la conexión queda desincronizada
+            self._close()
+            raise
+
+    def _roundtrip(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self._local.sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise EOFError('Conexión cerrada por el servidor')
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload.decode('utf-8')
+        if prefix == b'-':
+            raise RespError(payload.decode('utf-8'))
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if prefix == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RespError(f'Respuesta RESP inesperada: {line!r}')
+
+
+class RedisCache:
+    """
+    Caché con TTL en un servidor Redis compartido por todos los workers
+    (y todos los hosts que apunten al mismo servidor).
+
+    Los valores se guardan como JSON con expiración nativa (SET ... PX). El
+    límite de tamaño lo impone la política maxmemory del servidor. Si Redis
+    no responde, las lecturas cuentan como fallo y las escrituras se
+    descartan: la caché nunca tumba una búsqueda.
+
+    La interfaz es la de TTLCache (get, set, delete, clear, stats).
+    """
+
+    def __init__(
+        self,
+        client: RespClient,
+        namespace: str,
+        default_ttl: float = 300,
+        prefix: str = 'buscasalud'
+    ):
+        """
+        Args:
+            client: Cliente RESP
+            namespace: Nombre de la caché (geocode, nearby, details...)
+            default_ttl: TTL por defecto en segundos
+            prefix: Prefijo común de las claves de la aplicación
+        """
+        self.client = client
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self._prefix = f'{prefix}:{namespace}:'
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key) -> str:
+        return self._prefix + cache_key(key)
+
+    def get(self, key, default=MISSING):
+        """Obtener un valor vigente, o `default` si no existe o Redis no responde"""
+        try:
+            data = self.client.execute('GET', self._key(key))
+        except (OSError, EOFError, RespError) as e:
+            self.errors += 1
+            logger.warning(f"Error leyendo la caché Redis: {e}")
+            return default
+
+        if data is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return json.loads(data)
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """Guardar un valor con el TTL indicado (o el TTL por defecto)"""
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self.client.execute(
+                'SET', self._key(key),
+                json.dumps(value, ensure_ascii=False),
+                'PX', max(1, int(ttl * 1000))
+            )
+        except (OSError, EOFError, RespError) as e:
+            self.errors += 1
+            logger.warning(f"Error escribiendo en la caché Redis: {e}")
+
+    def delete(self, key):
+        """Eliminar una entrada si existe"""
+        self.client.execute('DEL', self._key(key))
+
+    def _scan_keys(self) -> List[bytes]:
+        keys = []
+        cursor = b'0'
+        while True:
+            cursor, batch = self.client.execute('SCAN', cursor, 'MATCH', self._prefix + '*', 'COUNT', 500)
+            keys.extend(batch)
+            if cursor in (b'0', 0):
+                return keys
+
+    def clear(self):
+        """Vaciar las entradas de este namespace"""
+        keys = self._scan_keys()
+        for start in range(0, len(keys), 500):
+            self.client.execute('DEL', *keys[start:start + 500])
+
+    def __len__(self):
+        return len(self._scan_keys())
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché (aciertos y fallos de este worker)"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'redis',
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+        }
@@ -1,7 +1,30 @@
 """
 Utilidades para respuestas HTTP
 """
-from flask import jsonify
+import hashlib
+import json
+from functools import wraps
+from flask import send_file, Response, stream_with_context, current_app, make_response, request
+
+from .json_codec import dumps
+from .settings import get_setting
+
+# Cache-Control por tipo de endpoint: prefijo de configuración y valores por
+# defecto (segundos) de max-age y stale-while-revalidate
+CACHE_POLICIES = {
+    'static': ('HTTP_CACHE_STATIC', 86400, 604800),   # tipos de lugar, catálogos HL7
+    'details': ('HTTP_CACHE_DETAILS', 600, 3600),     # detalles de un lugar
+    'search': ('HTTP_CACHE_SEARCH', 60, 300)          # búsquedas cercanas
+}
+
+def json_response(payload, status_code=200):
+    """
+    Crear respuesta JSON con el codificador rápido (ver json_codec)
+    
+    A diferencia de jsonify, acepta Fragments: lugares ya serializados que
+    se insertan en el cuerpo sin volver a codificarlos.
+    """
+    return Response(dumps(payload), status=status_code, mimetype='application/json')
 
 def success_response(data=None, message="Success", status_code=200):
     """
@@ -12,7 +35,7 @@ def success_response(data=None, message="Success", status_code=200):
         'message': message,
         'data': data
     }
-    return jsonify(response), status_code
+    return json_response(response, status_code), status_code
 
 def error_response(message="Error", status_code=400, details=None):
     """
@@ -26,7 +49,15 @@ def error_response(message="Error", status_code=400, details=None):
     if details:
         response['details'] = details
     
-    return jsonify(response), status_code
+    return json_response(response, status_code), status_code
+
+def throttled_response(retry_after, message="Servicio saturado, intenta de nuevo en unos segundos"):
+    """
+    Crear respuesta 503 con Retry-After cuando no hay cupo para llamar a Google
+    """
+    response, status_code = error_response(message, 503)
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status_code
 
 def pagination_response(data, page, per_page, total_items, message="Success"):
     """
@@ -47,4 +78,118 @@ def pagination_response(data, page, per_page, total_items, message="Success"):
             'has_prev': page > 1
         }
     }
-    return jsonify(response), 200
\ No newline at end of file
+    return json_response(response), 200
+
+def json_bytes_response(body, status_code=200):
+    """
+    Crear respuesta con un cuerpo JSON ya serializado (bytes)
+    """
+    return Response(body, status=status_code, mimetype='application/json')
+
+def ndjson_response(events, status_code=200):
+    """
+    Crear respuesta en streaming con un objeto JSON por línea (NDJSON)
+    
+    Cada elemento de `events` se envía al cliente en cuanto se genera.
+    """
+    def generate():
+        for event in events:
+            yield json.dumps(event, ensure_ascii=False) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        status=status_code,
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+    )
+
+def cached_file_response(path, mimetype, etag, max_age):
+    """
+    Servir un archivo inmutable de la caché en disco
+    
+    Responde 304 si el If-None-Match del cliente coincide con el ETag. El
+    archivo se entrega con wsgi.file_wrapper (sendfile en gunicorn) sin
+    cargarlo en memoria.
+    """
+    response = send_file(
+        open(path, 'rb'),
+        mimetype=mimetype,
+        etag=etag,
+        conditional=True,
+        max_age=max_age
+    )
+    response.cache_control.immutable = True
+    return response
+
+def body_etag(body):
+    """
+    ETag fuerte a partir del cuerpo ya serializado (bytes)
+    """
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def version_etag(*parts):
+    """
+    ETag fuerte a partir de la versión de una entrada de caché (y lo que
+    identifique la representación), sin serializar la respuesta
+    """
+    return body_etag('\x00'.join(str(part) for part in parts).encode('utf-8'))
+
+def not_modified(etag):
+    """
+    Respuesta 304 si el If-None-Match del cliente coincide con el ETag; None si no
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+def cache_response(response, policy):
+    """
+    Agregar ETag, Cache-Control y Vary a una respuesta GET exitosa y
+    convertirla en 304 si el cliente ya tiene esa versión
+    
+    Usa el ETag que ya tenga la respuesta (version_etag) o lo calcula del
+    cuerpo. Los errores y las respuestas en streaming no se cachean.
+    """
+    if (request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304)
+            or response.is_streamed):
+        return response
+    
+    etag, _ = response.get_etag()
+    response.set_etag(etag or body_etag(response.get_data()))
+    
+    prefix, max_age, stale_while_revalidate = CACHE_POLICIES[policy]
+    response.cache_control.public = True
+    response.cache_control.max_age = get_setting(current_app.config, f'{prefix}_MAX_AGE', max_age)
+    response.cache_control.stale_while_revalidate = get_setting(
+        current_app.config, f'{prefix}_STALE_WHILE_REVALIDATE', stale_while_revalidate
+    )
+    # flask-cors responde con el Origin de la petición (o sin
+    # Access-Control-Allow-Origin si no coincide): una caché compartida no
+    # debe servir la respuesta de un origen a otro. flask-cors solo agrega
+    # Vary con varios orígenes; merge_vary une los dos encabezados
+    response.vary.add('Origin')
+    return response.make_conditional(request)
+
+def cache_policy(policy):
+    """
+    Decorador de vistas: aplica cache_response con la política indicada
+    ('static', 'details' o 'search', ver CACHE_POLICIES)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return cache_response(make_response(view(*args, **kwargs)), policy)
+        return wrapper
+    return decorator
+
+def merge_vary(response):
+    """
+    Unir en un solo encabezado Vary los que agregan cache_response y flask-cors
+    """
+    values = response.headers.getlist('Vary')
+    if len(values) > 1:
+        del response.headers['Vary']
+        response.vary.update(value for header in values for value in header.split(','))
+    return response
@@ -0,0 +1,128 @@
+"""
+Elección de la clase de worker de gunicorn y dimensionamiento de workers
+e hilos (usado por gunicorn.conf.py y serve.py)
+"""
+import importlib.util
+import logging
+import math
+import os
+from functools import partial
+from typing import Optional, Tuple
+
+from gunicorn.workers.gthread import ThreadWorker
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Clase de worker -> (clase de gunicorn, módulo que debe estar instalado)
+WORKER_CLASSES = {
+    'sync': ('sync', None),
+    'gthread': ('src.utils.serving.GracefulThreadWorker', None),
+    'gevent': ('gevent', 'gevent'),
+    'uvicorn': ('uvicorn.workers.UvicornWorker', 'uvicorn'),
+}
+
+DEFAULT_WORKER_CLASS = 'gthread'
+
+# Aplicaciones que carga gunicorn: WSGI, o ASGI para el worker uvicorn
+WSGI_APP = 'app:create_app()'
+ASGI_APP = 'asgi:asgi_app'
+
+# Límites del dimensionamiento automático
+MAX_THREADS = 32
+MAX_IO_RATIO = 0.95
+WORKER_CONNECTIONS = 1000
+
+
+def resolve_worker_class(name: Optional[str]) -> str:
+    """
+    Validar la clase de worker pedida.
+
+    Si su módulo (gevent, uvicorn) no está instalado se usa gthread.
+    """
+    name = (name or DEFAULT_WORKER_CLASS).lower()
+    if name not in WORKER_CLASSES:
+        raise ValueError(f"Clase de worker no soportada: {name} (opciones: {', '.join(WORKER_CLASSES)})")
+    module = WORKER_CLASSES[name][1]
+    if module is not None and importlib.util.find_spec(module) is None:
+        logger.warning(f"{module} no está instalado, se usa el worker {DEFAULT_WORKER_CLASS}")
+        return DEFAULT_WORKER_CLASS
+    return name
+
+
+def size_workers(worker_class: str, cpu_count: int, io_ratio: float) -> Tuple[int, int]:
+    """
+    Calcular workers e hilos por worker.
+
+    Si una fracción `io_ratio` de cada petición se pasa esperando a Google
+    o FHIR, hacen falta unas 1 / (1 - io_ratio) peticiones en curso por
+    núcleo para mantenerlo ocupado. El GIL limita cada proceso a un
+    núcleo, así que gthread usa un worker por núcleo con ese número de
+    hilos; sync solo puede sumar procesos (acotado para no multiplicar la
+    memoria), y gevent/uvicorn multiplexan la espera en un solo hilo.
+
+    Returns:
+        (workers, threads)
+    """
+    cpu_count = max(1, cpu_count)
+    io_ratio = min(max(io_ratio, 0.0), MAX_IO_RATIO)
+    per_core = math.ceil(round(1 / (1 - io_ratio), 6))
+
+    if worker_class == 'sync':
+        return min(max(2 * cpu_count + 1, cpu_count * per_core), 4 * cpu_count + 1), 1
+    if worker_class == 'gthread':
+        return max(2, cpu_count), min(max(2, per_core), MAX_THREADS)
+    return max(2, cpu_count), 1
+
+
+def server_settings(config) -> dict:
+    """
+    Ajustes de gunicorn a partir de la configuración (GUNICORN_*)
+
+    Los workers e hilos explícitos (> 0) tienen prioridad sobre el cálculo.
+    """
+    worker_class = resolve_worker_class(get_setting(config, 'GUNICORN_WORKER_CLASS'))
+    workers, threads = size_workers(
+        worker_class,
+        os.cpu_count() or 1,
+        get_setting(config, 'GUNICORN_UPSTREAM_IO_RATIO', 0.8)
+    )
+    workers = get_setting(config, 'GUNICORN_WORKERS', 0) or workers
+    threads = get_setting(config, 'GUNICORN_THREADS', 0) or threads
+    return {
+        'worker_class': WORKER_CLASSES[worker_class][0],
+        'wsgi_app': ASGI_APP if worker_class == 'uvicorn' else WSGI_APP,
+        'workers': workers,
+        'threads': threads if worker_class == 'gthread' else 1,
+        'worker_connections': WORKER_CONNECTIONS,
+    }
+
+
+class GracefulThreadWorker(ThreadWorker):
+    """
+    Worker gthread que no descarta conexiones ya aceptadas al detenerse.
+
+    gthread acepta la conexión y espera a que llegue la petición antes de
+    pasarla al pool de hilos. Si recibe TERM en ese intervalo (recarga o
+    parada), cierra la conexión sin responder. Este worker pasa esas
+    conexiones al pool antes de salir; el pool las atiende dentro de
+    graceful_timeout.
+    """
+
+    def murder_keepalived(self):
+        super().murder_keepalived()
+        # Última vuelta del bucle de run() tras TERM: aún no se cerró el pool
+        if not self.alive:
+            self._drain_accepted()
+
+    def _drain_accepted(self):
+        with self._lock:
+            pending = [
+                (key.data, key.fileobj) for key in list(self.poller.get_map().values())
+                if isinstance(key.data, partial)
+                and key.data.func == self.on_client_socket_readable
+                and not key.data.args[0].initialized
+            ]
+        for callback, client in pending:
+            callback(client)
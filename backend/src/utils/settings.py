@@ -0,0 +1,13 @@
+"""
+Lectura de configuración desde un dict (app.config) o una clase Config
+"""
+from typing import Any
+
+
+def get_setting(config, key: str, default: Any = None) -> Any:
+    """Obtener un valor de configuración con valor por defecto"""
+    if config is None:
+        return default
+    if isinstance(config, dict):
+        return config.get(key, default)
+    return getattr(config, key, default)
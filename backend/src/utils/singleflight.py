@@ -0,0 +1,82 @@
+"""
+Coalescencia de llamadas idénticas en curso (single-flight)
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """Llamada en curso cuyo resultado comparten todos los que la esperan"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Agrupa las llamadas concurrentes con la misma clave.
+
+    La primera llamada ejecuta la función; las que llegan mientras sigue en
+    curso esperan y reciben el mismo resultado (o la misma excepción). Al
+    terminar, la clave se libera: no es una caché.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecutar fn(*args, **kwargs) una sola vez por clave en curso
+
+        Args:
+            key: Clave que identifica llamadas equivalentes
+            fn: Función a ejecutar
+
+        Returns:
+            El resultado de fn, compartido con las llamadas coalescidas
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Llamadas ejecutadas, coalescidas y en curso"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
@@ -0,0 +1,183 @@
+"""
+Caché compartida entre workers del mismo host sobre un archivo SQLite
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .cache import MISSING, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas escrituras se borran las entradas vencidas y las que sobran
+PRUNE_EVERY = 200
+
+
+class SQLiteCache:
+    """
+    Caché con TTL guardada en un archivo SQLite (modo WAL).
+
+    Todos los workers que abren el mismo archivo ven las mismas entradas,
+    así que la descarga de un worker calienta la caché de los demás y la
+    caché sobrevive a los reinicios. Los valores se guardan como JSON.
+
+    La interfaz es la de TTLCache (get, set, delete, clear, stats).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        max_entries: int = 1000,
+        default_ttl: float = 300,
+        timeout: float = 5.0
+    ):
+        """
+        Args:
+            path: Archivo SQLite compartido
+            namespace: Prefijo que separa las entradas de cada caché
+            max_entries: Número máximo de entradas de este namespace
+            default_ttl: TTL por defecto en segundos
+            timeout: Segundos de espera si otro worker tiene bloqueada la base
+        """
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                ' namespace TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, key)'
+                ') WITHOUT ROWID'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (namespace, expires_at)'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo y por proceso (no se comparten tras un fork)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key, default=MISSING):
+        """Obtener un valor vigente, o `default` si no existe, expiró o falla la base"""
+        try:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?',
+                (self.namespace, cache_key(key))
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Error leyendo la caché SQLite: {e}")
+            return default
+
+        if row is None or row[1] <= time.time():
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """Guardar un valor con el TTL indicado (o el TTL por defecto)"""
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                (self.namespace, cache_key(key), json.dumps(value, ensure_ascii=False), time.time() + ttl)
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Error escribiendo en la caché SQLite: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Borrar las entradas vencidas y, si sobran, las más próximas a vencer"""
+        try:
+            connection = self._connection()
+            connection.execute(
+                'DELETE FROM cache WHERE namespace = ? AND expires_at <= ?',
+                (self.namespace, time.time())
+            )
+            (count,) = connection.execute(
+                'SELECT COUNT(*) FROM cache WHERE namespace = ?', (self.namespace,)
+            ).fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    'DELETE FROM cache WHERE namespace = ? AND key IN ('
+                    ' SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at LIMIT ?)',
+                    (self.namespace, self.namespace, excess)
+                )
+                self.evictions += excess
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Error limpiando la caché SQLite: {e}")
+
+    def delete(self, key):
+        """Eliminar una entrada si existe"""
+        self._connection().execute(
+            'DELETE FROM cache WHERE namespace = ? AND key = ?',
+            (self.namespace, cache_key(key))
+        )
+
+    def clear(self):
+        """Vaciar las entradas de este namespace"""
+        self._connection().execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+
+    def __len__(self):
+        (count,) = self._connection().execute(
+            'SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?',
+            (self.namespace, time.time())
+        ).fetchone()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché (aciertos y fallos de este worker)"""
+        lookups = self.hits + self.misses
+        try:
+            entries = len(self)
+        except sqlite3.Error:
+            entries = None
+        return {
+            'backend': 'sqlite',
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+        }
@@ -2,7 +2,7 @@
 Utilidades de validación para la API
 """
 import re
-from typing import Tuple
+from typing import Optional, Tuple
 
 def validate_search_params(location: str, place_type: str, radius: str) -> Tuple[bool, str]:
     """
@@ -45,6 +45,26 @@ def validate_search_params(location: str, place_type: str, radius: str) -> Tuple
     
     return True, ""
 
+def validate_max_results(max_results: str) -> Tuple[bool, str]:
+    """
+    Validar el número máximo de resultados de una búsqueda
+    
+    Args:
+        max_results: Número de resultados pedido (Google entrega hasta 60)
+        
+    Returns:
+        Tuple (es_valido, mensaje_error)
+    """
+    try:
+        max_results_int = int(max_results)
+    except (TypeError, ValueError):
+        return False, "max_results debe ser un número entero"
+    
+    if max_results_int < 1 or max_results_int > 60:
+        return False, "max_results debe estar entre 1 y 60"
+    
+    return True, ""
+
 def validate_coordinates(lat: float, lng: float) -> Tuple[bool, str]:
     """
     Validar coordenadas geográficas
@@ -108,4 +128,165 @@ def validate_place_id(place_id: str) -> Tuple[bool, str]:
     if not re.match(r'^[A-Za-z0-9_-]+$', place_id):
         return False, "ID de lugar contiene caracteres inválidos"
     
-    return True, ""
\ No newline at end of file
+    return True, ""
+
+def validate_photo_reference(photo_reference: str) -> Tuple[bool, str]:
+    """
+    Validar referencia de foto de Google Places
+    
+    Args:
+        photo_reference: Referencia a validar
+        
+    Returns:
+        Tuple (es_valido, mensaje_error)
+    """
+    if not photo_reference:
+        return False, "Referencia de foto requerida"
+    
+    if len(photo_reference) > 1000:
+        return False, "Referencia de foto inválida (demasiado larga)"
+    
+    if not re.match(r'^[A-Za-z0-9_-]+$', photo_reference):
+        return False, "Referencia de foto contiene caracteres inválidos"
+    
+    return True, ""
+
+def validate_detail_groups(groups_param: str) -> Tuple[bool, str]:
+    """
+    Validar la lista de grupos de campos de detalles (p. ej. "contact,hours")
+    
+    Args:
+        groups_param: Grupos separados por comas
+        
+    Returns:
+        Tuple (es_valido, mensaje_error)
+    """
+    valid_groups = {'basic', 'contact', 'hours', 'rating', 'reviews', 'photos'}
+    groups = [group.strip() for group in groups_param.split(',') if group.strip()]
+    
+    invalid = [group for group in groups if group not in valid_groups]
+    if invalid:
+        return False, f"Campos inválidos: {', '.join(invalid)}. Válidos: {', '.join(sorted(valid_groups))}"
+    
+    return True, ""
+
+def parse_detail_groups(groups_param: str):
+    """Convertir "contact,hours" en ['contact', 'hours'] (None si está vacío)"""
+    groups = [group.strip() for group in (groups_param or '').split(',') if group.strip()]
+    return groups or None
+
+def validate_place_ids(ids_param: str, max_ids: int = 60) -> Tuple[bool, str]:
+    """
+    Validar una lista de IDs de lugar separados por comas
+    
+    Args:
+        ids_param: IDs separados por comas
+        max_ids: Número máximo de IDs por petición
+        
+    Returns:
+        Tuple (es_valido, mensaje_error)
+    """
+    place_ids = parse_place_ids(ids_param)
+    if not place_ids:
+        return False, "Parámetro ids requerido"
+    
+    if len(place_ids) > max_ids:
+        return False, f"Máximo {max_ids} IDs por petición"
+    
+    for place_id in place_ids:
+        is_valid, error_msg = validate_place_id(place_id)
+        if not is_valid:
+            return False, f"{error_msg}: {place_id[:50]}"
+    
+    return True, ""
+
+def parse_place_ids(ids_param: str):
+    """Convertir "a,b,a" en ['a', 'b'] (sin repetidos, en orden)"""
+    ids = [place_id.strip() for place_id in (ids_param or '').split(',') if place_id.strip()]
+    return list(dict.fromkeys(ids))
+
+def validate_medication_search(query: str, lat: str, lng: str, radius: str) -> Tuple[bool, str]:
+    """
+    Validar los parámetros de búsqueda de medicamentos
+    
+    Args:
+        query: Nombre o código del medicamento (admite prefijos)
+        lat: Latitud
+        lng: Longitud
+        radius: Radio de búsqueda en metros
+        
+    Returns:
+        Tuple (es_valido, mensaje_error)
+    """
+    if not query or len(query.strip()) < 2:
+        return False, "El medicamento debe tener al menos 2 caracteres"
+    
+    if len(query) > 100:
+        return False, "El medicamento es demasiado largo (máximo 100 caracteres)"
+    
+    try:
+        is_valid, error_msg = validate_coordinates(float(lat), float(lng))
+    except (TypeError, ValueError):
+        return False, "lat y lng deben ser números"
+    if not is_valid:
+        return False, error_msg
+    
+    try:
+        radius_int = int(radius)
+    except (TypeError, ValueError):
+        return False, "El radio debe ser un número entero"
+    if radius_int < 100 or radius_int > 50000:
+        return False, "El radio debe estar entre 100 y 50,000 metros"
+    
+    return True, ""
+
+def parse_bool_param(value: str) -> Optional[bool]:
+    """Convertir 'true'/'false' (o '1'/'0') en bool; None si está vacío"""
+    value = (value or '').strip().lower()
+    if not value:
+        return None
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    raise ValueError(f"Valor booleano inválido: {value}")
+
+def validate_ranking_params(open_now: str, min_rating: str, max_distance: str, sort: str) -> Tuple[bool, str]:
+    """
+    Validar los filtros y el orden de una búsqueda de lugares
+    
+    Args:
+        open_now: 'true' o 'false' (opcional)
+        min_rating: Rating mínimo entre 0 y 5 (opcional)
+        max_distance: Distancia máxima en metros (opcional)
+        sort: relevance, distance, rating o score
+        
+    Returns:
+        Tuple (es_valido, mensaje_error)
+    """
+    try:
+        parse_bool_param(open_now)
+    except ValueError:
+        return False, "open_now debe ser true o false"
+    
+    if min_rating:
+        try:
+            min_rating_float = float(min_rating)
+        except ValueError:
+            return False, "min_rating debe ser un número"
+        if not 0 <= min_rating_float <= 5:
+            return False, "min_rating debe estar entre 0 y 5"
+    
+    if max_distance:
+        try:
+            max_distance_int = int(max_distance)
+        except ValueError:
+            return False, "max_distance debe ser un número entero"
+        if not 1 <= max_distance_int <= 50000:
+            return False, "max_distance debe estar entre 1 y 50,000 metros"
+    
+    valid_sorts = ('relevance', 'distance', 'rating', 'score')
+    if sort not in valid_sorts:
+        return False, f"Orden inválido. Órdenes válidos: {', '.join(valid_sorts)}"
+    
+    return True, ""
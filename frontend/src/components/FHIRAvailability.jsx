@@ -1,16 +1,18 @@
 import React, { useState, useEffect } from 'react';
 import { ClockIcon, CheckCircleIcon, ExclamationCircleIcon } from '@heroicons/react/24/outline';
 
-const FHIRAvailability = ({ placeId, placeName }) => {
+const FHIRAvailability = ({ placeId, placeName, bulk = false, data, pending = false, error: bulkError = null }) => {
   const [availability, setAvailability] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    if (placeId) {
+    // Con bulk los datos llegan de ResultsList en la petición agrupada y la
+    // tarjeta nunca consulta por su cuenta
+    if (placeId && !bulk) {
       fetchAvailability();
     }
-  }, [placeId]);
+  }, [placeId, bulk]);
 
   const fetchAvailability = async () => {
     setLoading(true);
@@ -50,13 +52,18 @@ const FHIRAvailability = ({ placeId, placeName }) => {
   };
 
   const formatWaitTime = (minutes) => {
+    if (minutes == null) return 'Sin dato';
     if (minutes < 60) return `${minutes} min`;
     const hours = Math.floor(minutes / 60);
     const mins = minutes % 60;
     return `${hours}h ${mins}m`;
   };
 
-  if (loading) {
+  // Con bulk se muestran los datos del padre (undefined o null: sin datos FHIR)
+  const current = bulk ? data : availability;
+  const currentError = bulk ? bulkError : error;
+
+  if (bulk ? pending : loading) {
     return (
       <div className="fhir-availability">
         <div className="availability-header">
@@ -70,7 +77,7 @@ const FHIRAvailability = ({ placeId, placeName }) => {
     );
   }
 
-  if (error) {
+  if (currentError) {
     return (
       <div className="fhir-availability">
         <div className="availability-header">
@@ -78,13 +85,13 @@ const FHIRAvailability = ({ placeId, placeName }) => {
         </div>
         <div className="error-state">
           <ExclamationCircleIcon className="w-5 h-5 text-red-500" />
-          <span>{error}</span>
+          <span>{currentError}</span>
         </div>
       </div>
     );
   }
 
-  if (!availability) return null;
+  if (!current) return null;
 
   return (
     <div className="fhir-availability">
@@ -96,9 +103,9 @@ const FHIRAvailability = ({ placeId, placeName }) => {
       <div className="availability-content">
         <div className="status-row">
           <div className="status-item">
-            {getStatusIcon(availability.status)}
-            <span className={getStatusColor(availability.status)}>
-              {availability.status === 'available' ? 'Disponible' : 'Ocupado'}
+            {getStatusIcon(current.status)}
+            <span className={getStatusColor(current.status)}>
+              {current.status === 'available' ? 'Disponible' : 'Ocupado'}
             </span>
           </div>
         </div>
@@ -108,31 +115,31 @@ const FHIRAvailability = ({ placeId, placeName }) => {
           <div className="wait-grid">
             <div className="wait-item">
               <span className="wait-label">Urgencias:</span>
-              <span className="wait-time">{formatWaitTime(availability.wait_times.emergency)}</span>
+              <span className="wait-time">{formatWaitTime(current.wait_times.emergency)}</span>
             </div>
             <div className="wait-item">
               <span className="wait-label">Consulta:</span>
-              <span className="wait-time">{formatWaitTime(availability.wait_times.consultation)}</span>
+              <span className="wait-time">{formatWaitTime(current.wait_times.consultation)}</span>
             </div>
             <div className="wait-item">
               <span className="wait-label">Especialista:</span>
-              <span className="wait-time">{formatWaitTime(availability.wait_times.specialist)}</span>
+              <span className="wait-time">{formatWaitTime(current.wait_times.specialist)}</span>
             </div>
           </div>
         </div>
 
-        {availability.next_appointment && (
+        {current.next_appointment && (
           <div className="next-appointment">
             <ClockIcon className="w-4 h-4" />
             <span>
-              Próxima cita: {new Date(availability.next_appointment).toLocaleDateString('es-CL')}
+              Próxima cita: {new Date(current.next_appointment).toLocaleDateString('es-CL')}
             </span>
           </div>
         )}
 
-        {availability.fhir_data?.availabilityExceptions && (
+        {current.fhir_data?.availabilityExceptions && (
           <div className="availability-note">
-            <span>ℹ️ {availability.fhir_data.availabilityExceptions}</span>
+            <span>ℹ️ {current.fhir_data.availabilityExceptions}</span>
           </div>
         )}
       </div>
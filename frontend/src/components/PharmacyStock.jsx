@@ -1,16 +1,18 @@
 import React, { useState, useEffect } from 'react';
 import { BuildingStorefrontIcon, CheckIcon, XMarkIcon } from '@heroicons/react/24/outline';
 
-const PharmacyStock = ({ placeId }) => {
+const PharmacyStock = ({ placeId, bulk = false, data, pending = false, error: bulkError = null }) => {
   const [stock, setStock] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    if (placeId) {
+    // Con bulk los datos llegan de ResultsList en la petición agrupada y la
+    // tarjeta nunca consulta por su cuenta
+    if (placeId && !bulk) {
       fetchStock();
     }
-  }, [placeId]);
+  }, [placeId, bulk]);
 
   const fetchStock = async () => {
     setLoading(true);
@@ -70,7 +72,11 @@ const PharmacyStock = ({ placeId }) => {
     }
   };
 
-  if (loading) {
+  // Con bulk se muestran los datos del padre (undefined o null: sin datos FHIR)
+  const current = bulk ? data : stock;
+  const currentError = bulk ? bulkError : error;
+
+  if (bulk ? pending : loading) {
     return (
       <div className="pharmacy-stock">
         <div className="stock-header">
@@ -84,7 +90,7 @@ const PharmacyStock = ({ placeId }) => {
     );
   }
 
-  if (error) {
+  if (currentError) {
     return (
       <div className="pharmacy-stock">
         <div className="stock-header">
@@ -92,24 +98,24 @@ const PharmacyStock = ({ placeId }) => {
         </div>
         <div className="error-state">
           <XMarkIcon className="w-5 h-5 text-red-500" />
-          <span>{error}</span>
+          <span>{currentError}</span>
         </div>
       </div>
     );
   }
 
-  if (!stock?.medications?.length) return null;
+  if (!current?.medications?.length) return null;
 
   return (
     <div className="pharmacy-stock">
       <div className="stock-header">
         <h4>💊 Stock FHIR</h4>
-        <span className="fhir-badge">FHIR {stock.fhir_version}</span>
+        <span className="fhir-badge">FHIR {current.fhir_version}</span>
       </div>
       
       <div className="stock-content">
         <div className="medications-list">
-          {stock.medications.map((medication) => {
+          {current.medications.map((medication) => {
             const stockStatus = getStockStatus(medication);
             return (
               <div key={medication.id} className="medication-item">
@@ -134,11 +140,11 @@ const PharmacyStock = ({ placeId }) => {
           })}
         </div>
         
-        {stock.last_updated && (
+        {current.last_updated && (
           <div className="stock-footer">
             <span className="update-time">
-              ⏰ Actualizado: {new Date(stock.last_updated).toLocaleDateString('es-CL')} 
-              {' '}{new Date(stock.last_updated).toLocaleTimeString('es-CL')}
+              ⏰ Actualizado: {new Date(current.last_updated).toLocaleDateString('es-CL')} 
+              {' '}{new Date(current.last_updated).toLocaleTimeString('es-CL')}
             </span>
           </div>
         )}
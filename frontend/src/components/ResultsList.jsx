@@ -1,10 +1,51 @@
+import { useState, useEffect } from 'react'
 import { StarIcon, PhoneIcon, ClockIcon, MapPinIcon } from '@heroicons/react/24/outline'
 import { StarIcon as StarIconSolid } from '@heroicons/react/24/solid'
 import FHIRAvailability from './FHIRAvailability'
 import PharmacyStock from './PharmacyStock'
 import HL7Services from './HL7Services'
 
+const isAvailabilityPlace = (place) =>
+  place.types?.includes('hospital') || place.types?.includes('health')
+
+const isPharmacy = (place) => place.types?.includes('pharmacy')
+
+// Disponibilidad y stock FHIR de toda la página en dos peticiones
+const fetchFhirBulk = async (path, ids) => {
+  if (ids.length === 0) return {}
+  const query = ids.map(encodeURIComponent).join(',')
+  const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}${path}?ids=${query}`)
+  const result = await response.json()
+  if (!result.success) throw new Error(result.message || 'Error al obtener datos FHIR')
+  return result.data
+}
+
 const ResultsList = ({ results }) => {
+  // Los datos FHIR guardan los resultados a los que corresponden: mientras no
+  // coincidan con los actuales la consulta agrupada está pendiente, ya desde
+  // el primer render (antes de que corra cualquier efecto)
+  const [fhirData, setFhirData] = useState({ results: null, availability: {}, stock: {}, error: null })
+  const fhirPending = fhirData.results !== results
+
+  useEffect(() => {
+    if (!results || results.length === 0) return
+
+    let cancelled = false
+    Promise.all([
+      fetchFhirBulk('/fhir/availability', results.filter(isAvailabilityPlace).map(place => place.place_id)),
+      fetchFhirBulk('/fhir/pharmacy/stock', results.filter(isPharmacy).map(place => place.place_id))
+    ])
+      .then(([availability, stock]) => {
+        if (!cancelled) setFhirData({ results, availability, stock, error: null })
+      })
+      .catch(err => {
+        console.error('Error fetching FHIR data:', err)
+        if (!cancelled) setFhirData({ results, availability: {}, stock: {}, error: 'Error de conexión' })
+      })
+
+    return () => { cancelled = true }
+  }, [results])
+
   if (!results || results.length === 0) {
     return (
       <div className="card empty-state">
@@ -142,16 +183,26 @@ const ResultsList = ({ results }) => {
               {/* FHIR/HL7 Integration */}
               <div className="fhir-hl7-section">
                 {/* FHIR Availability for hospitals */}
-                {(place.types?.includes('hospital') || place.types?.includes('health')) && (
+                {isAvailabilityPlace(place) && (
                   <FHIRAvailability 
                     placeId={place.place_id} 
                     placeName={place.name} 
+                    bulk
+                    data={fhirData.availability[place.place_id]}
+                    pending={fhirPending}
+                    error={fhirData.error}
                   />
                 )}
                 
                 {/* Pharmacy Stock for pharmacies */}
-                {place.types?.includes('pharmacy') && (
-                  <PharmacyStock placeId={place.place_id} />
+                {isPharmacy(place) && (
+                  <PharmacyStock 
+                    placeId={place.place_id} 
+                    bulk
+                    data={fhirData.stock[place.place_id]}
+                    pending={fhirPending}
+                    error={fhirData.error}
+                  />
                 )}
                 
                 {/* HL7 Services for all health places */}